@@ -0,0 +1,395 @@
+"""
+Local stand-in for the OpenWeatherMap and Open-Meteo endpoints the collector calls,
+for load-testing weather.py offline (throughput, tail latency, API-call counts).
+
+Served endpoints (one server for both providers):
+    /geo/1.0/direct      OpenWeatherMap geocoding: made-up but stable coordinates for any name
+    /data/2.5/forecast   OpenWeatherMap 5-day / 3-hour forecast
+    /v1/forecast         Open-Meteo hourly cloud cover, including multi-coordinate requests
+    /__stats             requests, statuses and injected latency per provider (JSON)
+
+Cloud cover is a deterministic function of (coordinates, time), so repeated runs agree.
+Successful responses carry an ETag; a request with a matching If-None-Match gets a 304.
+Each provider can be given a latency distribution, a share of 500s and 429s, and a
+rate limit (requests per minute; excess requests get a 429 with Retry-After).
+
+Usage:
+    python -m benchmarks.mock_providers --port 8765 --latency lognormal:80,0.6 --owm-rate-limit 600
+    export OPENWEATHERMAP_BASE_URL=http://127.0.0.1:8765 OPENMETEO_BASE_URL=http://127.0.0.1:8765
+    export GEOCODE_CACHE_FILE=/tmp/mock_geocode_cache.json   # keep made-up coordinates out of data/
+    python weather.py
+
+Latency specs (milliseconds): "50" or "fixed:50", "uniform:20,200", "normal:100,30",
+"lognormal:80,0.6" (median, sigma), "exp:100" (mean).
+"""
+import sys
+import json
+import math
+import time
+import zlib
+import random
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+OPENWEATHERMAP = "OpenWeatherMap"
+OPENMETEO = "OpenMeteo"
+
+ENDPOINTS = {
+    "/geo/1.0/direct": OPENWEATHERMAP,
+    "/data/2.5/forecast": OPENWEATHERMAP,
+    "/v1/forecast": OPENMETEO,
+}
+
+DEFAULT_PROFILE = {
+    "latency": "0",        # latency spec, see module docstring
+    "error_rate": 0.0,     # share of requests answered with a 500
+    "throttle_rate": 0.0,  # share of requests answered with a 429 regardless of the rate limit
+    "rate_limit": None,    # requests per minute (None = unlimited)
+    "burst": 5,
+}
+
+OWM_STEPS = 40  # 5 days × 8 three-hour steps
+OPENMETEO_MAX_DAYS = 16
+RETRY_AFTER_SECONDS = 1
+LATENCY_SAMPLES = 10_000  # per provider, for the percentiles in /__stats
+
+
+def parse_latency(spec):
+    """Latency spec → function(rng) returning seconds."""
+    kind, _, args = str(spec).partition(":")
+    if not args:
+        kind, args = "fixed", kind
+    try:
+        values = [float(v) for v in args.split(",")]
+        if kind == "fixed":
+            ms, = values
+            return lambda rng: ms / 1000
+        if kind == "uniform":
+            low, high = values
+            return lambda rng: rng.uniform(low, high) / 1000
+        if kind == "normal":
+            mean, sd = values
+            return lambda rng: max(0.0, rng.gauss(mean, sd)) / 1000
+        if kind == "lognormal":
+            median, sigma = values
+            return lambda rng: rng.lognormvariate(math.log(median), sigma) / 1000 if median > 0 else 0.0
+        if kind == "exp":
+            mean, = values
+            return lambda rng: rng.expovariate(1 / mean) / 1000 if mean > 0 else 0.0
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid latency spec: {spec!r}")
+
+
+def _stable_random(*parts):
+    # random.Random seeded from the parts (hash() is salted per process; crc32 is not)
+    return random.Random(zlib.crc32("|".join(str(p) for p in parts).encode("utf-8")))
+
+
+def cloud_cover_at(lat, lon, epoch):
+    """Deterministic cloud cover (%) for a place and time: a daily level plus hourly wobble."""
+    lat, lon = round(float(lat), 2), round(float(lon), 2)
+    day = int(epoch // 86400)
+    level = _stable_random(lat, lon, day).uniform(0, 100)
+    wobble = _stable_random(lat, lon, int(epoch // 3600)).gauss(0, 15)
+    return min(100, max(0, int(round(level + wobble))))
+
+
+def geocode(name):
+    rng = _stable_random("geo", " ".join(name.split()).lower())
+    return {
+        "name": name,
+        "lat": round(rng.uniform(-60, 70), 4),
+        "lon": round(rng.uniform(-180, 180), 4),
+        "country": "ZZ",
+    }
+
+
+class _RateLimit:
+    """Thread-safe token bucket: `per_minute` requests per minute, `burst` at once."""
+
+    def __init__(self, per_minute, burst):
+        self.rate = per_minute / 60
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class MockProviders:
+    """Request handling, fault injection and statistics shared by the server's handler threads."""
+
+    def __init__(self, profiles=None, seed=0):
+        self.profiles = {provider: dict(DEFAULT_PROFILE) for provider in (OPENWEATHERMAP, OPENMETEO)}
+        for provider, profile in (profiles or {}).items():
+            self.profiles[provider].update({k: v for k, v in profile.items() if v is not None})
+
+        self._latency = {p: parse_latency(profile["latency"]) for p, profile in self.profiles.items()}
+        self._limits = {
+            p: _RateLimit(profile["rate_limit"], profile["burst"])
+            for p, profile in self.profiles.items() if profile["rate_limit"]
+        }
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.requests = Counter()                # endpoint → requests
+        self.statuses = defaultdict(Counter)     # provider → status → count
+        self.latencies = defaultdict(list)       # provider → injected latency samples (s)
+        self.coordinates = Counter()             # provider → locations served
+
+    # ---------- request handling ----------
+    def handle(self, path, query):
+        """Returns (status, payload, headers, delay_seconds) for a GET."""
+        provider = ENDPOINTS.get(path)
+        if provider is None:
+            return (200, self.stats(), {}, 0.0) if path == "/__stats" else (404, {"message": "Not found"}, {}, 0.0)
+
+        profile = self.profiles[provider]
+        with self._lock:
+            delay = self._latency[provider](self._rng)
+            roll = self._rng.random()
+        limit = self._limits.get(provider)
+
+        if limit is not None and not limit.allow():
+            status, payload = 429, {"message": "Rate limit exceeded (mock)"}
+        elif roll < profile["throttle_rate"]:
+            status, payload = 429, {"message": "Too many requests (mock)"}
+        elif roll < profile["throttle_rate"] + profile["error_rate"]:
+            status, payload = 500, {"message": "Internal error (mock)"}
+        else:
+            status, payload = self._respond(path, query)
+
+        with self._lock:
+            self.requests[path] += 1
+            self.statuses[provider][status] += 1
+            samples = self.latencies[provider]
+            if len(samples) < LATENCY_SAMPLES:
+                samples.append(delay)
+            else:
+                samples[self._rng.randrange(LATENCY_SAMPLES)] = delay  # reservoir sample
+            if status == 200 and path != "/geo/1.0/direct":
+                self.coordinates[provider] += len(payload) if isinstance(payload, list) else 1
+
+        headers = {"Retry-After": str(RETRY_AFTER_SECONDS)} if status == 429 else {}
+        return status, payload, headers, delay
+
+    def _respond(self, path, query):
+        try:
+            if path == "/geo/1.0/direct":
+                return self._geocoding(query)
+            if path == "/data/2.5/forecast":
+                return self._owm_forecast(query)
+            return self._openmeteo_forecast(query)
+        except (KeyError, IndexError, ValueError) as e:
+            return 400, {"error": True, "reason": f"Invalid request: {e}"}
+
+    def _geocoding(self, query):
+        if not query.get("appid"):
+            return 401, {"cod": 401, "message": "Invalid API key (mock)"}
+        return 200, [geocode(query["q"][0])]
+
+    def _owm_forecast(self, query):
+        if not query.get("appid"):
+            return 401, {"cod": 401, "message": "Invalid API key (mock)"}
+        lat, lon = float(query["lat"][0]), float(query["lon"][0])
+        first = (int(time.time()) // 10800 + 1) * 10800  # next 3-hour boundary, like the real API
+        steps = []
+        for i in range(OWM_STEPS):
+            dt = first + i * 10800
+            steps.append({
+                "dt": dt,
+                "clouds": {"all": cloud_cover_at(lat, lon, dt)},
+                "dt_txt": datetime.fromtimestamp(dt, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+            })
+        return 200, {"cod": "200", "message": 0, "cnt": len(steps), "list": steps, "city": {"coord": {"lat": lat, "lon": lon}}}
+
+    def _openmeteo_forecast(self, query):
+        latitudes = [float(v) for v in query["latitude"][0].split(",")]
+        longitudes = [float(v) for v in query["longitude"][0].split(",")]
+        if len(latitudes) != len(longitudes):
+            return 400, {"error": True, "reason": "Parameter 'latitude' and 'longitude' must have the same number of elements"}
+
+        today = datetime.now(timezone.utc).date()
+        start = datetime.strptime(query["start_date"][0], "%Y-%m-%d").date() if "start_date" in query else today
+        end = datetime.strptime(query["end_date"][0], "%Y-%m-%d").date() if "end_date" in query else start
+        if end < start or (end - today).days >= OPENMETEO_MAX_DAYS:
+            return 400, {"error": True, "reason": f"Parameter 'start_date'/'end_date' out of range ({start} – {end})"}
+
+        # Hours are reported in UTC (the "auto" timezone of a place at GMT)
+        first = datetime(start.year, start.month, start.day, tzinfo=timezone.utc)
+        hours = [first + timedelta(hours=h) for h in range(((end - start).days + 1) * 24)]
+        times = [h.strftime("%Y-%m-%dT%H:%M") for h in hours]
+
+        def location(lat, lon):
+            return {
+                "latitude": lat,
+                "longitude": lon,
+                "timezone": "GMT",
+                "timezone_abbreviation": "GMT",
+                "utc_offset_seconds": 0,
+                "hourly_units": {"time": "iso8601", "cloudcover": "%"},
+                "hourly": {"time": times, "cloudcover": [cloud_cover_at(lat, lon, h.timestamp()) for h in hours]},
+            }
+
+        results = [location(lat, lon) for lat, lon in zip(latitudes, longitudes)]
+        return 200, results[0] if len(results) == 1 else results
+
+    def record_not_modified(self, path):
+        """Counts a 200 that was turned into a 304 by conditional request headers."""
+        provider = ENDPOINTS[path]
+        with self._lock:
+            self.statuses[provider][200] -= 1
+            self.statuses[provider][304] += 1
+
+    # ---------- statistics ----------
+    def stats(self):
+        with self._lock:
+            providers = {}
+            for provider in self.profiles:
+                samples = sorted(self.latencies.get(provider, []))
+                providers[provider] = {
+                    "requests": sum(self.statuses[provider].values()),
+                    "statuses": {str(k): v for k, v in sorted(self.statuses[provider].items()) if v},
+                    "locations_served": self.coordinates[provider],
+                    "latency_ms": {
+                        name: round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 1)
+                        for name, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0))
+                    } if samples else {},
+                }
+            return {
+                "uptime_s": round(time.monotonic() - self.started, 1),
+                "endpoints": dict(self.requests),
+                "providers": providers,
+                "profiles": self.profiles,
+            }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+    server_version = "MockProviders/1.0"
+    verbose = False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        status, payload, headers, delay = self.server.providers.handle(url.path, parse_qs(url.query))
+        if delay > 0:
+            time.sleep(delay)
+
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        if status == 200 and url.path in ENDPOINTS:
+            # Validators like a real CDN: a matching If-None-Match gets an empty 304
+            headers = {**headers, "ETag": f'"{zlib.crc32(body):08x}-{len(body)}"'}
+            if self.headers.get("If-None-Match") == headers["ETag"]:
+                status, body = 304, b""
+                self.server.providers.record_not_modified(url.path)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+
+class MockProviderServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # thousands of locations open connections in bursts
+
+    def __init__(self, address, providers, verbose=False):
+        handler = type("Handler", (_Handler,), {"verbose": verbose})
+        super().__init__(address, handler)
+        self.providers = providers
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def provider_env(base_url):
+    """Environment variables that point the collector at a mock server."""
+    return {"OPENWEATHERMAP_BASE_URL": base_url, "OPENMETEO_BASE_URL": base_url}
+
+
+@contextmanager
+def running_server(host="127.0.0.1", port=0, profiles=None, seed=0, verbose=False):
+    """Runs a mock server on a background thread for the duration of the block. Yields the server."""
+    server = MockProviderServer((host, port), MockProviders(profiles, seed=seed), verbose=verbose)
+    thread = threading.Thread(target=server.serve_forever, name="mock-providers", daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve stand-in OpenWeatherMap / Open-Meteo endpoints for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    parser.add_argument("--latency", default=DEFAULT_PROFILE["latency"], help="Latency spec for both providers")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of 500 responses (both providers)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of 429 responses (both providers)")
+    for flag, provider in (("owm", OPENWEATHERMAP), ("om", OPENMETEO)):
+        parser.add_argument(f"--{flag}-latency", help=f"{provider} latency spec (overrides --latency)")
+        parser.add_argument(f"--{flag}-error-rate", type=float, help=f"{provider} share of 500 responses")
+        parser.add_argument(f"--{flag}-throttle-rate", type=float, help=f"{provider} share of 429 responses")
+        parser.add_argument(f"--{flag}-rate-limit", type=float, help=f"{provider} requests per minute")
+        parser.add_argument(f"--{flag}-burst", type=int, help=f"{provider} requests allowed at once under the rate limit")
+    args = parser.parse_args(argv)
+
+    profiles = {}
+    for flag, provider in (("owm", OPENWEATHERMAP), ("om", OPENMETEO)):
+        option = lambda name: getattr(args, f"{flag}_{name}")
+        profiles[provider] = {
+            "latency": option("latency") or args.latency,
+            "error_rate": args.error_rate if option("error_rate") is None else option("error_rate"),
+            "throttle_rate": args.throttle_rate if option("throttle_rate") is None else option("throttle_rate"),
+            "rate_limit": option("rate_limit"),
+            "burst": option("burst"),
+        }
+
+    try:
+        server = MockProviderServer((args.host, args.port), MockProviders(profiles, seed=args.seed), verbose=args.verbose)
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(f"🧪 Mock providers listening on {server.base_url}", flush=True)
+    for name, value in provider_env(server.base_url).items():
+        print(f"   export {name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.providers.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
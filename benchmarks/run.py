@@ -0,0 +1,344 @@
+"""
+Micro-benchmarks for the loaders, analytics and collector writes at several dataset scales.
+
+Every scale gets a synthetic, store-format dataset (benchmarks/synthetic_data.py); each
+benchmark is timed over a few repeats (median and best) and once more under tracemalloc
+for its peak memory. Results are compared with benchmarks/baseline.json, which records
+the commit they were measured at, so regressions show up between commits.
+
+Usage:
+    python -m benchmarks.run                          # 1× and 10×, compared with the baseline
+    python -m benchmarks.run --scales 1 10 100
+    python -m benchmarks.run --only load_data is_duplicate[store]
+    python -m benchmarks.run --save-baseline          # make this run the new baseline
+    python -m benchmarks.run --fail-on-regression     # exit 1 when something got slower
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.synthetic_data import START_DATE, generate_entries, location_names, scale_dimensions, write_dataset
+from cloud_cover_.data_loader import clear_cache, load_data
+from cloud_cover_.helpers import flatten_cloud_cover
+from forecast_analysis_.helpers import build_discrepancy_map, evaluate_source_accuracy, get_discrepancies_for_date
+from weather_.accuracy_aggregates import close_aggregates
+from weather_.helpers import is_duplicate, save_forecast_to_file
+from weather_.storage import close_stores, get_store
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(BASE_DIR, "benchmarks", "baseline.json")
+
+DEFAULT_SCALES = (1, 10)
+DEFAULT_REPEAT = 5
+REGRESSION_THRESHOLD = 0.25  # slower by more than this fraction of the baseline median → flagged
+RESULTS_VERSION = 1
+
+# Calls per timed batch for the per-item benchmarks
+DISCREPANCY_DATES = 100
+DUPLICATE_STORE_LOOKUPS = 1000
+DUPLICATE_LIST_LOOKUPS = 10
+SAVE_BATCH = 50
+
+
+class BenchmarkData:
+    """One scale's dataset plus whatever the benchmarks share (parsed entries, discrepancy map, samples)."""
+
+    def __init__(self, scale, directory, seed=0):
+        self.scale = scale
+        self.locations, self.days = scale_dimensions(scale)
+        self.path = os.path.join(directory, "cloud_cover.json")
+        self.seed = seed
+        self.entries = None
+        self.discrepancy_map = None
+        self._rng = random.Random(seed)
+
+    def generate(self):
+        if not os.path.isdir(os.path.join(os.path.dirname(self.path), "cloud_cover")):
+            write_dataset(self.path, generate_entries(self.locations, self.days, seed=self.seed), store=True)
+        clear_cache()
+        self.entries = load_data(self.path)
+        self.discrepancy_map = build_discrepancy_map(self.entries)
+        return self
+
+    def sample(self, population, k):
+        return self._rng.sample(list(population), min(k, len(population)))
+
+    def new_entries(self):
+        """Endless supply of entries for dates after the dataset (never duplicates)."""
+        start = START_DATE + timedelta(days=self.days)
+        return iter(generate_entries(location_names(self.locations), days=10_000, start=start, seed=self.seed + 1))
+
+
+# ========== benchmarks ============
+# Each takes the scale's BenchmarkData and returns (fn, calls): fn is timed, `calls` items per run
+
+def bench_load_data(data):
+    def run():
+        clear_cache()  # cold: parse the store, as on the first page load after new data
+        load_data(data.path)
+    return run, 1
+
+
+def bench_flatten_cloud_cover(data):
+    entries = data.entries
+    return lambda: [flatten_cloud_cover(entry) for entry in entries], len(entries)
+
+
+def bench_evaluate_source_accuracy(data):
+    entries = data.entries
+    return lambda: evaluate_source_accuracy(entries), len(entries)
+
+
+def bench_build_discrepancy_map(data):
+    entries = data.entries
+    return lambda: build_discrepancy_map(entries), len(entries)
+
+
+def bench_get_discrepancies_for_date(data):
+    days = [by_date[date_for] for by_date in data.discrepancy_map.values() for date_for in by_date]
+    days = data.sample(days, DISCREPANCY_DATES)
+
+    def run():
+        for source_data_by_day in days:
+            get_discrepancies_for_date(source_data_by_day, 20)
+    return run, len(days)
+
+
+def bench_is_duplicate_store(data):
+    store = get_store(data.path)
+    new = data.new_entries()
+    # Half existing keys, half new ones
+    lookups = data.sample(data.entries, DUPLICATE_STORE_LOOKUPS // 2) + [next(new) for _ in range(DUPLICATE_STORE_LOOKUPS // 2)]
+
+    def run():
+        for entry in lookups:
+            is_duplicate(entry, store)
+    return run, len(lookups)
+
+
+def bench_is_duplicate_list(data):
+    entries = list(data.entries)
+    lookups = data.sample(entries, DUPLICATE_LIST_LOOKUPS)
+
+    def run():
+        for entry in lookups:
+            is_duplicate(entry, entries)
+    return run, len(lookups)
+
+
+def bench_save_forecast_to_file(data):
+    new = data.new_entries()
+    save_forecast_to_file(next(new), filename=data.path)  # opens the store and loads the aggregates
+
+    def run():
+        for _ in range(SAVE_BATCH):
+            save_forecast_to_file(next(new), filename=data.path)
+    return run, SAVE_BATCH
+
+
+# Run in this order: save_forecast_to_file grows the store, so it goes last
+BENCHMARKS = {
+    "load_data": bench_load_data,
+    "flatten_cloud_cover": bench_flatten_cloud_cover,
+    "evaluate_source_accuracy": bench_evaluate_source_accuracy,
+    "build_discrepancy_map": bench_build_discrepancy_map,
+    "get_discrepancies_for_date": bench_get_discrepancies_for_date,
+    "is_duplicate[list]": bench_is_duplicate_list,
+    "is_duplicate[store]": bench_is_duplicate_store,
+    "save_forecast_to_file": bench_save_forecast_to_file,
+}
+
+
+def measure(fn, calls, repeat):
+    """Times fn `repeat` times (after one warm-up call), then once under tracemalloc for peak memory."""
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    median = statistics.median(times)
+    return {
+        "median_s": round(median, 6),
+        "min_s": round(min(times), 6),
+        "per_call_ms": round(median / calls * 1000, 4) if calls else None,
+        "calls": calls,
+        "peak_mib": round(peak / 2**20, 2),
+        "repeat": repeat,
+    }
+
+
+def run_scale(scale, directory, names, repeat, seed=0):
+    print(f"🧪 Scale {scale:g}× — dataset in {directory}", flush=True)
+    with redirect_stdout(io.StringIO()):
+        data = BenchmarkData(scale, directory, seed=seed).generate()
+    print(f"   {len(data.entries)} entries ({data.locations} locations × {data.days} days)", flush=True)
+
+    results = {"entries": len(data.entries), "locations": data.locations, "days": data.days, "benchmarks": {}}
+    try:
+        for name in names:
+            with redirect_stdout(io.StringIO()):  # the functions under test print progress
+                fn, calls = BENCHMARKS[name](data)
+                result = measure(fn, calls, repeat)
+            results["benchmarks"][name] = result
+            print(f"   {name:<28} {result['median_s'] * 1000:>10.2f} ms  (best {result['min_s'] * 1000:.2f}, "
+                  f"{result['per_call_ms']} ms/call, peak {result['peak_mib']} MiB)", flush=True)
+    finally:
+        with redirect_stdout(io.StringIO()):
+            close_stores()
+            close_aggregates()
+        clear_cache()
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(scales=DEFAULT_SCALES, names=None, repeat=DEFAULT_REPEAT, data_dir=None, seed=0):
+    """Runs the suite at every scale. Datasets go to data_dir (kept) or a temporary directory."""
+    names = list(names or BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(unknown)} (available: {', '.join(BENCHMARKS)})")
+
+    root = data_dir or tempfile.mkdtemp(prefix="sunny-dayzz-bench-")
+    results = {
+        "version": RESULTS_VERSION,
+        "commit": _git_commit(),
+        "created": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scales": {},
+    }
+    try:
+        for scale in scales:
+            directory = os.path.join(root, f"scale-{scale:g}")
+            # Runs mutate the store (save_forecast_to_file): start kept datasets from a fresh copy
+            work = directory if data_dir is None else tempfile.mkdtemp(prefix=f"scale-{scale:g}-")
+            if data_dir is not None:
+                if not os.path.isdir(directory):
+                    with redirect_stdout(io.StringIO()):
+                        BenchmarkData(scale, directory, seed=seed).generate()
+                    close_stores()
+                shutil.rmtree(work)
+                shutil.copytree(directory, work)
+            try:
+                results["scales"][f"{scale:g}"] = run_scale(scale, work, names, repeat, seed=seed)
+            finally:
+                if data_dir is not None:
+                    shutil.rmtree(work, ignore_errors=True)
+    finally:
+        if data_dir is None:
+            shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def load_results(path):
+    try:
+        with open(path, "r") as f:
+            results = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return results if results.get("version") == RESULTS_VERSION else None
+
+
+def save_results(results, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def compare_results(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Prints each benchmark's median against the baseline's and returns the regressions
+    as (scale, name, ratio) for those slower than (1 + threshold) × baseline.
+    """
+    regressions = []
+    print(f"📏 Compared with baseline {baseline.get('commit') or '?'} ({baseline.get('created', '?')})")
+    for scale, scale_results in results["scales"].items():
+        base_scale = baseline.get("scales", {}).get(scale)
+        if not base_scale:
+            print(f"   {scale}×: no baseline at this scale")
+            continue
+        for name, result in scale_results["benchmarks"].items():
+            base = base_scale["benchmarks"].get(name)
+            if not base or not base.get("median_s"):
+                continue
+            ratio = result["median_s"] / base["median_s"]
+            marker = "🔴" if ratio > 1 + threshold else ("🟢" if ratio < 1 - threshold else "⚪")
+            print(f"   {marker} {scale}× {name:<28} {ratio:6.2f}× ({base['median_s'] * 1000:.2f} → {result['median_s'] * 1000:.2f} ms, "
+                  f"peak {base['peak_mib']} → {result['peak_mib']} MiB)")
+            if ratio > 1 + threshold:
+                regressions.append((scale, name, ratio))
+    return regressions
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the loaders and analytics on synthetic data")
+    parser.add_argument("--scales", type=float, nargs="+", default=list(DEFAULT_SCALES), help="Dataset sizes relative to the collected history")
+    parser.add_argument("--only", nargs="+", metavar="NAME", help=f"Benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--data-dir", help="Keep generated datasets here and reuse them between runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write this run's results to a JSON file")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline results to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run's results as the baseline")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Allowed slowdown before flagging (fraction)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 when a benchmark regressed")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.scales, names=args.only, repeat=args.repeat, data_dir=args.data_dir, seed=args.seed)
+
+    if args.output:
+        save_results(results, args.output)
+        print(f"💾 Results written to {args.output}")
+
+    regressions = []
+    baseline = load_results(args.baseline)
+    if baseline is not None:
+        regressions = compare_results(results, baseline, threshold=args.threshold)
+    else:
+        print(f"ℹ️ No baseline at {args.baseline}")
+
+    if args.save_baseline:
+        save_results(results, args.baseline)
+        print(f"💾 Baseline written to {args.baseline}")
+
+    if regressions and args.fail_on_regression:
+        print(f"❌ {len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
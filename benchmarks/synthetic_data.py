@@ -0,0 +1,250 @@
+"""
+Synthetic forecast data shaped like data/cloud_cover.json, for load-testing the
+loaders and analytics well beyond the size of the collected history.
+
+Each location gets its own cloudiness and day-to-day persistence; every source
+reports the "true" cover with its own bias, and forecast noise grows with the
+lead time, so accuracy metrics come out in a realistic range. Entries are emitted
+in collection order (one run per day, 0/3/5-day horizons), like the collector does.
+
+Imperfections seen in real data can be dialled in: missing readings (null),
+entries with a single source, shuffled hour order and malformed values/entries.
+
+Usage:
+    python -m benchmarks.synthetic_data data/synthetic/cloud_cover.json --scale 10
+    python -m benchmarks.synthetic_data /tmp/x/cloud_cover.json --locations 50 --days 730 --store
+"""
+import os
+import sys
+import json
+import random
+import textwrap
+from datetime import date, datetime, timedelta
+
+from weather_.helpers import generate_cloud_summary
+from weather_.storage import PartitionedStore, store_dir_for
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOCATIONS_FILE = os.path.join(BASE_DIR, "data", "locations.json")
+
+SOURCES = ("OpenWeatherMap.com", "OpenMeteo.com")
+LEADS = (0, 3, 5)
+HOURS = ("06:00 UTC", "09:00 UTC", "12:00 UTC", "15:00 UTC", "18:00 UTC")
+START_DATE = date(2025, 1, 1)
+STORE_FSYNC_EVERY = 10_000  # bulk generation: durability per entry buys nothing
+
+# The collected history (≈3.3 MB) is 9 locations × ~127 days × 3 horizons
+BASE_LOCATIONS = 9
+BASE_DAYS = 127
+
+# Values and entry shapes a misbehaving provider or an old collector version could leave behind
+MALFORMED_VALUES = ("N/A", "", "abc%", "-5%", "250%", "42 %", 42, 42.5, "42.0%")
+MALFORMED_ENTRY_KINDS = ("bad_date", "string_lead", "no_cloud_cover", "no_data", "no_source")
+
+
+def scale_dimensions(scale):
+    """(locations, days) for a dataset ~scale × the collected history: both grow with √scale."""
+    factor = max(scale, 0) ** 0.5
+    return max(1, round(BASE_LOCATIONS * factor)), max(1, round(BASE_DAYS * factor))
+
+
+def location_names(count):
+    """The real locations first, then "Location 0010", "Location 0011", ..."""
+    try:
+        with open(LOCATIONS_FILE, "r") as f:
+            names = json.load(f)
+    except (OSError, ValueError):
+        names = []
+    names = names[:count]
+    names.extend(f"Location {i:04d}" for i in range(len(names) + 1, count + 1))
+    return names
+
+
+def _clip(value):
+    return min(100, max(0, int(round(value))))
+
+
+def generate_entries(
+    locations=BASE_LOCATIONS,
+    days=BASE_DAYS,
+    leads=LEADS,
+    sources=SOURCES,
+    hours=HOURS,
+    start=START_DATE,
+    missing_rate=0.01,
+    single_source_rate=0.002,
+    shuffled_hours_rate=0.01,
+    malformed_rate=0.0,
+    seed=0,
+):
+    """
+    Yields forecast entries for `days` target dates per location (from `start`), one per
+    (location, date_for, lead). `locations` is a count or a list of names.
+    Rates are per reading (missing_rate) or per entry (the others).
+    """
+    rng = random.Random(seed)
+    names = location_names(locations) if isinstance(locations, int) else list(locations)
+    leads = sorted(leads)
+    max_lead = leads[-1] if leads else 0
+
+    # Per-location climate and per-source personality
+    climate = {
+        name: {"base": rng.uniform(15, 75), "persistence": rng.uniform(0.4, 0.85)}
+        for name in names
+    }
+    source_bias = {source: rng.uniform(-8, 8) for source in sources}
+    source_skill = {source: rng.uniform(0.8, 1.3) for source in sources}
+
+    # "True" hourly cover per location and target date, generated in date order as runs need it
+    truth = {name: {} for name in names}
+    generated = {name: 0 for name in names}
+    previous_mean = {name: climate[name]["base"] for name in names}
+
+    def advance_truth(name, until):
+        c = climate[name]
+        while generated[name] <= until:
+            mean = c["persistence"] * previous_mean[name] + (1 - c["persistence"]) * c["base"] + rng.gauss(0, 22)
+            previous_mean[name] = mean = min(100.0, max(0.0, mean))
+            truth[name][generated[name]] = [mean + rng.gauss(0, 12) for _ in hours]
+            generated[name] += 1
+
+    # One collection run per day: each location, each horizon whose target falls in range
+    for run in range(-max_lead, days):
+        collected = start + timedelta(days=run)
+        for name in names:
+            advance_truth(name, min(run + max_lead, days - 1))
+            for lead in leads:
+                day_index = run + lead
+                if not 0 <= day_index < days:
+                    continue
+                yield _build_entry(
+                    rng, name, start + timedelta(days=day_index), collected, lead,
+                    truth[name][day_index], sources, hours, source_bias, source_skill,
+                    missing_rate, single_source_rate, shuffled_hours_rate, malformed_rate,
+                )
+            truth[name].pop(run, None)  # no later run targets this date
+
+
+def _build_entry(rng, name, date_for, collected, lead, cover, sources, hours, source_bias, source_skill,
+                 missing_rate, single_source_rate, shuffled_hours_rate, malformed_rate):
+    collected_at = datetime.combine(collected, datetime.min.time()) + timedelta(hours=8, minutes=rng.randint(0, 59))
+    entry_sources = list(sources)
+    if len(entry_sources) > 1 and rng.random() < single_source_rate:
+        entry_sources = [rng.choice(entry_sources)]
+
+    blocks = []
+    for source in entry_sources:
+        noise = source_skill[source] * (4 + 6 * lead)
+        values = {}
+        for hour, true_value in zip(hours, cover):
+            if rng.random() < missing_rate:
+                values[hour] = None
+            else:
+                values[hour] = f"{_clip(true_value + source_bias[source] + rng.gauss(0, noise))}%"
+        if rng.random() < shuffled_hours_rate:
+            items = list(values.items())
+            rng.shuffle(items)
+            values = dict(items)
+        blocks.append({
+            "source": source,
+            "data": values,
+            "summary": generate_cloud_summary({h: v for h, v in values.items() if v is not None}),
+        })
+
+    entry = {
+        "location": name,
+        "overview": {
+            "date_for": date_for.strftime("%d/%m/%Y"),
+            "date_time_collected": collected_at.strftime("%d/%m/%Y %H:%M"),
+            "num_of_days_between_forecast": lead,
+        },
+        "cloud_cover": blocks,
+    }
+    if malformed_rate and rng.random() < malformed_rate:
+        _malform(rng, entry)
+    return entry
+
+
+def _malform(rng, entry):
+    # Entries keep their location and overview keys (every writer since the first has set them);
+    # everything below that may be off
+    kind = rng.choice(MALFORMED_ENTRY_KINDS + ("bad_value",) * 3)
+    overview = entry["overview"]
+    if kind == "bad_date":
+        overview["date_for"] = datetime.strptime(overview["date_for"], "%d/%m/%Y").strftime("%Y-%m-%d")
+    elif kind == "string_lead":
+        overview["num_of_days_between_forecast"] = f"{overview['num_of_days_between_forecast']} days"
+    elif kind == "no_cloud_cover":
+        entry["cloud_cover"] = []
+    elif kind == "no_data":
+        entry["cloud_cover"][0].pop("data", None)
+    elif kind == "no_source":
+        entry["cloud_cover"][0].pop("source", None)
+    else:
+        data = entry["cloud_cover"][0]["data"]
+        data[rng.choice(list(data))] = rng.choice(MALFORMED_VALUES)
+
+
+def write_dataset(path, entries, store=False):
+    """
+    Streams entries to disk as a legacy JSON array at `path`, or — with store=True — into the
+    segmented, location-partitioned store behind `path` (the layout the collector writes).
+    Returns the number of entries written.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    count = 0
+
+    if store:
+        with PartitionedStore(store_dir_for(path), fsync_every=STORE_FSYNC_EVERY) as forecast_store:
+            if not forecast_store.is_empty():
+                raise RuntimeError(f"Store {forecast_store.directory} already contains data")
+            for entry in entries:
+                forecast_store.append(entry)
+                count += 1
+        return count
+
+    with open(path, "w") as f:
+        f.write("[")
+        for entry in entries:
+            f.write(",\n" if count else "\n")
+            f.write(textwrap.indent(json.dumps(entry, indent=2, ensure_ascii=False), "  "))
+            count += 1
+        f.write("\n]\n")
+    return count
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic cloud_cover.json-shaped dataset")
+    parser.add_argument("path", help="Data file path, e.g. data/synthetic/cloud_cover.json")
+    parser.add_argument("--scale", type=float, default=1.0, help="Size relative to the collected history (sets --locations/--days)")
+    parser.add_argument("--locations", type=int, help="Number of locations")
+    parser.add_argument("--days", type=int, help="Target dates per location")
+    parser.add_argument("--leads", type=int, nargs="+", default=list(LEADS), help="Forecast horizons in days")
+    parser.add_argument("--sources", nargs="+", default=list(SOURCES))
+    parser.add_argument("--missing-rate", type=float, default=0.01)
+    parser.add_argument("--single-source-rate", type=float, default=0.002)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--store", action="store_true", help="Write the segmented store instead of a JSON array")
+    args = parser.parse_args(argv)
+
+    locations, days = scale_dimensions(args.scale)
+    entries = generate_entries(
+        locations=args.locations or locations,
+        days=args.days or days,
+        leads=args.leads,
+        sources=args.sources,
+        missing_rate=args.missing_rate,
+        single_source_rate=args.single_source_rate,
+        malformed_rate=args.malformed_rate,
+        seed=args.seed,
+    )
+    count = write_dataset(args.path, entries, store=args.store)
+    print(f"🧪 Wrote {count} synthetic entries ({args.locations or locations} locations × {args.days or days} days) to {args.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,9 @@
 import altair as alt
 import pandas as pd
 
+from cloud_cover_.profiling import timed
+
+@timed()
 def build_time_chart(df, facet_by_date=False, height=300):
     """
     Build a line chart (optionally faceted by date) showing cloud cover over time.
@@ -36,7 +39,31 @@ def build_time_chart(df, facet_by_date=False, height=300):
 
     return base
 
+@timed()
+def build_summary_chart(summary, height=250):
+    """
+    Line chart of period means from `summarize_timeline` (one point per source per week/month),
+    used for history older than the full-resolution window.
+    """
+    return alt.Chart(summary).mark_line(point=True).encode(
+        x=alt.X("Period:T", title="Period"),
+        y=alt.Y("Cloud Cover (%):Q", title="Mean cloud cover (%)", scale=alt.Scale(domain=[0, 100])),
+        color=alt.Color("Source:N"),
+        strokeDash=alt.StrokeDash("Resolution:N"),
+        tooltip=[
+            alt.Tooltip("Period:T", title="Period starting"),
+            "Resolution",
+            "Source",
+            alt.Tooltip("Cloud Cover (%):Q", title="Mean cloud cover (%)", format=".1f"),
+            "Days",
+            "Readings",
+        ],
+    ).properties(
+        height=height
+    )
+
 # Pie chart helper
+@timed()
 def build_pie_chart(sunny, cloudy, use_len=False):
     df = pd.DataFrame({
         "Type": ["Sunny", "Cloudy"],
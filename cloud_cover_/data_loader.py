@@ -1,12 +1,119 @@
-import json
-import os
+import threading
+from collections import OrderedDict
 
-def load_data(data_path):
-    if not os.path.exists(data_path):
-        return []
+from weather_.storage import data_signature, load_entries, load_manifest
+from cloud_cover_.profiling import timed
+
+# Parsed JSON takes several times its on-disk size in memory; used to estimate a dataset's footprint
+PARSED_SIZE_FACTOR = 8
+# Upper bound on memory held by cached datasets (and their derived frames) across reruns and sessions
+CACHE_MEMORY_BUDGET_BYTES = 512 * 1024 * 1024
+
+
+class Dataset:
+    """
+    One parsed snapshot of the forecast data, shared by every Streamlit rerun and session.
+    `entries` is a tuple and must be treated as read-only; derived values (DataFrames, maps)
+    are memoized on the dataset via `derive`, so they are rebuilt only when the data changes.
+    """
+
+    def __init__(self, path, signature, entries, location=None):
+        self.path = path
+        self.location = location
+        self.signature = signature
+        self.entries = tuple(entries)
+        self.raw_bytes = sum(size for _, _, size in signature)
+        self._derived = {}
+        self._derived_bytes = 0
+        self._lock = threading.Lock()
+
+    def derive(self, key, build):
+        """Returns build(self.entries) memoized under `key` for the lifetime of this snapshot."""
+        with self._lock:
+            if key in self._derived:
+                return self._derived[key]
+
+        value = build(self.entries)
+
+        with self._lock:
+            self._derived.setdefault(key, value)
+            self._derived_bytes += _estimate_bytes(value)
+        return self._derived[key]
+
+    @property
+    def estimated_bytes(self):
+        return self.raw_bytes * PARSED_SIZE_FACTOR + self._derived_bytes
+
+
+def _estimate_bytes(value):
+    memory_usage = getattr(value, "memory_usage", None)
+    if callable(memory_usage):  # pandas DataFrame / Series
+        try:
+            usage = memory_usage(deep=True)
+            return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+        except TypeError:
+            pass
+    return 0
+
+
+_datasets = OrderedDict()  # (path, location) → Dataset, least recently used first
+_datasets_lock = threading.Lock()
 
-    with open(data_path, "r") as f:
-        return json.load(f)
+
+@timed()
+def load_dataset(data_path, location=None):
+    """
+    Returns the cached Dataset for data_path — or for one location's partition only —
+    re-parsing only when those files changed (keyed on each segment's mtime and size).
+    """
+    key = (data_path, location)
+    signature = data_signature(data_path, location)
+
+    with _datasets_lock:
+        dataset = _datasets.get(key)
+        if dataset is not None and dataset.signature == signature:
+            _datasets.move_to_end(key)
+            return dataset
+
+    dataset = Dataset(data_path, signature, load_entries(data_path, location), location=location)
+
+    with _datasets_lock:
+        _datasets[key] = dataset
+        _datasets.move_to_end(key)
+        _evict_over_budget()
+    return dataset
+
+
+@timed()
+def load_locations(data_path):
+    """
+    Sorted location names for the sidebar, served from the store manifest without reading
+    any forecasts. Falls back to one (cached) scan for a legacy file or unpartitioned store.
+    """
+    manifest = load_manifest(data_path)
+    if manifest is not None:
+        return manifest.locations()
+    return load_dataset(data_path).derive(
+        "locations", lambda entries: sorted(set(entry["location"] for entry in entries))
+    )
+
+
+def _evict_over_budget():
+    # Drop least recently used datasets until we fit the budget (always keep the newest one)
+    while len(_datasets) > 1 and sum(d.estimated_bytes for d in _datasets.values()) > CACHE_MEMORY_BUDGET_BYTES:
+        _datasets.popitem(last=False)
+
+
+def clear_cache():
+    with _datasets_lock:
+        _datasets.clear()
+
+
+@timed()
+def load_data(data_path):
+    # Reads the segmented store behind data_path (or the legacy JSON file if not migrated yet),
+    # parsed once per change of the underlying files
+    return load_dataset(data_path).entries
 
 def get_filtered_data(data, selected_location):
     return [e for e in data if e["location"].lower() == selected_location.lower()]
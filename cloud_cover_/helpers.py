@@ -1,7 +1,13 @@
+import math
+import numbers
+
+import numpy as np
 import pandas as pd
 import re
 from typing import Optional, Any, Dict, List
 
+from cloud_cover_.profiling import timed
+
 def _parse_percent(val):
     """
     Coerce a variety of inputs to an integer percent (0–100).
@@ -10,7 +16,9 @@ def _parse_percent(val):
     """
     if val is None:
         return None
-    if isinstance(val, (int, float)):
+    if isinstance(val, numbers.Real):
+        if not math.isfinite(val):
+            return None
         num = int(round(val))
         return max(0, min(100, num))
 
@@ -24,10 +32,10 @@ def _parse_percent(val):
     try:
         num = int(float(s.replace(',', '.')))
         return max(0, min(100, num))
-    except ValueError:
+    except (ValueError, OverflowError):
         pass
 
-    m = re.search(r'-?\d+(?:\.\d+)?', s)
+    m = re.search(_NUMBER_PATTERN, s)
     if m:
         try:
             num = int(float(m.group()))
@@ -38,6 +46,78 @@ def _parse_percent(val):
     return None
 
 
+_NUMBER_PATTERN = r'(-?\d+(?:\.\d+)?)'
+_SCALAR_PARSE_LIMIT = 256  # below this many (distinct) values, plain _parse_percent calls are cheaper
+
+
+def parse_percent_column(values):
+    """
+    Column-wise `_parse_percent`: a whole Series/array/list of mixed values → nullable Int8 (0–100).
+    Numbers are rounded, strings are truncated after stripping "%" (falling back to the first number
+    in the text), anything unparseable becomes <NA>. Returns a Series when given one, otherwise an array.
+
+    Distinct values are parsed once (with vectorized string ops when there are many), so cost tracks
+    the number of distinct readings rather than the number of cells.
+    """
+    index = values.index if isinstance(values, pd.Series) else None
+
+    if len(values) <= _SCALAR_PARSE_LIMIT:
+        result = pd.array([_parse_percent(v) for v in values], dtype="Int8")
+        return pd.Series(result, index=index) if index is not None else result
+
+    series = pd.Series(values, dtype=None if _is_numeric(values) else object)
+    try:
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    except TypeError:  # unhashable (malformed) values: parse every cell
+        codes, uniques = None, series
+
+    uniques = np.asarray(uniques, dtype=object)
+    if len(uniques) <= _SCALAR_PARSE_LIMIT:
+        parsed_uniques = np.array([_parse_percent(v) for v in uniques], dtype="float64")
+    else:
+        parsed_uniques = _parse_unique_percents(pd.Series(uniques, dtype=object))
+
+    if codes is None:
+        parsed = parsed_uniques
+    else:
+        parsed = np.full(len(codes), np.nan)
+        valid = codes >= 0
+        parsed[valid] = parsed_uniques[codes[valid]]
+
+    result = pd.array(parsed, dtype="Float64").astype("Int8")
+    return pd.Series(result, index=index) if index is not None else result
+
+
+def _is_numeric(values):
+    dtype = getattr(values, "dtype", None)
+    return dtype is not None and pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+
+def _parse_unique_percents(values):
+    # float64 results (NaN = unparseable) for an object Series of distinct values
+    parsed = np.full(len(values), np.nan)
+    is_number = values.map(lambda v: isinstance(v, numbers.Real)).to_numpy(dtype=bool)
+    is_text = ~is_number & values.notna().to_numpy()
+
+    # Numbers: rounded (half to even, like round())
+    parsed[is_number] = np.round(values[is_number].to_numpy(dtype="float64"))
+
+    # Text (anything else is stringified): strip, drop one trailing "%", decimal comma → point, truncate
+    text = values[is_text].map(str).str.strip().str.replace(r"%$", "", regex=True).str.strip()
+    direct = pd.to_numeric(text.str.replace(",", ".", regex=False), errors="coerce").to_numpy(dtype="float64", na_value=np.nan, copy=True)
+
+    # Fallback: first number anywhere in the text ("~42 %", "approx 30")
+    missing = ~np.isfinite(direct)
+    if missing.any():
+        extracted = text[missing].str.extract(_NUMBER_PATTERN, expand=False)
+        direct[missing] = pd.to_numeric(extracted, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    parsed[is_text] = np.trunc(direct)
+
+    parsed[~np.isfinite(parsed)] = np.nan
+    return np.clip(parsed, 0, 100)
+
+
+@timed()
 def flatten_cloud_cover(entry):
     """Extracts rows for each source from cloud cover list."""
     date = pd.to_datetime(entry["overview"]["date_for"], format="%d/%m/%Y")
@@ -59,14 +139,92 @@ def flatten_cloud_cover(entry):
 
     return rows
 
+@timed()
+def build_timeline_frame(entries):
+    """Flattens entries into the timeline DataFrame used by the Cloud Cover charts."""
+    timeline_data = []
+    for entry in entries:
+        timeline_data.extend(flatten_cloud_cover(entry))
+
+    df_timeline = pd.DataFrame(timeline_data)
+    if df_timeline.empty:
+        return df_timeline
+
+    df_timeline["Date"] = pd.to_datetime(df_timeline["Date"])
+    df_timeline["Cloud Cover (%)"] = (
+        pd.to_numeric(df_timeline["Cloud Cover (%)"], errors="coerce")
+        .round()
+        .astype("Int64")   # nullable integer dtype, supports <NA>
+    )
+    df_timeline["Tooltip Label"] = df_timeline["Cloud Cover (%)"].apply(lambda x: f"{x}%" if x is not None else "—")
+    return df_timeline
+
+TIMELINE_WINDOW_DAYS = 14  # days drawn at full resolution per page of the timeline
+WEEKLY_SUMMARY_DAYS = 91  # before the latest window: weekly means this far back, monthly means beyond
+SUMMARY_COLUMNS = ["Period", "Resolution", "Source", "Cloud Cover (%)", "Days", "Readings"]
+
+def timeline_windows(df_timeline, window_days=TIMELINE_WINDOW_DAYS):
+    """
+    Splits the timeline's date span into consecutive windows of `window_days`, the last one
+    ending on the latest date. Returns [(start, end), ...] Timestamps, oldest first.
+    """
+    if df_timeline.empty:
+        return []
+    first = df_timeline["Date"].min().normalize()
+    end = df_timeline["Date"].max().normalize()
+
+    windows = []
+    while end >= first:
+        start = end - pd.Timedelta(days=window_days - 1)
+        windows.append((max(start, first), end))
+        end = start - pd.Timedelta(days=1)
+    return windows[::-1]
+
+def slice_timeline(df_timeline, start, end):
+    """Rows of the timeline dated start..end (inclusive)."""
+    return df_timeline[df_timeline["Date"].between(start, end)]
+
+@timed()
+def summarize_timeline(df_timeline, before, weekly_days=WEEKLY_SUMMARY_DAYS):
+    """
+    Mean cloud cover per source for every date before `before`, so long histories can be
+    charted from a handful of points: weekly periods for the `weekly_days` preceding it,
+    calendar months further back.
+    """
+    older = df_timeline[df_timeline["Date"] < before]
+    if older.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+
+    dates = older["Date"]
+    weekly = (dates >= before - pd.Timedelta(days=weekly_days)).to_numpy()
+    work = pd.DataFrame({
+        "Period": np.where(
+            weekly,
+            dates.dt.to_period("W").dt.start_time,
+            dates.dt.to_period("M").dt.start_time,
+        ),
+        "Resolution": np.where(weekly, "Weekly", "Monthly"),
+        "Source": older["Source"].to_numpy(),
+        "Cloud Cover (%)": older["Cloud Cover (%)"].astype("Float64").to_numpy(dtype="float64", na_value=np.nan),
+        "Date": dates.to_numpy(),
+    })
+    summary = work.groupby(["Period", "Resolution", "Source"], sort=True).agg(**{
+        "Cloud Cover (%)": ("Cloud Cover (%)", "mean"),
+        "Days": ("Date", "nunique"),
+        "Readings": ("Cloud Cover (%)", "count"),
+    }).reset_index()
+    summary["Cloud Cover (%)"] = summary["Cloud Cover (%)"].round(1)
+    return summary[SUMMARY_COLUMNS]
+
+TIME_BLOCKS = {
+    "morning": ["06:00 UTC", "09:00 UTC"],
+    "afternoon": ["12:00 UTC", "15:00 UTC"],
+    "evening": ["18:00 UTC"]
+}
+
 def average_cloud_cover_by_block(source_data):
-    blocks = {
-        "morning": ["06:00 UTC", "09:00 UTC"],
-        "afternoon": ["12:00 UTC", "15:00 UTC"],
-        "evening": ["18:00 UTC"]
-    }
     block_averages = {}
-    for block, times in blocks.items():
+    for block, times in TIME_BLOCKS.items():
         values = [
             v for time in times if time in source_data
             for v in [_parse_percent(source_data[time])]
@@ -112,3 +270,99 @@ def get_combined_block_averages(entry, selected_sources):
 
     return final_avg
 
+
+def _mean_ignoring_nan(values, axis):
+    # Mean of the non-NaN values along an axis (NaN where there are none), without empty-slice warnings
+    present = ~np.isnan(values)
+    counts = present.sum(axis=axis)
+    sums = np.where(present, values, 0.0).sum(axis=axis)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+class BlockAverageMatrix:
+    """
+    Block averages for a set of (0-day) entries, computed once: values[entry, block, source]
+    holds the mean cloud cover of each source's readings in each time block (NaN when missing),
+    with the same rules as average_cloud_cover_by_block.
+
+    `for_sources` combines the selected sources exactly like get_combined_block_averages and
+    keeps sorted day/block averages, so sunny counts for any threshold are a binary search.
+    """
+
+    def __init__(self, entries):
+        self.blocks = list(TIME_BLOCKS)
+        self.dates = [entry["overview"]["date_for"] for entry in entries]
+        self.sources = sorted({
+            block["source"] for entry in entries for block in entry.get("cloud_cover", []) if block.get("source")
+        })
+        source_index = {source: i for i, source in enumerate(self.sources)}
+        times = [time for block_times in TIME_BLOCKS.values() for time in block_times]
+
+        # Gather every reading (entry × source × time) and parse them in one pass
+        positions, raw = [], []
+        for i, entry in enumerate(entries):
+            seen = set()
+            for block in entry.get("cloud_cover", []):
+                source = block.get("source")
+                if not source or source in seen:
+                    continue
+                seen.add(source)
+                data = block.get("data", {})
+                for t, time in enumerate(times):
+                    if time in data:
+                        positions.append((i, source_index[source], t))
+                        raw.append(data[time])
+
+        readings = np.full((len(entries), len(self.sources), len(times)), np.nan)
+        if positions:
+            i, j, k = np.array(positions).T
+            readings[i, j, k] = parse_percent_column(raw).to_numpy(dtype="float64", na_value=np.nan)
+
+        values = np.full((len(entries), len(self.blocks), len(self.sources)), np.nan)
+        start = 0
+        for b, block_times in enumerate(TIME_BLOCKS.values()):
+            values[:, b, :] = _mean_ignoring_nan(readings[:, :, start:start + len(block_times)], axis=2)
+            start += len(block_times)
+        self.values = values
+        self._counters = {}
+
+    def __len__(self):
+        return len(self.dates)
+
+    def combined(self, selected_sources):
+        """[entry, block] averages across the selected sources (NaN when none has data)."""
+        columns = [i for i, source in enumerate(self.sources) if source in set(selected_sources)]
+        return _mean_ignoring_nan(self.values[:, :, columns], axis=2)
+
+    def for_sources(self, selected_sources):
+        """SunnyCounter for a source selection (built once per selection)."""
+        key = tuple(sorted(selected_sources))
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters.setdefault(key, SunnyCounter(self.combined(key), self.blocks))
+        return counter
+
+
+class SunnyCounter:
+    """
+    Sorted day and block averages for one source selection.
+    A day is sunny when the mean of its block averages is ≤ threshold (days without data are cloudy),
+    and a block is sunny when its average is ≤ threshold (missing blocks count as cloudy) —
+    the same rules as is_sunny_day and get_sunny_blocks.
+    """
+
+    def __init__(self, combined, blocks):
+        self.total = len(combined)
+        day_averages = _mean_ignoring_nan(combined, axis=1) if self.total else np.array([])
+        self._days = np.sort(day_averages[~np.isnan(day_averages)])
+        self._blocks = {
+            block: np.sort(combined[:, b][~np.isnan(combined[:, b])])
+            for b, block in enumerate(blocks)
+        }
+
+    def sunny_days(self, threshold):
+        return int(np.searchsorted(self._days, threshold, side="right"))
+
+    def sunny_blocks(self, block, threshold):
+        return int(np.searchsorted(self._blocks[block], threshold, side="right"))
@@ -0,0 +1,192 @@
+"""
+Opt-in timing spans for the Streamlit pages.
+
+Enable per browser tab with the query parameter `?profile=1` (or `?profile=cprofile`),
+or for the whole server with SUNNY_DAYZZ_PROFILE=1 (or =cprofile). Each rerun then
+ends with a "⏱️ Timing breakdown" expander listing every span: page sections
+(`with span("charts"):`) and helpers decorated with `@timed`. With "cprofile" the
+rerun is also profiled with cProfile and the stats are dumped to logs/profiles/.
+
+Wrap a page's body in `with profile_page("Page"):`. The rerun's profiling then ends
+(and its breakdown is rendered) on the way out, even when `st.stop()` or an exception
+cuts the body short, so a cProfile never outlives its rerun.
+
+When profiling is off, `span` hands back a shared no-op context manager and `@timed`
+helpers do one ContextVar lookup before calling straight through.
+
+Spans are recorded per script thread (Streamlit runs each session's rerun on its own
+thread), so concurrent sessions don't mix their timings.
+"""
+import io
+import os
+import time
+import cProfile
+import pstats
+import functools
+import contextvars
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+PROFILE_ENV_VAR = "SUNNY_DAYZZ_PROFILE"
+PROFILE_QUERY_PARAM = "profile"
+PROFILE_DUMP_DIR = os.path.join("logs", "profiles")
+TOP_FUNCTIONS = 25  # cProfile rows shown in the expander
+
+_ENABLED_VALUES = {"1", "true", "yes", "on"}
+_CPROFILE_VALUES = {"cprofile", "pstats"}
+
+_active = contextvars.ContextVar("page_profiler", default=None)
+_NO_SPAN = nullcontext()
+
+
+class PageProfiler:
+    """Timing spans for one rerun of a page, aggregated by name (calls, total, max)."""
+
+    def __init__(self, page, use_cprofile=False, dump_dir=PROFILE_DUMP_DIR):
+        self.page = page
+        self.dump_dir = dump_dir
+        self.started = time.perf_counter()
+        self.total = None
+        self.spans = {}  # name → {"calls", "total", "max", "depth"}, in order of first entry
+        self._depth = 0
+        self._cprofile = None
+        self.cprofile_error = None
+        self.dump_path = None
+
+        if use_cprofile:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+                self._cprofile = profile
+            except ValueError as e:  # another profiler is active (e.g. a concurrent session's)
+                self.cprofile_error = str(e)
+
+    @contextmanager
+    def span(self, name):
+        record = self.spans.get(name)
+        if record is None:
+            record = self.spans[name] = {"calls": 0, "total": 0.0, "max": 0.0, "depth": self._depth}
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._depth -= 1
+            record["calls"] += 1
+            record["total"] += elapsed
+            record["max"] = max(record["max"], elapsed)
+
+    def stop(self):
+        """Stops cProfile (dumping its stats) and returns the rerun's total seconds."""
+        self.total = time.perf_counter() - self.started
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            os.makedirs(self.dump_dir, exist_ok=True)
+            slug = "".join(c if c.isalnum() else "_" for c in self.page).strip("_").lower()
+            self.dump_path = os.path.join(self.dump_dir, f"{slug}-{datetime.now():%Y%m%d-%H%M%S}.pstats")
+            self._cprofile.dump_stats(self.dump_path)
+        return self.total
+
+    def rows(self):
+        """The breakdown as table rows, nested spans indented under their parent."""
+        total = self.total or (time.perf_counter() - self.started)
+        return [
+            {
+                "Section": "· " * record["depth"] + name,
+                "Calls": record["calls"],
+                "Total (ms)": round(record["total"] * 1000, 1),
+                "Max (ms)": round(record["max"] * 1000, 1),
+                "% of rerun": round(record["total"] / total * 100, 1) if total else 0.0,
+            }
+            for name, record in self.spans.items()
+        ]
+
+    def top_functions(self, limit=TOP_FUNCTIONS):
+        """cProfile's top functions by cumulative time, as text (None without a dump)."""
+        if not self.dump_path:
+            return None
+        out = io.StringIO()
+        pstats.Stats(self.dump_path, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+
+def _requested_mode():
+    """None, "timings" or "cprofile", from the query string (this tab) or the environment (every tab)."""
+    value = os.getenv(PROFILE_ENV_VAR, "")
+    try:
+        import streamlit as st
+
+        value = st.query_params.get(PROFILE_QUERY_PARAM, value)
+    except Exception:  # not running under Streamlit
+        pass
+    value = str(value).strip().lower()
+    if value in _CPROFILE_VALUES:
+        return "cprofile"
+    if value in _ENABLED_VALUES:
+        return "timings"
+    return None
+
+
+def start_profiling(page):
+    """
+    Call at the top of a page. Returns the rerun's PageProfiler when profiling is requested,
+    otherwise None (and every span/@timed helper becomes a pass-through).
+    """
+    mode = _requested_mode()
+    profiler = PageProfiler(page, use_cprofile=mode == "cprofile") if mode else None
+    _active.set(profiler)
+    return profiler
+
+
+def finish_profiling():
+    """Call at the end of a page: renders the timing breakdown (when profiling) and ends the rerun's spans."""
+    profiler = _active.get()
+    if profiler is None:
+        return None
+    _active.set(None)
+    profiler.stop()
+
+    import pandas as pd
+    import streamlit as st
+
+    with st.expander(f"⏱️ Timing breakdown — {profiler.total * 1000:.0f} ms this rerun"):
+        st.dataframe(pd.DataFrame(profiler.rows()), hide_index=True, use_container_width=True)
+        if profiler.cprofile_error:
+            st.caption(f"cProfile unavailable: {profiler.cprofile_error}")
+        if profiler.dump_path:
+            st.caption(f"cProfile stats written to `{profiler.dump_path}` (open with `python -m pstats`)")
+            st.code(profiler.top_functions(), language="text")
+    return profiler
+
+
+@contextmanager
+def profile_page(page):
+    """Profiles the page body it wraps: `start_profiling` on entry, `finish_profiling` however it exits."""
+    profiler = start_profiling(page)
+    try:
+        yield profiler
+    finally:
+        finish_profiling()
+
+
+def span(name):
+    """Context manager timing a named section of the current rerun (a no-op unless profiling)."""
+    profiler = _active.get()
+    return _NO_SPAN if profiler is None else profiler.span(name)
+
+
+def timed(name=None):
+    """Decorator recording every call of a helper as a span (named after the function by default)."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = _active.get()
+            if profiler is None:
+                return func(*args, **kwargs)
+            with profiler.span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,392 @@
+"""
+Columnar (Parquet) materialization of the forecast store for the dashboard.
+
+Every cloud cover reading becomes one row of a long-format table:
+    location, location_key, date_for, lead_days, source, hour, cloud_cover, collected_at
+
+`location_key` is the location's partition name in the store (case- and
+punctuation-insensitive), which is what `load_table(location=...)` filters on.
+
+Strings are dictionary-encoded and values are stored as int8, so a page can
+read just the columns and locations it needs (column + row-group pruning)
+instead of re-flattening nested JSON on every rerun.
+
+The table lives next to the store (data/cloud_cover_table/) as part files.
+`refresh_table` only converts entries appended since the last refresh; the
+collector calls it after every run and pages call it when they notice the
+store has moved on. Refreshes are serialized across threads and processes (a
+lock file next to the table directory); reads take the same lock shared.
+
+The state file is the commit point: it lists the part files that make up the
+table next to the store bytes they cover, and is replaced atomically. Readers
+only open listed parts, so a refresh or compaction interrupted between writing
+a part and the state leaves a stray file (removed by the next refresh) rather
+than duplicate rows.
+"""
+import os
+import json
+import shutil
+import threading
+
+from contextlib import contextmanager
+
+import pandas as pd
+
+from weather_.storage import (
+    complete_length,
+    data_signature,
+    iter_segment_with_offsets,
+    list_store_segments,
+    load_legacy_file,
+    partition_name,
+    store_dir_for,
+)
+from cloud_cover_.helpers import parse_percent_column
+from cloud_cover_.profiling import timed
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: pages fall back to flattening JSON
+    pa = None
+    pq = None
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: refreshes are then only serialized within a process
+    fcntl = None
+
+TABLE_SUFFIX = "_table"
+LOCK_SUFFIX = ".lock"  # next to the table directory, which a rebuild removes
+STATE_FILENAME = "_state.json"  # leading underscore: ignored by the Parquet dataset reader
+PART_PREFIX = "part-"
+ROW_GROUP_SIZE = 50_000
+COLUMNS = ("location", "location_key", "date_for", "lead_days", "source", "hour", "cloud_cover", "collected_at")
+DICTIONARY_COLUMNS = ("location", "location_key", "source")
+MAX_PARTS = 64  # compact into a single part beyond this
+TABLE_VERSION = 3  # bump when the schema changes; older tables are rebuilt
+
+
+def table_dir_for(data_path):
+    """"data/cloud_cover.json" → "data/cloud_cover_table" """
+    return store_dir_for(data_path) + TABLE_SUFFIX
+
+
+def is_available():
+    return pa is not None
+
+
+_refresh_lock = threading.Lock()
+
+
+@contextmanager
+def _table_lock(table_dir, exclusive=True):
+    """Cross-process lock on a table: exclusive while it is rewritten, shared while it is read."""
+    os.makedirs(os.path.dirname(table_dir) or ".", exist_ok=True)
+    with open(table_dir + LOCK_SUFFIX, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _hour_from_label(label):
+    # "06:00 UTC" → 6
+    try:
+        return int(str(label).split(":")[0])
+    except ValueError:
+        return None
+
+
+def entries_to_rows(entries):
+    """
+    Flattens entries into raw column lists (one row per source × hour).
+    Dates, timestamps and percentages are left as stored; `rows_to_frame` parses them column-wise
+    (and derives location_key).
+    """
+    columns = {name: [] for name in COLUMNS if name != "location_key"}
+    hours = {}
+
+    for entry in entries:
+        try:
+            overview = entry["overview"]
+            location = entry["location"]
+            date_for = overview["date_for"]
+            lead_days = int(overview["num_of_days_between_forecast"])
+        except (KeyError, TypeError, ValueError):
+            continue  # Skip malformed entries
+        collected_at = overview.get("date_time_collected")
+
+        for source_block in entry.get("cloud_cover", []):
+            source = source_block.get("source")
+            if not source:
+                continue
+            for time_utc, percent in source_block.get("data", {}).items():
+                hour = hours.get(time_utc)
+                if hour is None:
+                    hour = hours[time_utc] = _hour_from_label(time_utc)
+                if hour is None:
+                    continue
+                columns["location"].append(location)
+                columns["date_for"].append(date_for)
+                columns["lead_days"].append(lead_days)
+                columns["source"].append(source)
+                columns["hour"].append(hour)
+                columns["cloud_cover"].append(percent)
+                columns["collected_at"].append(collected_at)
+
+    return columns
+
+
+def rows_to_frame(rows):
+    """Typed long-format DataFrame from `entries_to_rows` output, with rows whose date can't be parsed dropped."""
+    location = pd.Series(rows["location"], dtype="category")
+    frame = pd.DataFrame({
+        "location": location,
+        "location_key": location.map(partition_name).astype("category"),  # mapped per category, not per row
+        "date_for": pd.to_datetime(pd.Series(rows["date_for"], dtype="object"), format="%d/%m/%Y", errors="coerce"),
+        "lead_days": pd.Series(rows["lead_days"], dtype="int16"),
+        "source": pd.Categorical(rows["source"]),
+        "hour": pd.Series(rows["hour"], dtype="int8"),
+        "cloud_cover": parse_percent_column(rows["cloud_cover"]),
+        "collected_at": pd.to_datetime(pd.Series(rows["collected_at"], dtype="object"), format="%d/%m/%Y %H:%M", errors="coerce"),
+    })
+    return frame[frame["date_for"].notna()].reset_index(drop=True)
+
+
+def _to_arrow(frame):
+    return pa.table({
+        "location": pa.array(frame["location"].astype(str), pa.string()),
+        "location_key": pa.array(frame["location_key"].astype(str), pa.string()),
+        "date_for": pa.array(frame["date_for"].dt.date, pa.date32()),
+        "lead_days": pa.array(frame["lead_days"], pa.int16()),
+        "source": pa.array(frame["source"].astype(str), pa.string()),
+        "hour": pa.array(frame["hour"], pa.int8()),
+        "cloud_cover": pa.array(frame["cloud_cover"], pa.int8()),
+        "collected_at": pa.array(frame["collected_at"], pa.timestamp("s")),
+    })
+
+
+def _list_parts(table_dir):
+    """Every part file on disk, including ones a crashed refresh never committed."""
+    if not os.path.isdir(table_dir):
+        return []
+    return sorted(
+        os.path.join(table_dir, name) for name in os.listdir(table_dir)
+        if name.startswith(PART_PREFIX) and name.endswith(".parquet")
+    )
+
+
+def _committed_parts(table_dir, state):
+    return [os.path.join(table_dir, name) for name in (state or {}).get("parts", [])]
+
+
+def _remove_uncommitted_parts(table_dir, state):
+    committed = set(_committed_parts(table_dir, state))
+    for path in _list_parts(table_dir):
+        if path not in committed:
+            os.remove(path)
+
+
+def _write_part(table_dir, table):
+    """Writes a part file and returns its name; it only becomes part of the table once the state lists it."""
+    # Sort so row-group min/max statistics line up with location/date filters, then dictionary-encode strings
+    for name in DICTIONARY_COLUMNS:
+        i = table.schema.get_field_index(name)
+        table = table.set_column(i, name, table.column(name).cast(pa.string()))
+    table = table.sort_by([("location_key", "ascending"), ("date_for", "ascending")])
+    for name in DICTIONARY_COLUMNS:
+        i = table.schema.get_field_index(name)
+        table = table.set_column(i, name, table.column(name).dictionary_encode())
+    parts = _list_parts(table_dir)
+    number = int(os.path.basename(parts[-1])[len(PART_PREFIX):-len(".parquet")]) + 1 if parts else 1
+    path = os.path.join(table_dir, f"{PART_PREFIX}{number:06d}.parquet")
+    tmp_path = path + ".tmp"
+    pq.write_table(table, tmp_path, row_group_size=ROW_GROUP_SIZE, compression="zstd")
+    os.replace(tmp_path, path)
+    return os.path.basename(path)
+
+
+def _read_state(table_dir):
+    try:
+        with open(os.path.join(table_dir, STATE_FILENAME), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_state(table_dir, state):
+    path = os.path.join(table_dir, STATE_FILENAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _source_state(data_path):
+    """What the table should cover: bytes per store segment, or the legacy file's signature."""
+    directory = store_dir_for(data_path)
+    segments = list_store_segments(directory)
+    if segments:
+        return {"segments": {os.path.relpath(p, directory): os.path.getsize(p) for p in segments}}
+    return {"legacy": [list(s) for s in data_signature(data_path)]}
+
+
+def is_fresh(data_path):
+    """True when the table already covers everything in the store."""
+    state = _read_state(table_dir_for(data_path))
+    if not state or state.get("version") != TABLE_VERSION:
+        return False
+    return {k: state.get(k) for k in ("segments", "legacy") if k in state} == _source_state(data_path)
+
+
+def refresh_table(data_path):
+    """
+    Brings the Parquet table up to date with the store behind data_path, converting only
+    entries appended since the last refresh. Returns the number of rows added.
+    """
+    if not is_available():
+        raise ImportError("pyarrow is required to materialize the cloud cover table")
+
+    table_dir = table_dir_for(data_path)
+    with _refresh_lock, _table_lock(table_dir):
+        # Another session (or the collector) may have refreshed it while we waited for the lock
+        if is_fresh(data_path):
+            return 0
+        return _refresh_locked(data_path, table_dir)
+
+
+def _refresh_locked(data_path, table_dir):
+    state = _read_state(table_dir) or {}
+    if state.get("version") != TABLE_VERSION:
+        state = {}
+    _remove_uncommitted_parts(table_dir, state)
+    directory = store_dir_for(data_path)
+    segments = list_store_segments(directory)
+
+    # Legacy JSON file (not migrated yet): materialize it in one go whenever it changes
+    if not segments:
+        target = _source_state(data_path)
+        if state.get("legacy") == target["legacy"]:
+            return 0
+        _reset(table_dir)
+        frame = rows_to_frame(entries_to_rows(load_legacy_file(data_path) if target["legacy"] else []))
+        parts = [_write_part(table_dir, _to_arrow(frame))] if len(frame) else []
+        _write_state(table_dir, {"version": TABLE_VERSION, "parts": parts, **target})
+        return len(frame)
+
+    covered = state.get("segments")
+    sizes = {os.path.relpath(p, directory): os.path.getsize(p) for p in segments}
+    if covered is None or any(name not in sizes or sizes[name] < size for name, size in covered.items()):
+        _reset(table_dir)  # first run, or the store was rewritten: rebuild from scratch
+        covered = {}
+        state = {}
+
+    new_entries = []
+    new_covered = dict(covered)
+    for path in segments:
+        name = os.path.relpath(path, directory)
+        start = covered.get(name, 0)
+        if sizes[name] <= start:
+            continue
+        new_entries.extend(entry for _, entry in iter_segment_with_offsets(path, start))
+        new_covered[name] = complete_length(path, start)
+
+    frame = rows_to_frame(entries_to_rows(new_entries))
+    parts = list(state.get("parts", []))
+    if len(frame):
+        parts.append(_write_part(table_dir, _to_arrow(frame)))
+    _write_state(table_dir, {"version": TABLE_VERSION, "parts": parts, "segments": new_covered})
+
+    if len(parts) > MAX_PARTS:
+        _compact(table_dir)
+
+    if len(frame):
+        print(f"🧱 Materialized {len(frame)} rows into {table_dir}", flush=True)
+    return len(frame)
+
+
+def compact_table(data_path):
+    """Rewrites all part files into one (fewer files → faster scans)."""
+    table_dir = table_dir_for(data_path)
+    with _refresh_lock, _table_lock(table_dir):
+        _compact(table_dir)
+
+
+def _compact(table_dir):
+    state = _read_state(table_dir)
+    parts = _committed_parts(table_dir, state)
+    if len(parts) <= 1:
+        return
+    table = pa.concat_tables([pq.read_table(p) for p in parts])
+    # Swap the merged part in through the state before deleting the old ones
+    _write_state(table_dir, {**state, "parts": [_write_part(table_dir, table)]})
+    for p in parts:
+        os.remove(p)
+
+
+def _reset(table_dir):
+    if os.path.isdir(table_dir):
+        shutil.rmtree(table_dir)
+    os.makedirs(table_dir, exist_ok=True)
+
+
+def load_table(data_path, columns=None, location=None, lead_days=None, refresh=True):
+    """
+    Reads the materialized table as a DataFrame, pruning columns and row groups.
+    Refreshes it first (incrementally) when the store has new data.
+    Returns None when pyarrow is unavailable or the table can't be built.
+    """
+    if not is_available():
+        return None
+
+    if refresh and not is_fresh(data_path):
+        try:
+            refresh_table(data_path)
+        except OSError as e:
+            print(f"⚠️ Could not refresh cloud cover table: {e}", flush=True)
+            return None
+
+    filters = []
+    if location is not None:
+        # Same normalization as the store's partitions: "london" and "London" are one location
+        filters.append(("location_key", "==", partition_name(location)))
+    if lead_days is not None:
+        filters.append(("lead_days", "==", lead_days))
+
+    table_dir = table_dir_for(data_path)
+    with _table_lock(table_dir, exclusive=False):  # no compaction or rebuild mid-read
+        parts = _committed_parts(table_dir, _read_state(table_dir))
+        if not parts:
+            return None
+        return pq.read_table(parts, columns=columns, filters=filters or None).to_pandas()
+
+
+@timed()
+def load_timeline(data_path, location, lead_days=0):
+    """
+    The timeline DataFrame used by the Cloud Cover page (same shape as build_timeline_frame),
+    read straight from the table. Returns None when the table is unavailable.
+    """
+    df = load_table(
+        data_path,
+        columns=["location", "date_for", "source", "hour", "cloud_cover"],
+        location=location,
+        lead_days=lead_days,
+    )
+    if df is None:
+        return None
+
+    df_timeline = pd.DataFrame({
+        "Date": pd.to_datetime(df["date_for"]),
+        "Time": df["hour"].map(lambda h: f"{int(h):02d}:00 UTC"),
+        "Cloud Cover (%)": df["cloud_cover"].astype("Int64"),
+        "Source": df["source"].astype(str),
+        "Location": df["location"].astype(str),
+    })
+    df_timeline = df_timeline.sort_values(["Date", "Source", "Time"], kind="stable").reset_index(drop=True)
+    df_timeline["Tooltip Label"] = df_timeline["Cloud Cover (%)"].apply(lambda x: f"{x}%" if x is not None else "—")
+    return df_timeline
@@ -3,3 +3,11 @@ from enum import Enum
 class WeatherProvider(str, Enum):
     OPENWEATHERMAP = "OPENWEATHERMAP"
     OPENMETEO = "OPENMETEO"
+
+    @property
+    def source_name(self):
+        """Short name used in logs and metrics, e.g. "OpenMeteo"."""
+        return {
+            WeatherProvider.OPENWEATHERMAP: "OpenWeatherMap",
+            WeatherProvider.OPENMETEO: "OpenMeteo",
+        }[self]
@@ -0,0 +1,105 @@
+"""
+Vectorized forecast-accuracy engine.
+
+Forecasts made N days ahead are aligned to the 0-day actuals with a single
+join on (location, date_for, source, hour), and every metric is computed with
+grouped pandas/NumPy operations — no per-cell Python loops.
+"""
+import numpy as np
+import pandas as pd
+
+from weather_.storage import load_entries
+from cloud_cover_.table import entries_to_rows, load_table, rows_to_frame
+
+KEY_COLUMNS = ["location", "date_for", "source", "hour"]
+FRAME_COLUMNS = ["location", "date_for", "lead_days", "source", "hour", "cloud_cover"]
+
+# Same time blocks as cloud_cover_.helpers.average_cloud_cover_by_block
+HOUR_BLOCKS = {6: "morning", 9: "morning", 12: "afternoon", 15: "afternoon", 18: "evening"}
+
+
+def forecast_frame(entries):
+    """Long-format frame (location, date_for, lead_days, source, hour, cloud_cover) from raw entries."""
+    return rows_to_frame(entries_to_rows(entries))[FRAME_COLUMNS]
+
+
+def load_forecast_frame(data_path, location=None, entries=None):
+    """
+    Long-format frame for one location (or all), read from the columnar table when available,
+    otherwise flattened from `entries` (or the store behind data_path).
+    """
+    frame = load_table(data_path, columns=FRAME_COLUMNS, location=location)
+    if frame is not None:
+        return frame
+
+    if entries is None:
+        entries = load_entries(data_path)
+    if location is not None:
+        entries = [e for e in entries if e.get("location") == location]
+    return forecast_frame(entries)
+
+
+def align_forecasts(frame, lead_days=None):
+    """
+    Joins every forecast (lead_days > 0, or the given leads) to the matching 0-day actual.
+    Returns one row per comparison with forecast, actual and error (forecast - actual) columns.
+    The first entry per (location, date_for, lead, source, hour) wins, like the stored data's dedup.
+    """
+    frame = frame.dropna(subset=["cloud_cover"])
+
+    actuals = (
+        frame[frame["lead_days"] == 0]
+        .drop_duplicates(subset=KEY_COLUMNS, keep="first")
+        [KEY_COLUMNS + ["cloud_cover"]]
+        .rename(columns={"cloud_cover": "actual"})
+    )
+
+    forecasts = frame[frame["lead_days"] > 0] if lead_days is None else frame[frame["lead_days"].isin(list(lead_days))]
+    forecasts = (
+        forecasts
+        .drop_duplicates(subset=KEY_COLUMNS + ["lead_days"], keep="first")
+        .rename(columns={"cloud_cover": "forecast"})
+    )
+
+    aligned = forecasts.merge(actuals, on=KEY_COLUMNS, how="inner")
+    aligned["forecast"] = aligned["forecast"].astype("float64")
+    aligned["actual"] = aligned["actual"].astype("float64")
+    aligned["error"] = aligned["forecast"] - aligned["actual"]
+    aligned["block"] = aligned["hour"].map(HOUR_BLOCKS).fillna("other")
+    return aligned
+
+
+def accuracy_metrics(aligned, tolerance=10, by=("source", "lead_days", "block")):
+    """
+    Hit rate within ±tolerance, MAE, RMSE and bias per group.
+    `by` can be any subset of the aligned columns (e.g. ("source",) or ("source", "lead_days", "hour")).
+    """
+    by = list(by)
+    columns = by + ["comparisons", "hits", "hit_rate", "mae", "rmse", "bias"]
+    if aligned.empty:
+        return pd.DataFrame(columns=columns)
+
+    error = aligned["error"].to_numpy()
+    work = aligned[by].copy()
+    work["hit"] = np.abs(error) <= tolerance
+    work["abs_error"] = np.abs(error)
+    work["sq_error"] = error ** 2
+    work["error"] = error
+
+    grouped = work.groupby(by, observed=True, sort=True)
+    result = grouped.agg(
+        comparisons=("error", "size"),
+        hits=("hit", "sum"),
+        mae=("abs_error", "mean"),
+        mse=("sq_error", "mean"),
+        bias=("error", "mean"),
+    ).reset_index()
+    result["hit_rate"] = result["hits"] / result["comparisons"] * 100
+    result["rmse"] = np.sqrt(result.pop("mse"))
+    return result[columns]
+
+
+def evaluate_accuracy(entries_or_frame, tolerance=10, lead_days=None, by=("source", "lead_days", "block")):
+    """One-call convenience: entries (or a long-format frame) → metrics table."""
+    frame = entries_or_frame if isinstance(entries_or_frame, pd.DataFrame) else forecast_frame(entries_or_frame)
+    return accuracy_metrics(align_forecasts(frame, lead_days=lead_days), tolerance=tolerance, by=by)
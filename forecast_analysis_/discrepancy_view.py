@@ -7,6 +7,7 @@ from forecast_analysis_.helpers import (
     build_discrepancy_map,
     get_discrepancies_for_date
 )
+from cloud_cover_.profiling import span, timed
 
 # 🎨 Generate red hues for visual differentiation by hour
 HOUR_COLORS = {}
@@ -17,15 +18,17 @@ palette = palette[:len(available_hours)]
 for i, hour in enumerate(available_hours):
     HOUR_COLORS[hour] = palette[i]
 
-def render_discrepancy_checker(filtered_entries, selected_location):
+@timed()
+def render_discrepancy_checker(filtered_entries, selected_location, grouped=None):
     st.markdown("## 🔍 Prediction Discrepancy Checker")
 
     if not filtered_entries:
         st.info("No forecast entries found for this location.")
         return
 
-    # Step 1: Build grouped map
-    grouped = build_discrepancy_map(filtered_entries)
+    # Step 1: Build grouped map (callers may pass a cached one)
+    if grouped is None:
+        grouped = build_discrepancy_map(filtered_entries)
     location_data = grouped.get(selected_location, {})
 
     if not location_data:
@@ -113,7 +116,8 @@ def render_discrepancy_checker(filtered_entries, selected_location):
             base_color = HOUR_COLORS.get(hour, "#ffcccc")
             return [f"background-color: {base_color}; color: black" if key in highlights else "" for _ in row]
 
-        styled = df.style.apply(highlight_func, axis=1)
-        st.dataframe(styled, use_container_width=True)
+        with span("discrepancy table styling"):
+            styled = df.style.apply(highlight_func, axis=1)
+            st.dataframe(styled, use_container_width=True)
 
         return threshold
@@ -3,104 +3,69 @@ import json
 from collections import defaultdict
 import pandas as pd
 
-DATA_FILE = os.path.join("data", "cloud_cover.json")
+from weather_.storage import store_dir_for
+from cloud_cover_.data_loader import load_dataset
+from cloud_cover_.helpers import parse_percent_column
+from cloud_cover_.profiling import timed
 
-from collections import defaultdict
-import pandas as pd
+from forecast_analysis_.accuracy import evaluate_accuracy
 
-def evaluate_source_accuracy(all_data, tolerance=10):
+DATA_FILE = os.path.join("data", "cloud_cover.json")
+
+@timed()
+def evaluate_source_accuracy(all_data, tolerance=10, lead_days=(3, 5)):
     """
-    Compare 3-day and 5-day forecast sources against 0-day actuals.
+    Compare N-day forecast sources (3-day and 5-day by default) against 0-day actuals.
     Returns a DataFrame ranking each source by accuracy (% match within tolerance).
+    Pass lead_days=None to include every forecast horizon in the data.
     """
+    if tolerance is None:
+        tolerance = 10
+
+    metrics = evaluate_accuracy(all_data, tolerance=tolerance, lead_days=lead_days, by=("source",))
+    return _format_source_accuracy(metrics, tolerance)
 
-    forecast_map = defaultdict(lambda: defaultdict(list))
-    source_accuracy = defaultdict(lambda: {"total": 0, "correct": 0})
-
-    # Step 1: Group entries by location + date
-    for entry in all_data:
-        try:
-            location = entry["location"]
-            date_for = entry["overview"]["date_for"]
-            days_before = entry["overview"]["num_of_days_between_forecast"]
-        except KeyError:
-            continue  # Skip malformed entries
-
-        key = f"{location}_{date_for}"
-        forecast_map[key][days_before].append(entry)
-
-    # Step 2: Compare forecasts (3-day, 5-day) to 0-day actuals
-    for key, forecasts in forecast_map.items():
-        if 0 not in forecasts:
-            continue  # No actuals to compare against
-
-        actual_entry = forecasts[0][0]  # Assume one actual per date/location
-        actual_sources = {
-            s["source"]: s["data"]
-            for s in actual_entry.get("cloud_cover", [])
-            if "source" in s and "data" in s
-        }
-
-        for days_before in [3, 5]:
-            if days_before not in forecasts:
-                continue
-
-            prediction_entry = forecasts[days_before][0]
-            for pred_source in prediction_entry.get("cloud_cover", []):
-                source_name = pred_source.get("source")
-                predicted = pred_source.get("data", {})
-
-                if source_name not in actual_sources:
-                    continue  # No matching actual source to compare against
-
-                actual = actual_sources[source_name]
-
-                for time in predicted:
-                    if time in actual:
-                        try:
-                            pred_val = int(predicted[time].strip('%'))
-                            actual_val = int(actual[time].strip('%'))
-
-                            source_accuracy[source_name]["total"] += 1
-                            if abs(pred_val - actual_val) <= tolerance:
-                                source_accuracy[source_name]["correct"] += 1
-                        except Exception:
-                            continue
-
-    # Step 3: Format results
-    results = [
-        {
-            "Source": source,
-            "Total Comparisons": vals["total"],
-            f"Correct (≤±{tolerance}%)": vals["correct"],
-            "Accuracy (%)": round((vals["correct"] / vals["total"]) * 100, 2)
-            if vals["total"] > 0 else 0
-        }
-        for source, vals in source_accuracy.items()
-    ]
-
-    if not results:
+@timed()
+def source_accuracy_from_aggregates(aggregates, tolerance=10, location=None, lead_days=(3, 5)):
+    """
+    Same ranking as evaluate_source_accuracy, read from the running accuracy aggregates
+    (weather_/accuracy_aggregates.py) instead of a pass over the history.
+    """
+    if tolerance is None:
+        tolerance = 10
+
+    metrics = aggregates.metrics(tolerance=tolerance, by=("source",), location=location, lead_days=lead_days)
+    return _format_source_accuracy(metrics, tolerance)
+
+def _format_source_accuracy(metrics, tolerance):
+    if metrics.empty:
         return pd.DataFrame()  # Empty DataFrame = no results
 
-    return pd.DataFrame(results).sort_values("Accuracy (%)", ascending=False)
+    results = pd.DataFrame({
+        "Source": metrics["source"],
+        "Total Comparisons": metrics["comparisons"].astype(int),
+        f"Correct (≤±{tolerance}%)": metrics["hits"].astype(int),
+        "Accuracy (%)": metrics["hit_rate"].round(2),
+    })
+    return results.sort_values("Accuracy (%)", ascending=False)
 
-def load_forecast_data(filepath=DATA_FILE):
-    if not os.path.exists(filepath):
+def load_forecast_data(filepath=DATA_FILE, location=None):
+    if not os.path.exists(filepath) and not os.path.isdir(store_dir_for(filepath)):
         print(f"❌ File not found: {filepath}")
         return []
 
     try:
-        with open(filepath, "r") as f:
-            data = json.load(f)
-            if isinstance(data, list):
-                return data
-            else:
-                print("⚠️ Unexpected format: data is not a list.")
-                return []
+        data = load_dataset(filepath, location=location).entries
+        if isinstance(data, (list, tuple)):
+            return data
+        else:
+            print("⚠️ Unexpected format: data is not a list.")
+            return []
     except json.JSONDecodeError as e:
         print(f"❌ Failed to decode JSON: {e}")
         return []
     
+@timed()
 def build_discrepancy_map(entries):
     """
     Group forecast entries by location → date_for → source → list of forecasts.
@@ -128,6 +93,7 @@ def build_discrepancy_map(entries):
 
     return prediction_map
 
+@timed()
 def get_discrepancies_for_date(source_data_by_day, threshold, filter_days=None):
     """
     Returns:
@@ -151,20 +117,20 @@ def get_discrepancies_for_date(source_data_by_day, threshold, filter_days=None):
             data = forecast.get("data", {})
 
             for hour, val in data.items():
-                try:
-                    value = int(str(val).strip('%'))
-                except (ValueError, TypeError):
-                    value = None
-
                 all_rows.append({
                     "Hour": hour,
                     "Source": source,
                     "Days Before": days_label,
-                    "Cloud Cover (%)": value
+                    "Cloud Cover (%)": val
                 })
 
-                if value is not None:
-                    hour_values_by_time[hour].append((value, source, days_label))
+    # 🔢 Parse every value in one pass
+    parsed = parse_percent_column([row["Cloud Cover (%)"] for row in all_rows])
+    for row, value in zip(all_rows, parsed):
+        value = None if pd.isna(value) else int(value)
+        row["Cloud Cover (%)"] = value
+        if value is not None:
+            hour_values_by_time[row["Hour"]].append((value, row["Source"], row["Days Before"]))
 
     # ✅ Now detect discrepancies
     for hour, values in hour_values_by_time.items():
@@ -1,167 +1,179 @@
 import streamlit as st
 import os
-import pandas as pd
 from datetime import datetime
 
 
-from cloud_cover_.helpers import is_sunny_day, flatten_cloud_cover, get_sunny_blocks, get_combined_block_averages
-from cloud_cover_.data_loader import load_data, get_filtered_data
-from cloud_cover_.charts import build_pie_chart, build_time_chart
-
-st.set_page_config(page_title="☁️ Cloud Cover", page_icon="🌞")
-
-# put near the top, after set_page_config
-st.markdown("""
-<style>
-/* Make Altair chart blocks scroll vertically within a fixed viewport height */
-div[data-testid="stVegaLiteChart"] {
-  max-height: 78vh;
-  min-width: 50vw;
-  overflow-y: auto;
-  overscroll-behavior: contain;
-  border: 1px solid #e6e6e6;
-  border-radius: 10px;
-  padding: 8px;
-}
-
-/* Let inner vega container size naturally; wrapper handles scrolling */
-div[data-testid="stVegaLiteChart"] > div {
-  height: auto !important;
-}
-</style>
-""", unsafe_allow_html=True)
-
-
-st.title("☁️ Cloud Cover")
-st.text("NOTE: Our charts only show 0-day (on-the-day) forecasts and not future predictions")
-
-DATA_PATH = os.path.join("data", "cloud_cover.json")
-data = load_data(DATA_PATH)
-
-if not data:
-    st.error("No weather data found.")
-    st.stop()
-
-locations = sorted(set(entry["location"] for entry in data))
-selected_location = st.sidebar.selectbox("Select a location", locations)
-filtered = get_filtered_data(data, selected_location)
-
-actuals_only = [
-    e for e in filtered
-    if e["overview"]["num_of_days_between_forecast"] == 0
-]
-
-if not actuals_only:
-    st.warning("⚠️ No 0-day (actual) forecast data available yet for this location.")
-    st.stop()
-
-# ========== 📈 Timeline Charts ============# 
-timeline_data = []
-for entry in actuals_only:
-    timeline_data.extend(flatten_cloud_cover(entry))
-
-# dataframe timeline
-df_timeline = pd.DataFrame(timeline_data)
-df_timeline["Date"] = pd.to_datetime(df_timeline["Date"])
-df_timeline["Cloud Cover (%)"] = (
-    pd.to_numeric(df_timeline["Cloud Cover (%)"], errors="coerce")
-    .round()
-    .astype("Int64")   # nullable integer dtype, supports <NA>
-)
-df_timeline["Tooltip Label"] = df_timeline["Cloud Cover (%)"].apply(lambda x: f"{x}%" if x is not None else "—")
-
-# display the number of date entries we have in our dataset
-st.write("📅 Unique Dates in Timeline:", df_timeline["Date"].nunique())
-
-
-st.subheader("☁️ Cloud Cover by Source")
-st.altair_chart(build_time_chart(df_timeline, facet_by_date=True), use_container_width=True)
-
-
-# Unique options from your dataframe
-available_dates = sorted(
-    {e["overview"]["date_for"] for e in actuals_only},
-    key=lambda d: datetime.strptime(d, "%d/%m/%Y")
+from cloud_cover_.helpers import (
+    BlockAverageMatrix,
+    build_timeline_frame,
+    slice_timeline,
+    summarize_timeline,
+    timeline_windows,
 )
-available_sources = sorted(df_timeline["Source"].unique())
+from cloud_cover_.data_loader import load_dataset, load_locations
+from cloud_cover_.charts import build_pie_chart, build_summary_chart, build_time_chart
+from cloud_cover_.table import load_timeline
+from cloud_cover_.profiling import profile_page, span
 
-# Sidebar filters
-selected_date = st.sidebar.selectbox("Select a date to filter cloud cover trends", available_dates)
-selected_sources = st.sidebar.multiselect(
-    "Select weather data sources to filter", available_sources, default=available_sources
-)
+st.set_page_config(page_title="☁️ Cloud Cover", page_icon="🌞")
+# Timing breakdown with ?profile=1 (or SUNNY_DAYZZ_PROFILE=1); free when off. Profiling ends with
+# the body, even when st.stop() or an error cuts the rerun short.
+with profile_page("Cloud Cover"):
+    # put near the top, after set_page_config
+    st.markdown("""
+    <style>
+    /* Make Altair chart blocks scroll vertically within a fixed viewport height */
+    div[data-testid="stVegaLiteChart"] {
+      max-height: 78vh;
+      min-width: 50vw;
+      overflow-y: auto;
+      overscroll-behavior: contain;
+      border: 1px solid #e6e6e6;
+      border-radius: 10px;
+      padding: 8px;
+    }
+
+    /* Let inner vega container size naturally; wrapper handles scrolling */
+    div[data-testid="stVegaLiteChart"] > div {
+      height: auto !important;
+    }
+    </style>
+    """, unsafe_allow_html=True)
+
+
+    st.title("☁️ Cloud Cover")
+    st.text("NOTE: Our charts only show 0-day (on-the-day) forecasts and not future predictions")
+
+    DATA_PATH = os.path.join("data", "cloud_cover.json")
+
+    # Locations come from the store manifest; only the selected location's partition is read
+    locations = load_locations(DATA_PATH)
+
+    if not locations:
+        st.error("No weather data found.")
+        st.stop()
+
+    selected_location = st.sidebar.selectbox("Select a location", locations)
+
+    # Parsed once per change of this location's data and shared across reruns/sessions; derived values are memoized on it
+    dataset = load_dataset(DATA_PATH, location=selected_location)
+
+    actuals_only = dataset.derive("actuals", lambda entries: [
+        e for e in entries
+        if e["overview"]["num_of_days_between_forecast"] == 0
+    ])
+
+    if not actuals_only:
+        st.warning("⚠️ No 0-day (actual) forecast data available yet for this location.")
+        st.stop()
+
+    # ========== 📈 Timeline Charts ============# 
+    # dataframe timeline (read-only: filter with copies, never modify in place)
+    # Read from the columnar table (only this location's 0-day rows); fall back to flattening JSON without pyarrow
+    def _timeline_for_location(_):
+        df = load_timeline(DATA_PATH, selected_location, lead_days=0)
+        return df if df is not None else build_timeline_frame(actuals_only)
+
+    with span("timeline frame"):
+        df_timeline = dataset.derive("timeline", _timeline_for_location)
+
+    # display the number of date entries we have in our dataset
+    st.write("📅 Unique Dates in Timeline:", df_timeline["Date"].nunique())
+
+
+    st.subheader("☁️ Cloud Cover by Source")
+
+    # Only one window of days is drawn at full resolution (one facet per date); page back through
+    # older windows with the slider. Everything before the latest window is also summarized below.
+    windows = dataset.derive("timeline_windows", lambda _: timeline_windows(df_timeline))
+    if not windows:
+        # 0-day entries exist, but none has a readable date (nothing to chart or filter by)
+        st.info("No dated cloud cover readings to chart for this location yet.")
+        st.stop()
+    window_labels = [f"{start:%d/%m/%Y} – {end:%d/%m/%Y}" for start, end in windows]
+    if len(window_labels) > 1:
+        selected_window = st.select_slider("📅 Dates shown in detail", options=window_labels, value=window_labels[-1])
+    else:
+        selected_window = window_labels[0]
+    window_start, window_end = windows[window_labels.index(selected_window)]
 
-filtered_df = df_timeline[
-    (df_timeline["Date"].dt.strftime("%d/%m/%Y") == selected_date) &
-    (df_timeline["Source"].isin(selected_sources))
-].copy()
+    with span("timeline charts"):
+        df_window = dataset.derive(("timeline_window", selected_window), lambda _: slice_timeline(df_timeline, window_start, window_end))
+        st.altair_chart(build_time_chart(df_window, facet_by_date=True), use_container_width=True)
 
-# chart 2 title
-st.markdown("## ☁️ Cloud Cover Trend (Filtered)")
+        df_summary = dataset.derive("timeline_summary", lambda _: summarize_timeline(df_timeline, before=windows[-1][0]))
+        if not df_summary.empty:
+            st.subheader("📆 Earlier Days (weekly & monthly means)")
+            st.altair_chart(build_summary_chart(df_summary), use_container_width=True)
 
-# display chart 2
-st.altair_chart(build_time_chart(filtered_df), use_container_width=True)
 
-# set threshold for sunny day/time-block
-sunny_threshold = st.sidebar.slider(
-    "Define cloudy threshold (%)", 20, 65, 35,
-)
-st.sidebar.caption(
-    "☀️ This slider lets you define what percentage of cloud cover for any particular day/time-period you still clasify as 'sunny'.\n"
-    "A lower threshold means you're more strict (e.g., setting it to 20% means that 21% cloud cover for any day would count as a cloudy day),\n"
-    "while a higher threshold allows for more clouds in your 'sunny' days/mornings/afternoons/evenings."
-)
+    # Unique options from your dataframe
+    available_dates = sorted(
+        {e["overview"]["date_for"] for e in actuals_only},
+        key=lambda d: datetime.strptime(d, "%d/%m/%Y")
+    )
+    available_sources = sorted(df_timeline["Source"].unique())
 
-selected_block = st.sidebar.radio(
-    "Select time block to view (for block pie chart)",
-    ["morning", "afternoon", "evening"],
-)
+    # Sidebar filters
+    selected_date = st.sidebar.selectbox("Select a date to filter cloud cover trends", available_dates)
+    selected_sources = st.sidebar.multiselect(
+        "Select weather data sources to filter", available_sources, default=available_sources
+    )
 
-# get sunny days pie chart
-zero_day = [
-    e for e in filtered
-    if e["overview"]["num_of_days_between_forecast"] == 0
-]
+    with span("filtered trend"):
+        filtered_df = df_timeline[
+            (df_timeline["Date"].dt.strftime("%d/%m/%Y") == selected_date) &
+            (df_timeline["Source"].isin(selected_sources))
+        ].copy()
 
-sunny_days = []
-cloudy_days = []
+        # chart 2 title
+        st.markdown("## ☁️ Cloud Cover Trend (Filtered)")
 
-for entry in zero_day:
-    block_averages = get_combined_block_averages(entry, selected_sources)
+        # display chart 2
+        st.altair_chart(build_time_chart(filtered_df), use_container_width=True)
 
-    if is_sunny_day(block_averages, sunny_threshold):
-        sunny_days.append(entry)
-    else:
-        cloudy_days.append(entry)
+    # set threshold for sunny day/time-block
+    sunny_threshold = st.sidebar.slider(
+        "Define cloudy threshold (%)", 20, 65, 35,
+    )
+    st.sidebar.caption(
+        "☀️ This slider lets you define what percentage of cloud cover for any particular day/time-period you still clasify as 'sunny'.\n"
+        "A lower threshold means you're more strict (e.g., setting it to 20% means that 21% cloud cover for any day would count as a cloudy day),\n"
+        "while a higher threshold allows for more clouds in your 'sunny' days/mornings/afternoons/evenings."
+    )
 
-st.markdown("## ☀️ Sunny vs Cloudy Days")
+    selected_block = st.sidebar.radio(
+        "Select time block to view (for block pie chart)",
+        ["morning", "afternoon", "evening"],
+    )
 
-st.metric("Total Days", len(zero_day))
-st.metric("☀️ Sunny Days", len(sunny_days))
-st.metric("🌥️ Cloudy Days", len(cloudy_days))
+    # get sunny days pie chart
+    # Block averages are parsed once per dataset; each source selection keeps sorted averages,
+    # so moving the threshold slider is just a binary search
+    with span("sunny counts"):
+        block_matrix = dataset.derive("block_matrix", lambda _: BlockAverageMatrix(actuals_only))
+        counts = block_matrix.for_sources(selected_sources)
 
-st.altair_chart(build_pie_chart(sunny_days, cloudy_days, use_len=True), use_container_width=True)
+    total_days = counts.total
+    sunny_days = counts.sunny_days(sunny_threshold)
+    cloudy_days = total_days - sunny_days
 
-# get sunny time-block pie chart
-sunny_blocks = 0
-cloudy_blocks = 0
+    st.markdown("## ☀️ Sunny vs Cloudy Days")
 
-for entry in zero_day:
-    block_averages = get_combined_block_averages(entry, selected_sources)
-    block_status = get_sunny_blocks(block_averages, sunny_threshold)
+    st.metric("Total Days", total_days)
+    st.metric("☀️ Sunny Days", sunny_days)
+    st.metric("🌥️ Cloudy Days", cloudy_days)
 
-    # This is where you use it:
-    is_block_sunny = block_status.get(selected_block)
+    st.altair_chart(build_pie_chart(sunny_days, cloudy_days), use_container_width=True)
 
-    if is_block_sunny is True:
-        sunny_blocks += 1
-    elif is_block_sunny is False:
-        cloudy_blocks += 1
+    # get sunny time-block pie chart
+    sunny_blocks = counts.sunny_blocks(selected_block, sunny_threshold)
+    cloudy_blocks = total_days - sunny_blocks
 
 
-st.markdown(f"## 🌤️ Sunny vs Cloudy ({selected_block.capitalize()}s Only)")
+    st.markdown(f"## 🌤️ Sunny vs Cloudy ({selected_block.capitalize()}s Only)")
 
-st.metric("☀️ Sunny Blocks", sunny_blocks)
-st.metric("🌥️ Cloudy Blocks", cloudy_blocks)
+    st.metric("☀️ Sunny Blocks", sunny_blocks)
+    st.metric("🌥️ Cloudy Blocks", cloudy_blocks)
 
-st.altair_chart(build_pie_chart(sunny_blocks, cloudy_blocks), use_container_width=True)
\ No newline at end of file
+    st.altair_chart(build_pie_chart(sunny_blocks, cloudy_blocks), use_container_width=True)
@@ -1,34 +1,67 @@
 import streamlit as st
 
-from forecast_analysis_.helpers import evaluate_source_accuracy, load_forecast_data
+from cloud_cover_.data_loader import load_dataset, load_locations
+from forecast_analysis_.helpers import DATA_FILE, build_discrepancy_map, source_accuracy_from_aggregates
 from forecast_analysis_.discrepancy_view import render_discrepancy_checker
+from weather_.accuracy_aggregates import load_aggregates
+from cloud_cover_.profiling import profile_page, span
 
 st.set_page_config(page_title="📊 Forecast Accuracy", page_icon="🌞")
-st.title("📊 Forecast Accuracy & Discrepancy Analysis")
+# Timing breakdown with ?profile=1 (or SUNNY_DAYZZ_PROFILE=1); free when off. Profiling ends with
+# the body, even when st.stop() or an error cuts the rerun short.
+with profile_page("Forecast Analysis"):
+    st.title("📊 Forecast Accuracy & Discrepancy Analysis")
 
-st.markdown("""
-Here we analyze how predictions made **3 or 5 days in advance** compare to the actual weather recorded on those days.
-""")
+    st.markdown("""
+    Here we analyze how predictions made **3 or 5 days in advance** compare to the actual weather recorded on those days.
+    """)
 
-# Load the data
-all_data = load_forecast_data()
+    # Sidebar location filter, served from the store manifest
+    locations = load_locations(DATA_FILE)
+    selected_location = st.sidebar.selectbox("Select a location", locations)
 
-# Sidebar location filter
-locations = sorted(set(entry["location"] for entry in all_data))
-selected_location = st.sidebar.selectbox("Select a location", locations)
+    # Only the selected location's partition is read (parsed once per change, shared across reruns/sessions)
+    dataset = load_dataset(DATA_FILE, location=selected_location)
+    filtered = dataset.entries
+    grouped = dataset.derive("discrepancy_map", build_discrepancy_map)
 
-# Filter entries for selected location
-filtered = [entry for entry in all_data if entry["location"] == selected_location]
+    # Pass filtered entries and selected location
+    threshold = render_discrepancy_checker(filtered, selected_location, grouped=grouped)
 
-# Pass filtered entries and selected location
-threshold = render_discrepancy_checker(filtered, selected_location)
+    # Running accuracy aggregates kept up to date by the collector; this location's cells only
+    # change when its partition does, and are rebuilt from its entries alone if the file is stale
+    with span("accuracy aggregates"):
+        aggregates = dataset.derive(
+            "accuracy_aggregates",
+            lambda entries: load_aggregates(DATA_FILE, entries=entries, location=selected_location),
+        )
 
-filtered_data = [entry for entry in all_data if entry.get("location") == selected_location]
+    st.markdown("## 🧠 Forecast Source Accuracy Rankings")
+    accuracy_df = source_accuracy_from_aggregates(aggregates, tolerance=threshold, location=selected_location)
 
-st.markdown("## 🧠 Forecast Source Accuracy Rankings")
-accuracy_df = evaluate_source_accuracy(filtered_data, tolerance=threshold)
+    if accuracy_df.empty:
+        st.info("No forecast vs actual data available yet for comparison.")
+    else:
+        st.dataframe(accuracy_df, use_container_width=True)
 
-if accuracy_df.empty:
-    st.info("No forecast vs actual data available yet for comparison.")
-else:
-    st.dataframe(accuracy_df, use_container_width=True)
\ No newline at end of file
+        # Per source × lead time × time block: hit rate, MAE, RMSE and bias
+        with st.expander("📐 Error breakdown by source, forecast lead time and time block"), span("error breakdown"):
+            breakdown = aggregates.metrics(
+                tolerance=threshold if threshold is not None else 10,
+                by=("source", "lead_days", "block"),
+                location=selected_location,
+            )
+            st.dataframe(
+                breakdown.rename(columns={
+                    "source": "Source",
+                    "lead_days": "Days Before",
+                    "block": "Time Block",
+                    "comparisons": "Comparisons",
+                    "hits": "Within Tolerance",
+                    "hit_rate": "Accuracy (%)",
+                    "mae": "MAE",
+                    "rmse": "RMSE",
+                    "bias": "Bias",
+                }).round(2),
+                use_container_width=True,
+            )
@@ -0,0 +1,144 @@
+"""
+Tests for the append-only forecast store (weather_/storage.py).
+
+    python -m unittest discover tests
+"""
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from weather_.storage import (
+    ForecastIndex,
+    ForecastStore,
+    close_stores,
+    forecast_key,
+    get_store,
+    iter_segment,
+    list_segments,
+    load_entries,
+    store_dir_for,
+)
+
+
+def make_entry(location, date_for, days_ahead=0, cloud_cover="42%"):
+    return {
+        "location": location,
+        "overview": {"date_for": date_for, "num_of_days_between_forecast": days_ahead},
+        "cloud_cover": [{"source": "OpenMeteo.com", "data": {"06:00 UTC": cloud_cover}}],
+    }
+
+
+class StoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.addCleanup(close_stores)
+        self.directory = os.path.join(self.tmp, "store")
+
+
+class LegacyMigrationTest(StoreTestCase):
+    def test_migrates_legacy_file_and_reads_it_back(self):
+        path = os.path.join(self.tmp, "cloud_cover.json")
+        entries = [
+            make_entry("London", "01/03/2025", 0),
+            make_entry("London", "01/03/2025", 3, "80%"),
+            make_entry("Port Elizabeth", "02/03/2025", 0),
+        ]
+        with open(path, "w") as f:
+            json.dump(entries, f)
+
+        # Before the store exists, readers fall back to the legacy file
+        self.assertEqual(load_entries(path), entries)
+
+        store = get_store(path)
+        self.assertTrue(store.contains(entries[1]))
+        close_stores()
+
+        self.assertFalse(os.path.exists(path), "legacy file should be removed once migrated")
+        self.assertCountEqual(load_entries(path), entries)
+        self.assertEqual(load_entries(path, location="port elizabeth"), [entries[2]])
+
+    def test_removes_legacy_file_already_migrated(self):
+        path = os.path.join(self.tmp, "cloud_cover.json")
+        entries = [make_entry("London", "01/03/2025", 0)]
+        with open(path, "w") as f:
+            json.dump(entries, f)
+        get_store(path)
+        close_stores()
+
+        # A copy left behind by an earlier migration (one that didn't delete it)
+        with open(path, "w") as f:
+            json.dump(entries, f)
+        get_store(path)
+        self.assertFalse(os.path.exists(path))
+
+
+class TornTailTest(StoreTestCase):
+    def test_torn_tail_is_ignored_then_repaired(self):
+        with ForecastStore(self.directory) as store:
+            store.append(make_entry("London", "01/03/2025"))
+            store.append(make_entry("London", "02/03/2025"))
+
+        segment = list_segments(self.directory)[-1]
+        with open(segment, "ab") as f:
+            f.write(b'{"location": "London", "overv')  # interrupted write
+
+        self.assertEqual(len(list(iter_segment(segment))), 2)
+
+        with ForecastStore(self.directory) as store:
+            store.append(make_entry("London", "03/03/2025"))
+
+        dates = [entry["overview"]["date_for"] for entry in iter_segment(segment)]
+        self.assertEqual(dates, ["01/03/2025", "02/03/2025", "03/03/2025"])
+        with open(segment, "rb") as f:
+            self.assertNotIn(b"overv\n", f.read())
+
+
+class RolloverTest(StoreTestCase):
+    def test_rolls_over_to_new_segments(self):
+        entries = [make_entry("London", f"{day:02d}/03/2025") for day in range(1, 21)]
+        line_bytes = len(json.dumps(entries[0], separators=(",", ":"))) + 1
+        with ForecastStore(self.directory, max_segment_bytes=line_bytes * 5) as store:
+            store.extend(entries)
+
+        segments = list_segments(self.directory)
+        self.assertEqual(len(segments), 4)
+        for segment in segments:
+            self.assertLessEqual(os.path.getsize(segment), line_bytes * 5)
+        self.assertEqual([e for s in segments for e in iter_segment(s)], entries)
+
+        # Appends after reopening go to the last segment
+        with ForecastStore(self.directory, max_segment_bytes=line_bytes * 5) as store:
+            store.append(make_entry("London", "21/03/2025"))
+        self.assertEqual(len(list_segments(self.directory)), 5)
+
+
+class IndexTest(StoreTestCase):
+    def test_duplicates_are_detected_through_the_index(self):
+        entry = make_entry("London", "01/03/2025", 3)
+        with ForecastStore(self.directory) as store:
+            self.assertFalse(store.contains(entry))
+            store.append(entry)
+            self.assertTrue(store.contains(entry))
+            self.assertTrue(store.contains(("london", "01/03/2025", 3)))  # location is case-insensitive
+            self.assertFalse(store.contains(make_entry("London", "01/03/2025", 5)))
+
+        # The persisted index answers after a reopen, and catches up with segments written since
+        with ForecastStore(self.directory) as store:
+            self.assertTrue(store.contains(entry))
+            self.assertEqual(store.get(forecast_key(entry)), entry)
+
+        with open(list_segments(self.directory)[-1], "a") as f:
+            f.write(json.dumps(make_entry("London", "01/03/2025", 0)) + "\n")
+        index = ForecastIndex(self.directory).load()
+        self.assertIn(("london", "01/03/2025", 0), index)
+        self.assertEqual(index.leads_for("London", "01/03/2025"), [0, 3])
+
+    def test_store_dir_for(self):
+        self.assertEqual(store_dir_for(os.path.join("data", "cloud_cover.json")), os.path.join("data", "cloud_cover"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,15 @@
+"""
+Daily forecast collector.
+
+    python weather.py                                   # every location in data/locations.json
+    python weather.py --locations Bristol Madrid --horizons 0 1 --dry-run
+    python weather.py --locations-file cities.txt --concurrency 16 --output /tmp/cloud_cover.json
+
+At most `--concurrency` locations are in flight at once (default 8), so the provider
+rate limiters see a short queue instead of thousands of waiters, and locations are
+processed in windows so only one window's responses are held in memory.
+"""
+import sys
 import asyncio
 import os
 import datetime
@@ -6,54 +18,253 @@ import json
 from dotenv import load_dotenv
 from datetime import datetime, timezone
 
-from weather_.helpers import get_forecast_date, collect_cloud_cover_comparison, save_forecast_to_file
+from weather_.helpers import TARGET_HOURS, get_forecast_date, collect_location_forecasts, save_forecast_to_file
+from weather_.fetch_planner import FetchPlanner, plan_days_span
 from weather_.providers.open_weather_map import get_lat_lon
-from weather_.metrics import get_call_counts
+from weather_.metrics import get_cache_hit_counts, get_call_counts, reset_metrics, write_metrics
+from weather_.storage import close_stores
+from weather_.geocache import close_geocache, get_geocache
+from weather_.accuracy_aggregates import close_aggregates
+from weather_.utils import http_client
+from weather_.rate_limiter import get_rate_limit_stats
+from weather_.providers.registry import get_providers, provider_names
+from cloud_cover_.table import refresh_table
+
+# 🔧 Base directory of the script: default paths don't depend on where it's run from
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-async def main():
+DATA_FILE = os.path.join(BASE_DIR, "data", "cloud_cover.json")
+LOCATIONS_FILE = os.path.join(BASE_DIR, "data", "locations.json")
+LOG_DIR = os.path.join(BASE_DIR, "logs")
 
-    # 🔧 Define base directory of the script
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_HORIZONS = (0, 3, 5)  # days ahead: the actual (0) and the 3- and 5-day forecasts
+DEFAULT_CONCURRENCY = 8       # locations in flight at once
+LOCATION_WINDOW = 200         # locations prefetched (and kept in memory) together
 
+def load_locations_file(path):
+    """Location names from a JSON list, or a text file with one name per line (# comments allowed)."""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            return json.load(f)
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+def _estimated_min_seconds(providers, location_count):
+    # Lower bound from the rate limiters: each provider needs one call per batch of locations (geocodes are mostly cached)
+    def seconds(provider):
+        limiter = provider.limiter
+        calls = -(-location_count // provider.capabilities.max_batch_size)
+        return max(0.0, (calls - limiter.burst) / limiter.rate)
+    return max((seconds(provider) for provider in providers), default=0.0)
+
+async def main(locations=None, horizons=DEFAULT_HORIZONS, hours=TARGET_HOURS, concurrency=DEFAULT_CONCURRENCY,
+               dry_run=False, output=DATA_FILE, log_dir=LOG_DIR, deadline=None, providers=None):
+    """
+    Collects forecasts for `locations` (default: data/locations.json) and appends them to `output`.
+    `providers` names the registered providers to collect from (default: all of them). With dry_run
+    every request is made but nothing is written. `deadline` overrides every provider's
+    PROVIDER_DEADLINES entry (seconds). Returns a summary dict.
+    """
     load_dotenv(os.path.join(BASE_DIR, ".env"))
     WEATHER_API_KEY = os.getenv("FREE_TIER_OPENWEATHERMAP_API_KEY")
 
-    log_path = os.path.join(BASE_DIR, "logs", "weather_log.txt")
+    log_path = os.path.join(log_dir, "weather_log.txt")
+
+    target_dates = {get_forecast_date(days) for days in horizons}
+    hours = sorted(set(hours))
+    providers = get_providers(providers)
+    deadlines = {provider.name: deadline for provider in providers} if deadline else None
 
-    today = datetime.now(timezone.utc)
-    d_in_three_days = get_forecast_date(3)
-    d_in_five_days = get_forecast_date(5)
-    target_dates = {today, d_in_three_days, d_in_five_days}
+    if locations is None:
+        locations = load_locations_file(LOCATIONS_FILE)
+    LOCATIONS = list(dict.fromkeys(locations))  # drop repeats, keep order
 
-    with open("data/locations.json") as f:
-        LOCATIONS = json.load(f)
+    print(f"🗺️ {len(LOCATIONS)} locations × horizons {sorted(set(horizons))} × hours {hours}, "
+          f"concurrency {concurrency}{' (dry run: nothing is written)' if dry_run else ''}", flush=True)
+    print(f"🔌 Providers: {', '.join(provider.name for provider in providers)}", flush=True)
+    print(f"⏳ Rate limits: at least {_estimated_min_seconds(providers, len(LOCATIONS)):.0f}s for this run", flush=True)
 
-    async def process_location(loc):
-        lat, lon = await get_lat_lon(loc, WEATHER_API_KEY)
+    if dry_run:
+        get_geocache().read_only = True  # geocode as usual, but don't write new results
+
+    metrics = reset_metrics()
+    loop = asyncio.get_running_loop()
+    run_started = loop.time()
+    semaphore = asyncio.Semaphore(concurrency)
+    summary = {"locations": len(LOCATIONS), "resolved": 0, "completed": 0, "failed": 0, "generated": 0, "saved": 0, "collapsed": 0}
+
+    async def resolve(loc):
+        async with semaphore:
+            return await get_lat_lon(loc, WEATHER_API_KEY)
+
+    async def process_location(loc, lat, lon, planner):
         saved = 0
         generated = 0
 
-        for forecast_date in target_dates:
-            forecast_data = await collect_cloud_cover_comparison(lat, lon, loc, forecast_date, WEATHER_API_KEY)
+        async with semaphore:
+            started = loop.time()  # from when it has a slot: time spent queueing for one isn't the location's
+            try:
+                forecasts = await collect_location_forecasts(lat, lon, loc, target_dates, WEATHER_API_KEY, planner=planner,
+                                                             target_hours=hours, deadlines=deadlines, providers=providers)
+            except Exception as e:
+                print(f"❌ {loc}: {e}", flush=True)
+                summary["failed"] += 1
+                return
+
+        for forecast_data in forecasts:
             generated += 1
+            if dry_run:
+                continue
 
             print("📝 Writing data to file...", flush=True)
-            if save_forecast_to_file(forecast_data):
+            if save_forecast_to_file(forecast_data, filename=output):
                 saved += 1
 
+        summary["completed"] += 1
+        summary["generated"] += generated
+        summary["saved"] += saved
         print(f"✅ {loc}: {saved}/{generated} saved")
+        metrics.record_location(loc, loop.time() - started)
+        if dry_run:
+            return
 
         # Log
-        os.makedirs(os.path.join(BASE_DIR, "logs"), exist_ok=True)
+        os.makedirs(log_dir, exist_ok=True)
         with open(log_path, "a") as log:
             log.write(
                 f"[{datetime.now(timezone.utc).strftime('%Y-%m-%d')}] Location: {loc}, Generated: {generated}, Saved: {saved}\n"
             )
 
-    await asyncio.gather(*(process_location(loc) for loc in LOCATIONS))
+    try:
+        # One pooled HTTP client (keep-alive, HTTP/2) is shared by every request in the run
+        async with http_client():
+            # 📍 Resolve every location first (mostly geocode-cache hits)
+            resolved = await asyncio.gather(*(resolve(loc) for loc in LOCATIONS), return_exceptions=True)
+            coordinates = {}
+            for loc, result in zip(LOCATIONS, resolved):
+                if isinstance(result, Exception):
+                    print(f"❌ Skipping {loc}: {result}", flush=True)
+                    summary["failed"] += 1
+                else:
+                    coordinates[loc] = result
+            summary["resolved"] = len(coordinates)
+            del resolved
+
+            # 🪟 Window by window: batch the window into a handful of multi-coordinate requests
+            # (providers that accept them), then collect its locations. Each window gets its own planner, so the
+            # responses of finished windows are released.
+            items = list(coordinates.items())
+            window = max(LOCATION_WINDOW, concurrency)
+            for start in range(0, len(items), window):
+                chunk = items[start:start + window]
+                planner = FetchPlanner()
+                await planner.prefetch([coords for _, coords in chunk], plan_days_span(target_dates), providers, api_key=WEATHER_API_KEY)
+                await asyncio.gather(*(process_location(loc, lat, lon, planner) for loc, (lat, lon) in chunk))
+                summary["collapsed"] += planner.collapsed
+    finally:
+        if not dry_run:
+            close_geocache()  # newly geocoded locations
+            close_stores()  # fsync any batched writes
+            close_aggregates()  # saved after the stores, stamped with the final segment sizes
+
+    # 🧱 Bring the dashboard's columnar table up to date with the entries we just wrote
+    if not dry_run:
+        try:
+            refresh_table(output)
+        except ImportError as e:
+            print(f"⚠️ Skipping table refresh: {e}", flush=True)
+
+    elapsed = loop.time() - run_started
     counts = get_call_counts()
-    print(f"📊 Total OpenMeteo API calls: {counts['OpenMeteo']}")
-    print(f"📊 Total OpenWeatherMap API calls: {counts['OpenWeatherMap']}")
-    
+    cache_hits = get_cache_hit_counts()
+    for provider in providers:
+        print(f"📊 Total {provider.name} API calls: {counts.get(provider.name, 0)} "
+              f"(+{cache_hits.get(provider.name, 0)} answered from the HTTP cache)")
+    print(f"📊 Requests collapsed into an existing fetch: {summary['collapsed']}")
+    for source, stats in get_rate_limit_stats().items():
+        print(f"🚦 {source} rate limiter: {stats['waited']}/{stats['acquired']} calls queued, "
+              f"total wait {stats['total_wait_s']}s, longest {stats['max_wait_s']}s")
+
+    # 📈 Per-provider telemetry, appended to logs/ for tracking collector performance across runs
+    snapshot = metrics.snapshot() if dry_run else write_metrics(log_dir)
+    for source, stats in snapshot["providers"].items():
+        latency = stats["latency"]
+        # No latencies when every call was answered from the HTTP cache
+        latency_text = f", p50 ≤{latency['p50_s']}s, p99 ≤{latency['p99_s']}s" if latency["count"] else ""
+        print(f"📈 {source}: {stats['requests']} requests, {stats['cache_hits']} cache hits, {stats['retries']} retries, "
+              f"{stats['timeouts']} timeouts, {stats['deadline_misses']} missed deadlines, "
+              f"{stats['bytes_received'] / 1024:.0f} KiB{latency_text}")
+    if snapshot["locations"]["count"]:
+        print(f"📍 {snapshot['locations']['count']} locations written, p50 ≤{snapshot['locations']['p50_s']}s, "
+              f"slowest {snapshot['locations']['max_s']}s")
+
+    # 🏁 Throughput
+    calls = sum(counts.values())
+    summary.update(elapsed_s=round(elapsed, 3), api_calls=calls, cache_hits=sum(cache_hits.values()))
+    print(f"🏁 {summary['completed']}/{summary['locations']} locations in {elapsed:.1f}s "
+          f"({summary['completed'] / elapsed if elapsed else 0:.2f} locations/s, {calls / elapsed if elapsed else 0:.2f} calls/s); "
+          f"{summary['saved']}/{summary['generated']} entries saved, {summary['failed']} locations failed", flush=True)
+    return summary
+
+def parse_args(argv=None):
+    import argparse
+
+    def positive_int(value):
+        number = int(value)
+        if number < 1:
+            raise argparse.ArgumentTypeError("must be at least 1")
+        return number
+
+    def hour(value):
+        number = int(value)
+        if not 0 <= number <= 23:
+            raise argparse.ArgumentTypeError("hours are 0-23 (UTC)")
+        return number
+
+    def horizon(value):
+        number = int(value)
+        if number < 0:
+            raise argparse.ArgumentTypeError("horizons are days ahead (0 = today)")
+        return number
+
+    parser = argparse.ArgumentParser(description="Collect cloud cover forecasts for every location")
+    where = parser.add_mutually_exclusive_group()
+    where.add_argument("--locations", nargs="+", metavar="NAME", help="Locations to collect (default: data/locations.json)")
+    where.add_argument("--locations-file", metavar="PATH", help="JSON list of locations, or a text file with one per line")
+    parser.add_argument("--providers", nargs="+", metavar="NAME", choices=provider_names(),
+                        help=f"Providers to collect from (default: all of {', '.join(provider_names())})")
+    parser.add_argument("--horizons", type=horizon, nargs="+", default=list(DEFAULT_HORIZONS), metavar="DAYS",
+                        help="Days ahead to collect (default: 0 3 5)")
+    parser.add_argument("--hours", type=hour, nargs="+", default=list(TARGET_HOURS), metavar="HOUR",
+                        help="UTC hours sampled per day (default: 6 9 12 15 18)")
+    parser.add_argument("--concurrency", type=positive_int, default=DEFAULT_CONCURRENCY,
+                        help=f"Locations in flight at once (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--deadline", type=float, metavar="SECONDS",
+                        help="Seconds a location waits for each provider before writing without it (default: 40)")
+    parser.add_argument("--output", default=DATA_FILE, help="Data file whose store receives the entries (default: data/cloud_cover.json)")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk HTTP response cache (.cache/http/)")
+    parser.add_argument("--dry-run", action="store_true", help="Fetch everything but write nothing (no store, geocode cache, logs or metrics)")
+    return parser.parse_args(argv)
+
+def cli(argv=None):
+    args = parse_args(argv)
+    if args.no_cache:
+        os.environ["HTTP_CACHE"] = "0"  # read by weather_.http_cache.get_http_cache
+    locations = args.locations
+    if args.locations_file:
+        locations = load_locations_file(args.locations_file)
+
+    summary = asyncio.run(main(
+        locations=locations,
+        horizons=args.horizons,
+        hours=args.hours,
+        concurrency=args.concurrency,
+        dry_run=args.dry_run,
+        output=args.output,
+        deadline=args.deadline,
+        providers=args.providers,
+    ))
+    # Non-zero only when nothing at all was collected, so one bad location doesn't fail the daily job
+    return 0 if summary["completed"] or not summary["locations"] else 1
+
 if __name__ == "__main__":
-    asyncio.run(main())  # main is now async ✅
+    sys.exit(cli())
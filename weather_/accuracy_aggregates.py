@@ -0,0 +1,398 @@
+"""
+Running forecast-accuracy aggregates, maintained as forecasts are written.
+
+Whenever the collector stores an entry that completes a forecast/actual pair
+(a 0-day actual for which N-day forecasts are already stored, or the other way
+round), every matching source × hour comparison is folded into a cell keyed by
+(location, source, lead_days, hour):
+
+    count, sum of errors, sum of squared errors, sum of absolute errors,
+    histogram of absolute errors (0..100)
+
+Cells simply add up, so aggregates from partial runs or shards can be merged,
+and the hit rate for any tolerance is a prefix sum over the histogram — the
+dashboard's accuracy table costs O(#cells) instead of a pass over the history.
+
+The aggregates for "data/cloud_cover.json" live in "data/cloud_cover_accuracy.json",
+together with the size of every store segment they cover. Segments are append-only,
+so the sizes identify the data and the file is committed with it: a fresh checkout
+(CI, a deploy) uses it as is. A stale file is rebuilt from the full history; a page
+that only needs one location rebuilds just that location's cells.
+
+Rebuild by hand:
+    python -m weather_.accuracy_aggregates rebuild data/cloud_cover.json
+"""
+import os
+import sys
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+
+from cloud_cover_.helpers import parse_percent_column
+from weather_.storage import data_sizes, forecast_key, load_entries, store_dir_for
+from forecast_analysis_.accuracy import HOUR_BLOCKS, align_forecasts, forecast_frame
+
+AGGREGATES_SUFFIX = "_accuracy.json"
+AGGREGATES_VERSION = 2
+HISTOGRAM_SIZE = 101  # absolute errors 0..100
+
+METRIC_COLUMNS = ["comparisons", "hits", "hit_rate", "mae", "rmse", "bias"]
+
+
+def aggregates_path_for(data_path):
+    """"data/cloud_cover.json" → "data/cloud_cover_accuracy.json" """
+    return store_dir_for(data_path) + AGGREGATES_SUFFIX
+
+
+def _hour_from_label(label):
+    # "06:00 UTC" → 6
+    try:
+        return int(str(label).split(":")[0])
+    except ValueError:
+        return None
+
+
+class AccuracyCell:
+    """Sufficient statistics for one (location, source, lead_days, hour)."""
+
+    __slots__ = ("count", "sum_error", "sum_sq_error", "sum_abs_error", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.sum_error = 0
+        self.sum_sq_error = 0
+        self.sum_abs_error = 0
+        self.histogram = [0] * HISTOGRAM_SIZE
+
+    def add(self, error):
+        abs_error = abs(error)
+        self.count += 1
+        self.sum_error += error
+        self.sum_sq_error += error * error
+        self.sum_abs_error += abs_error
+        self.histogram[min(abs_error, HISTOGRAM_SIZE - 1)] += 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.sum_error += other.sum_error
+        self.sum_sq_error += other.sum_sq_error
+        self.sum_abs_error += other.sum_abs_error
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+
+    def to_json(self):
+        return {
+            "count": self.count,
+            "sum_error": self.sum_error,
+            "sum_sq_error": self.sum_sq_error,
+            "sum_abs_error": self.sum_abs_error,
+            "histogram": {str(i): n for i, n in enumerate(self.histogram) if n},  # sparse
+        }
+
+    @classmethod
+    def from_json(cls, raw):
+        cell = cls()
+        cell.count = raw["count"]
+        cell.sum_error = raw["sum_error"]
+        cell.sum_sq_error = raw["sum_sq_error"]
+        cell.sum_abs_error = raw["sum_abs_error"]
+        for i, n in raw["histogram"].items():
+            cell.histogram[int(i)] = n
+        return cell
+
+
+class AccuracyAggregates:
+    """Mergeable accuracy cells keyed by (location, source, lead_days, hour)."""
+
+    def __init__(self, cells=None):
+        self.cells = cells if cells is not None else {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.cells)
+
+    # ---------- updating ----------
+    def add_pair(self, forecast_entry, actual_entry):
+        """Folds every source × hour comparison between an N-day forecast and its 0-day actual."""
+        location = forecast_entry["location"]
+        lead_days = int(forecast_entry["overview"]["num_of_days_between_forecast"])
+
+        actual_by_source = {}
+        for block in actual_entry.get("cloud_cover", []):
+            actual_by_source.setdefault(block.get("source"), block.get("data", {}))
+
+        keys, forecasts, actuals = [], [], []
+        seen_sources = set()
+        for block in forecast_entry.get("cloud_cover", []):
+            source = block.get("source")
+            if not source or source in seen_sources or source not in actual_by_source:
+                continue
+            seen_sources.add(source)
+            actual_data = actual_by_source[source]
+            for time_utc, value in block.get("data", {}).items():
+                hour = _hour_from_label(time_utc)
+                if hour is None or time_utc not in actual_data:
+                    continue
+                keys.append((location, source, lead_days, hour))
+                forecasts.append(value)
+                actuals.append(actual_data[time_utc])
+
+        if not keys:
+            return 0
+
+        errors = parse_percent_column(forecasts).astype("Int16") - parse_percent_column(actuals).astype("Int16")
+        added = 0
+        with self._lock:
+            for key, error in zip(keys, errors):
+                if error is pd.NA:
+                    continue
+                cell = self.cells.get(key)
+                if cell is None:
+                    cell = self.cells[key] = AccuracyCell()
+                cell.add(int(error))
+                added += 1
+        return added
+
+    def record(self, entry, store):
+        """
+        Updates the aggregates for an entry just written to `store`, pairing it with
+        the stored actual (for forecasts) or the stored forecasts (for actuals).
+        """
+        key = forecast_key(entry)
+        if key is None:
+            return 0
+        location, date_for, lead_days = key
+
+        if lead_days == 0:
+            added = 0
+            for lead in store.leads_for(location, date_for):
+                if lead > 0:
+                    forecast = store.get((location, date_for, lead))
+                    if forecast is not None:
+                        added += self.add_pair(forecast, entry)
+            return added
+
+        actual = store.get((location, date_for, 0))
+        return self.add_pair(entry, actual) if actual is not None else 0
+
+    def merge(self, other):
+        """Adds another set of aggregates (e.g. from a shard or a partial run) into this one."""
+        with self._lock:
+            for key, cell in other.cells.items():
+                if key in self.cells:
+                    self.cells[key].merge(cell)
+                else:
+                    merged = self.cells[key] = AccuracyCell()
+                    merged.merge(cell)
+        return self
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Builds the aggregates from scratch over a full history, with the vectorized accuracy engine."""
+        return cls.from_aligned(align_forecasts(forecast_frame(entries)))
+
+    @classmethod
+    def from_aligned(cls, aligned):
+        """Builds cells from forecast_analysis_.accuracy.align_forecasts output."""
+        if aligned.empty:
+            return cls()
+
+        error = aligned["error"].astype("int64")
+        work = pd.DataFrame({
+            "location": aligned["location"].astype(str),
+            "source": aligned["source"].astype(str),
+            "lead_days": aligned["lead_days"].astype("int64"),
+            "hour": aligned["hour"].astype("int64"),
+            "error": error,
+            "sq_error": error * error,
+            "abs_error": error.abs(),  # values are 0..100, so at most HISTOGRAM_SIZE - 1
+        })
+        keys = ["location", "source", "lead_days", "hour"]
+
+        cells = {}
+        sums = work.groupby(keys, sort=False).agg(
+            count=("error", "size"),
+            sum_error=("error", "sum"),
+            sum_sq_error=("sq_error", "sum"),
+            sum_abs_error=("abs_error", "sum"),
+        )
+        for key, row in zip(sums.index, sums.itertuples(index=False)):
+            cell = cells[key] = AccuracyCell()
+            cell.count = int(row.count)
+            cell.sum_error = int(row.sum_error)
+            cell.sum_sq_error = int(row.sum_sq_error)
+            cell.sum_abs_error = int(row.sum_abs_error)
+        for (*key, abs_error), n in work.groupby(keys + ["abs_error"], sort=False).size().items():
+            cells[tuple(key)].histogram[abs_error] = int(n)
+        return cls(cells)
+
+    # ---------- reading ----------
+    def to_frame(self):
+        """One row per cell with its sums and histogram."""
+        columns = ["location", "source", "lead_days", "hour", "count", "sum_error", "sum_sq_error", "sum_abs_error"]
+        rows = [
+            (*key, cell.count, cell.sum_error, cell.sum_sq_error, cell.sum_abs_error)
+            for key, cell in self.cells.items()
+        ]
+        frame = pd.DataFrame(rows, columns=columns)
+        frame["block"] = frame["hour"].map(HOUR_BLOCKS).fillna("other")
+        return frame
+
+    def metrics(self, tolerance=10, by=("source",), location=None, lead_days=None):
+        """
+        Hit rate within ±tolerance, MAE, RMSE and bias per group, with the same columns as
+        forecast_analysis_.accuracy.accuracy_metrics. `by` may use location, source, lead_days,
+        hour and block; location and lead_days narrow the cells considered.
+        """
+        by = list(by)
+        if not self.cells:
+            return pd.DataFrame(columns=by + METRIC_COLUMNS)
+
+        keys = list(self.cells)
+        frame = self.to_frame()
+        histograms = np.array([self.cells[k].histogram for k in keys], dtype=np.int64)
+        frame["hits"] = histograms[:, :max(int(tolerance) + 1, 0)].sum(axis=1)  # errors are whole percents
+
+        mask = np.ones(len(frame), dtype=bool)
+        if location is not None:
+            mask &= (frame["location"] == location).to_numpy()
+        if lead_days is not None:
+            mask &= frame["lead_days"].isin(list(lead_days)).to_numpy()
+        frame = frame[mask & (frame["count"] > 0).to_numpy()]
+        if frame.empty:
+            return pd.DataFrame(columns=by + METRIC_COLUMNS)
+
+        result = frame.groupby(by, sort=True)[["count", "hits", "sum_error", "sum_sq_error", "sum_abs_error"]].sum().reset_index()
+        result["comparisons"] = result["count"]
+        result["hit_rate"] = result["hits"] / result["count"] * 100
+        result["mae"] = result["sum_abs_error"] / result["count"]
+        result["rmse"] = np.sqrt(result["sum_sq_error"] / result["count"])
+        result["bias"] = result["sum_error"] / result["count"]
+        return result[by + METRIC_COLUMNS]
+
+    # ---------- persistence ----------
+    def to_json(self):
+        return [[*key, cell.to_json()] for key, cell in self.cells.items()]
+
+    @classmethod
+    def from_json(cls, raw):
+        return cls({
+            (location, source, lead_days, hour): AccuracyCell.from_json(cell)
+            for location, source, lead_days, hour, cell in raw
+        })
+
+    def save(self, path, segments):
+        """Writes the aggregates with `segments` ({name: size}, see storage.data_sizes), the data they cover."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        raw = {
+            "version": AGGREGATES_VERSION,
+            "segments": segments,
+            "cells": self.to_json(),
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(raw, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+
+def _read_aggregates(path):
+    """Returns (aggregates, covered segment sizes) from a file, or (None, None) when missing or unreadable."""
+    try:
+        with open(path, "r") as f:
+            raw = json.load(f)
+        if raw.get("version") != AGGREGATES_VERSION:
+            return None, None
+        return AccuracyAggregates.from_json(raw["cells"]), dict(raw["segments"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None, None
+
+
+def rebuild_aggregates(data_path, entries=None, save=True):
+    """Recomputes the aggregates from the full history behind data_path (and saves them)."""
+    segments = data_sizes(data_path)
+    aggregates = AccuracyAggregates.from_entries(load_entries(data_path) if entries is None else entries)
+    if save:
+        try:
+            aggregates.save(aggregates_path_for(data_path), segments)
+        except OSError as e:
+            print(f"⚠️ Could not save accuracy aggregates: {e}", flush=True)
+    return aggregates
+
+
+def load_aggregates(data_path, entries=None, location=None):
+    """
+    Returns the aggregates for the data behind data_path, rebuilding them (from `entries`
+    when given) if the file is missing or was computed against different data.
+
+    With `location`, only that location's cells need to be current: the file is used when
+    the location's partition hasn't changed since it was saved, and otherwise that location
+    alone is rebuilt from its entries (`entries`, or its partition) — without saving.
+    """
+    aggregates, covered = _read_aggregates(aggregates_path_for(data_path))
+    if location is None:
+        if aggregates is not None and covered == data_sizes(data_path):
+            return aggregates
+        return rebuild_aggregates(data_path, entries=entries)
+
+    sizes = data_sizes(data_path, location)
+    if aggregates is not None and all(covered.get(name) == size for name, size in sizes.items()):
+        return aggregates
+    return AccuracyAggregates.from_entries(load_entries(data_path, location=location) if entries is None else entries)
+
+
+# ========== shared handles (collector) ============
+_open_aggregates = {}
+_open_aggregates_lock = threading.Lock()
+
+
+def get_aggregates(data_path):
+    """Returns the process-wide aggregates for a data file path, loading them on first use."""
+    path = aggregates_path_for(data_path)
+    with _open_aggregates_lock:
+        handle = _open_aggregates.get(path)
+        if handle is None:
+            handle = _open_aggregates[path] = (data_path, load_aggregates(data_path))
+        return handle[1]
+
+
+def discard_aggregates(data_path):
+    """Drops an open handle without saving (e.g. after a failed update); the next load rebuilds it."""
+    with _open_aggregates_lock:
+        _open_aggregates.pop(aggregates_path_for(data_path), None)
+
+
+def close_aggregates():
+    """
+    Saves every aggregates handle opened via `get_aggregates`, stamped with the current
+    segment sizes. Call after `close_stores()` so the sizes cover the final writes.
+    """
+    with _open_aggregates_lock:
+        for path, (data_path, aggregates) in _open_aggregates.items():
+            aggregates.save(path, data_sizes(data_path))
+        _open_aggregates.clear()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Forecast accuracy aggregates")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild = sub.add_parser("rebuild", help="Recompute the aggregates from the full history")
+    rebuild.add_argument("path", nargs="?", default=os.path.join("data", "cloud_cover.json"))
+    show = sub.add_parser("show", help="Print per-source accuracy from the aggregates")
+    show.add_argument("path", nargs="?", default=os.path.join("data", "cloud_cover.json"))
+    show.add_argument("--tolerance", type=int, default=10)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "rebuild":
+        aggregates = rebuild_aggregates(args.path)
+        print(f"📐 Rebuilt {len(aggregates)} accuracy cells into {aggregates_path_for(args.path)}")
+    elif args.command == "show":
+        print(load_aggregates(args.path).metrics(tolerance=args.tolerance).round(2).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+# weather_/fetch_planner.py
+import asyncio
+
+from datetime import datetime, timezone
+
+from weather_.metrics import get_metrics
+from weather_.providers.registry import get_provider, get_providers
+
+# Share of a provider's deadline that a fetch may spend queueing for a rate-limit token
+DEADLINE_QUEUE_SHARE = 0.5
+
+
+def plan_days_span(target_dates):
+    """Returns (first, last) days ahead of today (UTC) covered by a set of target datetimes."""
+    today = datetime.now(timezone.utc).date()
+    days_ahead = [(d.date() - today).days for d in target_dates]
+    return min(days_ahead), max(days_ahead)
+
+
+class FetchPlanner:
+    """
+    Per-run fetch planner.
+
+    Each provider is asked once per location for the whole date span a run needs, and
+    identical requests (same provider, coordinates and span) share a single fetch —
+    whether they are still in flight or already finished earlier in the run.
+    """
+
+    def __init__(self):
+        self._requests = {}
+        self._slots = {}
+        self.collapsed = 0  # requests answered by an existing fetch
+
+    @staticmethod
+    def _key(provider, lat, lon, date_range):
+        # Spans are clipped to the provider's horizon first, so equivalent requests share a key
+        return provider.name, lat, lon, provider.clip_date_range(date_range)
+
+    async def _single_flight(self, key, fetch):
+        task = self._requests.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            self._requests[key] = task
+            get_metrics().record_cache("fetch_planner", hit=False)
+        else:
+            self.collapsed += 1
+            get_metrics().record_cache("fetch_planner", hit=True)
+        # shield: one caller being cancelled must not cancel the fetch others are awaiting
+        return await asyncio.shield(task)
+
+    def slots(self, provider, deadline):
+        """
+        Semaphore capping a provider's fetches in flight: no more than its rate limiter can start
+        within DEADLINE_QUEUE_SHARE of the deadline. Callers wait for a slot before their deadline
+        starts, so queueing behind the limiter doesn't use it up.
+        """
+        provider = get_provider(provider)
+        semaphore = self._slots.get(provider.name)
+        if semaphore is None:
+            limiter = provider.limiter
+            size = max(1, int(limiter.burst + limiter.rate * deadline * DEADLINE_QUEUE_SHARE))
+            semaphore = self._slots[provider.name] = asyncio.Semaphore(size)
+        return semaphore
+
+    async def fetch(self, provider, lat, lon, date_range, api_key=None):
+        """One location's TimeIndex from a provider for date_range (first, last days ahead), or None."""
+        provider = get_provider(provider)
+
+        async def fetch_one():
+            return (await provider.fetch([(lat, lon)], date_range, api_key=api_key))[0]
+
+        return await self._single_flight(self._key(provider, lat, lon, date_range), fetch_one)
+
+    async def prefetch(self, coordinates, date_range, providers=None, api_key=None):
+        """
+        Fetches many locations at once from every provider that accepts multi-location requests
+        (capabilities.max_batch_size > 1), all providers in parallel. Later fetch() calls for the
+        same provider, coordinates and span are answered from these results.
+        """
+        coordinates = list(dict.fromkeys(coordinates))
+        batched = [p for p in get_providers(providers) if p.capabilities.max_batch_size > 1]
+        await asyncio.gather(*(self._prefetch_provider(p, coordinates, date_range, api_key) for p in batched))
+
+    async def _prefetch_provider(self, provider, coordinates, date_range, api_key):
+        loop = asyncio.get_running_loop()
+        pending = []
+        for lat, lon in coordinates:
+            key = self._key(provider, lat, lon, date_range)
+            if key not in self._requests:
+                self._requests[key] = loop.create_future()
+                pending.append((key, (lat, lon)))
+
+        if not pending:
+            return
+
+        try:
+            results = await provider.fetch([coords for _, coords in pending], date_range, api_key=api_key)
+        except Exception as e:
+            print(f"❌ {provider.name} batch prefetch failed: {e}", flush=True)
+            results = [None] * len(pending)
+
+        for (key, _), result in zip(pending, results):
+            self._requests[key].set_result(result)
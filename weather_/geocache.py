@@ -0,0 +1,178 @@
+"""
+On-disk cache of geocoding results: city → (lat, lon, resolved name),
+plus resolved timezone names keyed by coordinates.
+
+Locations rarely change, so the collector only geocodes cities it has not
+seen before (or whose cached result is older than the TTL).
+
+New results are kept in memory and written out every SAVE_EVERY changes and
+when the collector finishes (`close_geocache`), not on every put. A read-only
+cache (the collector's dry runs) never writes them.
+
+Manual invalidation:
+    python -m weather_.geocache list
+    python -m weather_.geocache invalidate "Port Elizabeth"
+    python -m weather_.geocache invalidate --all
+"""
+import os
+import sys
+import json
+import time
+import threading
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GEOCODE_CACHE_FILE = os.path.join(BASE_DIR, "data", "geocode_cache.json")
+GEOCODE_TTL_SECONDS = 90 * 24 * 60 * 60  # 90 days
+SAVE_EVERY = 500  # unsaved changes before the file is rewritten mid-run
+
+
+def _normalize(city_name):
+    return " ".join(city_name.split()).lower()
+
+
+def _coordinate_key(lat, lon):
+    return f"{round(float(lat), 4)},{round(float(lon), 4)}"
+
+
+class GeoCache:
+    def __init__(self, path=GEOCODE_CACHE_FILE, ttl_seconds=GEOCODE_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._locations = {}
+        self._timezones = {}
+        self._unsaved = 0
+        self.read_only = False  # keep new results in memory only
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                raw = json.load(f)
+            self._locations = raw.get("locations", {})
+            self._timezones = raw.get("timezones", {})
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"⚠️ Ignoring unreadable geocode cache {self.path}: {e}", flush=True)
+            self._locations = {}
+            self._timezones = {}
+
+    def get(self, city_name):
+        """Returns the cached {"lat", "lon", "name", ...} for a city, or None if missing/expired."""
+        record = self._locations.get(_normalize(city_name))
+        if record is None:
+            return None
+        if self.ttl_seconds is not None and time.time() - record.get("resolved_at", 0) > self.ttl_seconds:
+            return None
+        return record
+
+    def put(self, city_name, lat, lon, name=None, country=None):
+        with self._lock:
+            self._locations[_normalize(city_name)] = {
+                "query": city_name,
+                "lat": lat,
+                "lon": lon,
+                "name": name or city_name,
+                "country": country,
+                "resolved_at": int(time.time()),
+            }
+        self._changed()
+
+    def get_timezone(self, lat, lon):
+        """Returns the cached timezone name for coordinates, or None."""
+        return self._timezones.get(_coordinate_key(lat, lon))
+
+    def put_timezone(self, lat, lon, tz_name):
+        with self._lock:
+            self._timezones[_coordinate_key(lat, lon)] = tz_name
+        self._changed()
+
+    def invalidate(self, city_name=None):
+        """Drops one city (or every city and timezone when None). Returns the number of cities removed."""
+        with self._lock:
+            if city_name is None:
+                removed = len(self._locations)
+                self._locations.clear()
+                self._timezones.clear()
+            else:
+                removed = 1 if self._locations.pop(_normalize(city_name), None) else 0
+        self.save()
+        return removed
+
+    def items(self):
+        return list(self._locations.items())
+
+    def _changed(self):
+        # Rewriting the whole file per new city would be O(N²) on a first run with thousands of locations
+        with self._lock:
+            self._unsaved += 1
+            due = self._unsaved >= SAVE_EVERY and not self.read_only
+        if due:
+            self.save()
+
+    def flush(self):
+        """Writes unsaved changes, if any."""
+        if self._unsaved and not self.read_only:
+            self.save()
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"locations": self._locations, "timezones": self._timezones}, f, indent=2, ensure_ascii=False, sort_keys=True)
+            os.replace(tmp_path, self.path)
+            self._unsaved = 0
+
+
+_geocache = None
+
+
+def get_geocache():
+    """
+    Returns the process-wide geocode cache. GEOCODE_CACHE_FILE overrides its location,
+    e.g. to keep a stand-in server's made-up coordinates out of the real cache.
+    """
+    global _geocache
+    if _geocache is None:
+        _geocache = GeoCache(os.getenv("GEOCODE_CACHE_FILE") or GEOCODE_CACHE_FILE)
+    return _geocache
+
+
+def close_geocache():
+    """Writes the process-wide cache's unsaved results (call when a run ends)."""
+    if _geocache is not None:
+        _geocache.flush()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Geocode cache tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="Show cached locations")
+    invalidate = sub.add_parser("invalidate", help="Remove cached locations so they are geocoded again")
+    invalidate.add_argument("cities", nargs="*")
+    invalidate.add_argument("--all", action="store_true")
+
+    args = parser.parse_args(argv)
+    cache = get_geocache()
+
+    if args.command == "list":
+        for key, record in cache.items():
+            resolved = time.strftime("%Y-%m-%d", time.gmtime(record.get("resolved_at", 0)))
+            print(f"📍 {record.get('query', key)} → {record['name']} ({record['lat']}, {record['lon']}) resolved {resolved}")
+    elif args.command == "invalidate":
+        if args.all:
+            print(f"🧹 Removed {cache.invalidate()} cached locations")
+        elif args.cities:
+            for city in args.cities:
+                print(f"🧹 {city}: {'removed' if cache.invalidate(city) else 'not cached'}")
+        else:
+            parser.error("give one or more cities, or --all")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
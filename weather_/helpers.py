@@ -1,64 +1,135 @@
 import os
-import json
+import asyncio
 
+from contextlib import nullcontext
+from functools import lru_cache
 from zoneinfo import ZoneInfo  # For Python 3.9+
 from timezonefinder import TimezoneFinder
 from datetime import datetime, timedelta, timezone
 
-from enums.weather_provider import WeatherProvider
-
-from weather_.providers.open_weather_map import fetch_owm_3hour_forecast, get_owm_3hour_cloud_cover_at_time
-from weather_.providers.open_meteo import fetch_openmeteo_hourly_cloud_data, get_openmeteo_cloud_cover_at_time, rate_limited_openmeteo_call
+from weather_.storage import ForecastStore, PartitionedStore, forecast_key, get_store
+from weather_.accuracy_aggregates import discard_aggregates, get_aggregates
+from weather_.geocache import get_geocache
+from weather_.metrics import get_metrics
+from weather_.fetch_planner import FetchPlanner, plan_days_span
+from weather_.providers.registry import get_provider, get_providers
 
 # ========== weather.py helper functions ============
-async def collect_cloud_cover_comparison(lat, lon, location_name, date_for_dt, api_key):
+TARGET_HOURS = [6, 9, 12, 15, 18]
+
+# Seconds a location waits for each provider (by name) before its entries are written without that provider.
+# The clock starts once the location has one of the provider's in-flight slots (FetchPlanner.slots), so
+# queueing behind other locations doesn't count. The fetch itself keeps running (other locations sharing
+# it through the planner still get it).
+PROVIDER_DEADLINES = {
+    "OpenWeatherMap": 40.0,
+    "OpenMeteo": 40.0,
+}
+DEFAULT_PROVIDER_DEADLINE = 40.0
+
+async def collect_location_forecasts(lat, lon, location_name, target_dates, api_key, planner=None, target_hours=TARGET_HOURS, deadlines=None, providers=None):
+    """
+    Builds one forecast entry per target date for a location, with a cloud_cover block per provider
+    (every registered provider, or the ones named in `providers`).
+    Every provider is fetched concurrently, once, covering the whole date span, and each date/hour is
+    sliced from that single response — so a location takes as long as its slowest provider, not the sum.
+    A provider that fails, misses its deadline (PROVIDER_DEADLINES, overridden per name by `deadlines`)
+    or doesn't forecast that far ahead is written as missing instead of holding the location up.
+    Pass a shared FetchPlanner to collapse identical requests across a run.
+    """
+    planner = planner or FetchPlanner()
+    providers = get_providers(providers)
+    configured = {**PROVIDER_DEADLINES, **(deadlines or {})}
+    deadlines = {provider.name: configured.get(provider.name, DEFAULT_PROVIDER_DEADLINE) for provider in providers}
+    target_dates = sorted(target_dates)
+
     # 🌍 Local datetime (for logging/metadata)
     local_dt = get_local_datetime(datetime.now(timezone.utc), lat, lon)
 
-    # 🕒 Target forecast hours
-    target_hours = [6, 9, 12, 15, 18]
-
-    # 📦 Prepare containers
-    owm_data = {}
-    om_data = {}
-
-    # 📆 Days ahead for OpenMeteo request
-    days_ahead = (date_for_dt.date() - datetime.now(timezone.utc).date()).days
-
-    # 🚀 Prefetch both APIs just once
-    try:
-        owm_shared = await fetch_owm_3hour_forecast(lat, lon, api_key)
-        print("📡 OpenWeatherMap forecast fetched", flush=True)
-    except Exception as e:
-        print(f"❌ Failed to fetch OpenWeatherMap: {e}", flush=True)
-        owm_shared = None
-
+    # 📆 Days ahead covered by this run (today → furthest horizon)
+    today = datetime.now(timezone.utc).date()
+    days_ahead_list = [(d.date() - today).days for d in target_dates]
+    date_range = plan_days_span(target_dates)
+
+    # 🚀 Fan out to every provider at once; each answers with a time index covering the span
+    results = await asyncio.gather(*(
+        _fetch_with_deadline(
+            provider,
+            lambda provider=provider: planner.fetch(provider, lat, lon, date_range, api_key=api_key),
+            deadlines[provider.name],
+            slots=planner.slots(provider, deadlines[provider.name]),
+        )
+        for provider in providers
+    ))
+
+    entries = []
+    for date_for_dt, days_ahead in zip(target_dates, days_ahead_list):
+        rows = {}
+        missing = {}
+        for provider, (index, reason) in zip(providers, results):
+            if reason is None and not provider.covers(days_ahead):
+                index, reason = None, "beyond horizon"
+            # 🔁 Slice each forecast hour out of the in-memory index (no awaits: the data is already here)
+            raw = {}
+            for hour in target_hours:
+                target_dt = date_for_dt.replace(hour=hour, minute=0, second=0, microsecond=0)
+                raw[f"{hour:02d}:00 UTC"] = None if index is None else provider.value_at(index, target_dt)
+            rows[provider.source] = format_cloud_cover_row(raw)
+            if reason:
+                missing[provider.source] = reason
+
+        entries.append(build_forecast_entry(location_name, date_for_dt, local_dt, days_ahead, rows, missing=missing))
+
+    return entries
+
+async def collect_cloud_cover_comparison(lat, lon, location_name, date_for_dt, api_key, planner=None):
+    # Single-date wrapper around collect_location_forecasts
+    entries = await collect_location_forecasts(lat, lon, location_name, [date_for_dt], api_key, planner=planner)
+    return entries[0]
+
+async def _fetch_with_deadline(provider, fetch, deadline, slots=None):
+    """
+    Awaits one provider's time index for at most `deadline` seconds, counted from when a slot
+    in `slots` (a semaphore capping the provider's fetches in flight) is free.
+    Returns (time index, None), or (None, reason) when the provider has to be written as missing.
+    """
     try:
-        om_shared = await rate_limited_openmeteo_call(fetch_openmeteo_hourly_cloud_data, lat, lon, days_ahead)
-        print("🌤️ OpenMeteo forecast fetched", flush=True)
+        async with slots or nullcontext():
+            index = await asyncio.wait_for(fetch(), timeout=deadline)
+    except asyncio.TimeoutError:
+        print(f"⏱️ {provider.name} missed its {deadline:.0f}s deadline — writing without it", flush=True)
+        get_metrics().record_deadline_miss(provider.name)
+        return None, "deadline exceeded"
     except Exception as e:
-        print(f"❌ Failed to fetch OpenMeteo: {e}", flush=True)
-        om_shared = None
-
-    # 🔁 Loop through each forecast hour
-    for hour in target_hours:
-        target_dt = date_for_dt.replace(hour=hour)
+        print(f"❌ Failed to fetch {provider.name}: {e}", flush=True)
+        return None, "fetch failed"
 
-        try:
-            owm_result = await get_cloud_cover(lat, lon, target_dt, WeatherProvider.OPENWEATHERMAP, api_key, shared_data=owm_shared)
-        except Exception as e:
-            print(f"❌ OWM error at {hour}: {e}", flush=True)
-            owm_result = {"cloud_cover": None}
+    if not index:
+        print(f"❌ {provider.name} returned no data", flush=True)
+        return None, "fetch failed"
 
-        try:
-            om_result = await get_cloud_cover(lat, lon, target_dt, WeatherProvider.OPENMETEO, shared_data=om_shared)
-        except Exception as e:
-            print(f"❌ OpenMeteo error at {hour}: {e}", flush=True)
-            om_result = {"cloud_cover": None}
+    print(f"📡 {provider.name} forecast fetched", flush=True)
+    return index, None
 
-        time_str = f"{hour:02d}:00 UTC"
-        owm_data[time_str] = format_cloud_cover(owm_result.get("cloud_cover"))
-        om_data[time_str] = format_cloud_cover(om_result.get("cloud_cover"))
+def build_forecast_entry(location_name, date_for_dt, local_dt, days_ahead, rows, missing=None):
+    """
+    The stored entry for one location and date. `rows` maps each source ("OpenMeteo.com", ...) to its
+    formatted hourly values, in the order the blocks are written; sources in `missing` (source → reason)
+    get {"missing": <reason>} on their block.
+    """
+    missing = missing or {}
+    blocks = []
+    for source, data in rows.items():
+        block = {
+            "source": source,
+            "data": data,
+            "summary": generate_cloud_summary(data)
+        }
+        # 🕳️ Written without data: say why, and don't summarize the empty values as sunny
+        if missing.get(source):
+            block["missing"] = missing[source]
+            block["summary"] = {period: "Unknown" for period in block["summary"]}
+        blocks.append(block)
 
     # 📦 Build the output structure
     return {
@@ -68,85 +139,63 @@ async def collect_cloud_cover_comparison(lat, lon, location_name, date_for_dt, a
             "date_time_collected": local_dt.strftime("%d/%m/%Y %H:%M"),
             "num_of_days_between_forecast": days_ahead
         },
-        "cloud_cover": [
-            {
-                "source": "OpenWeatherMap.com",
-                "data": owm_data,
-                "summary": generate_cloud_summary(owm_data)
-            },
-            {
-                "source": "OpenMeteo.com",
-                "data": om_data,
-                "summary": generate_cloud_summary(om_data)
-            }
-        ],
+        "cloud_cover": blocks,
     }
 
 async def get_cloud_cover(lat, lon, target_datetime_utc, provider, api_key=None, shared_data=None):
-    if provider == WeatherProvider.OPENWEATHERMAP:
-        if not api_key:
-            raise ValueError("OpenWeatherMap API key is required.")
-        data = shared_data or await fetch_owm_3hour_forecast(lat, lon, api_key)
-        print("📡 Sending request to OpenWeatherMap...", flush=True)
-        return get_owm_3hour_cloud_cover_at_time(data, target_datetime_utc)
-
-    elif provider == WeatherProvider.OPENMETEO:
-        days_ahead = (target_datetime_utc.date() - datetime.now(timezone.utc).date()).days
-        target_hour_utc = target_datetime_utc.replace(minute=0, second=0, microsecond=0)
+    """
+    Cloud cover for one UTC hour from one provider (a name, WeatherProvider or registered provider).
+    Pass shared_data (a TimeIndex the provider already returned) to skip the request.
+    """
+    provider = get_provider(provider)
+    target_hour_utc = target_datetime_utc.replace(minute=0, second=0, microsecond=0)
 
-        data = shared_data or await rate_limited_openmeteo_call(fetch_openmeteo_hourly_cloud_data, lat, lon, days_ahead)
+    index = shared_data
+    if index is None:
+        days_ahead = (target_datetime_utc.date() - datetime.now(timezone.utc).date()).days
+        index = (await provider.fetch([(lat, lon)], (days_ahead, days_ahead), api_key=api_key))[0]
 
-        if not data or "hourly" not in data:
-            print("❌ OpenMeteo data is None or invalid — skipping", flush=True)
-            return {
-                "datetime": target_hour_utc.isoformat(),
-                "cloud_cover": None,
-                "error": "OpenMeteo fetch failed"
-            }
+    if not index:
+        print(f"❌ {provider.name} data is None or invalid — skipping", flush=True)
+        return {
+            "datetime": target_hour_utc.isoformat(),
+            "cloud_cover": None,
+            "error": f"{provider.name} fetch failed"
+        }
 
-        print("🌤️ Request to OpenMeteo complete", flush=True)
-        date_str = target_hour_utc.strftime('%Y-%m-%d')
-        time_str = target_hour_utc.strftime('%H:%M')
-        return get_openmeteo_cloud_cover_at_time(data, date_str, time_str)
+    return {"datetime": target_hour_utc.isoformat(), "cloud_cover": provider.value_at(index, target_hour_utc)}
 
 
 def save_forecast_to_file(new_data, filename="data/cloud_cover.json"):
-    # Load existing data if file exists
-    if os.path.exists(filename):
-        with open(filename, "r") as f:
-            try:
-                existing_data = json.load(f)
-                if not isinstance(existing_data, list):
-                    existing_data = [existing_data]
-            except json.JSONDecodeError:
-                existing_data = []
-    else:
-        existing_data = []
-
-    if is_duplicate(new_data, existing_data):
+    # Entries are appended to the segmented store that backs this file (see weather_/storage.py)
+    store = get_store(filename)
+
+    if is_duplicate(new_data, store):
         print(f"🔁 Duplicate skipped: {new_data['location']} on {new_data['overview']['date_for']} ({new_data['overview']['num_of_days_between_forecast']} days before)")
         return False  # Let caller know it was skipped
 
-    # Append new data
-    existing_data.append(new_data)
-
-    # Write back to file
-    with open(filename, "w") as f:
-        json.dump(existing_data, f, indent=2)
+    # 📐 Fold the new forecast/actual pairs into the running accuracy aggregates
+    aggregates = get_aggregates(filename)  # loaded (or rebuilt) before the append, so it's counted once
+    store.append(new_data)
+    try:
+        aggregates.record(new_data, store)
+    except Exception as e:
+        print(f"⚠️ Accuracy aggregates not updated ({e}); they will be rebuilt on next load", flush=True)
+        discard_aggregates(filename)
 
-    print(f"✅ Forecast appended to {filename}")
+    print(f"✅ Forecast appended to {store.directory}")
     return True  # Let caller know it was saved
 
 def is_duplicate(new_entry, existing_entries):
-    for existing in existing_entries:
-        if (
-            existing["location"].lower() == new_entry["location"].lower() and
-            existing["overview"]["date_for"] == new_entry["overview"]["date_for"] and
-            int(existing["overview"]["num_of_days_between_forecast"]) ==
-            int(new_entry["overview"]["num_of_days_between_forecast"])
-        ):
-            return True
-    return False
+    """
+    Checks whether an entry with the same (location, date_for, num_of_days_between_forecast)
+    already exists. Uses the store's key index (O(1)) when given a (partitioned) store.
+    """
+    if isinstance(existing_entries, (ForecastStore, PartitionedStore)):
+        return existing_entries.contains(new_entry)
+
+    key = forecast_key(new_entry)
+    return any(forecast_key(existing) == key for existing in existing_entries)
 
 def get_forecast_date(days_from_today: int = 0):
     """
@@ -157,14 +206,41 @@ def get_forecast_date(days_from_today: int = 0):
     forecast_date = now_utc + timedelta(days=days_from_today)
     return forecast_date.replace(hour=0, minute=0, second=0, microsecond=0)
 
+# Set TIMEZONEFINDER_IN_MEMORY=1 to load the timezone polygons into RAM (faster lookups, more memory)
+TIMEZONE_FINDER_IN_MEMORY = os.getenv("TIMEZONEFINDER_IN_MEMORY", "0") == "1"
+
+_timezone_finder = None
+
+def _get_timezone_finder():
+    """Returns the process-wide TimezoneFinder, created on first use (loading it is expensive)."""
+    global _timezone_finder
+    if _timezone_finder is None:
+        _timezone_finder = TimezoneFinder(in_memory=TIMEZONE_FINDER_IN_MEMORY)
+    return _timezone_finder
+
+@lru_cache(maxsize=1024)
+def resolve_timezone_name(lat, lon):
+    """
+    Returns the IANA timezone name for coordinates (or None).
+    Memoized in-process, and persisted in the geocode cache next to the location it belongs to.
+    """
+    cache = get_geocache()
+    tz_name = cache.get_timezone(lat, lon)
+    if tz_name:
+        return tz_name
+
+    tz_name = _get_timezone_finder().timezone_at(lat=lat, lng=lon)
+    if tz_name:
+        cache.put_timezone(lat, lon, tz_name)
+    return tz_name
+
 def get_local_datetime(utc_datetime, lat, lon):
     """
     Converts a UTC datetime to the local timezone of the given coordinates.
     Falls back to UTC if timezone lookup fails.
     """
     try:
-        tf = TimezoneFinder()
-        tz_name = tf.timezone_at(lat=lat, lng=lon)
+        tz_name = resolve_timezone_name(lat, lon)
         if tz_name:
             return utc_datetime.astimezone(ZoneInfo(tz_name))
         else:
@@ -215,7 +291,13 @@ def generate_cloud_summary(cloud_data):
         "evening": interpret_cloud_cover(evening_val)
     }
 
+def format_cloud_cover_row(raw_by_time):
+    """Formats a row of raw provider values: {"06:00 UTC": 42.6, ...} → {"06:00 UTC": "42%", ...}."""
+    return {t: format_cloud_cover(v) for t, v in raw_by_time.items()}
+
 def format_cloud_cover(raw_value):
+    # Truncated and not clamped, as the collector has always stored them (the dashboard's
+    # parse_percent_column rounds and clamps when reading)
     try:
         if raw_value is None:
             return None  # or "Missing"
@@ -224,5 +306,5 @@ def format_cloud_cover(raw_value):
             return None
         val = int(float(raw_str))
         return f"{val}%"
-    except (ValueError, TypeError):
+    except (ValueError, TypeError, OverflowError):
         return None
@@ -0,0 +1,276 @@
+# weather_/http_cache.py
+"""
+On-disk cache of provider responses, used by `safe_get`.
+
+Responses are keyed by their normalized URL: scheme and host lowercased, query
+parameters sorted, and credentials (appid, ...) removed, so the key never contains
+the API key and parameter order doesn't matter. Each entry is one gzip-compressed JSON
+file under .cache/http/ holding the parsed body, when it was stored, and the
+provider's ETag / Last-Modified validators.
+
+- Within the provider's TTL (HTTP_CACHE_TTLS) an entry is served with no network
+  round trip (and no rate-limit token).
+- Past the TTL the request is sent with If-None-Match / If-Modified-Since when the
+  entry has validators; a 304 refreshes the entry and serves the cached body.
+- Responses marked `Cache-Control: no-store` are never written.
+- When the directory grows past max_bytes, the least recently used entries are
+  evicted (down to 90% of the limit).
+
+The collector calls the cache from worker threads (asyncio.to_thread), so size
+accounting and eviction are serialized with a lock.
+
+Set HTTP_CACHE_DIR to move the cache and HTTP_CACHE=0 to turn it off.
+    python -m weather_.http_cache stats
+    python -m weather_.http_cache clear [--expired]
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import hashlib
+import threading
+
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HTTP_CACHE_DIR = os.path.join(BASE_DIR, ".cache", "http")
+
+# Seconds a response is served without asking the provider again. Forecasts are
+# refreshed upstream about hourly; geocoding results never change (and are cached
+# longer in data/geocode_cache.json anyway).
+HTTP_CACHE_TTLS = {
+    "OpenWeatherMap": 10 * 60,
+    "OpenMeteo": 15 * 60,
+}
+DEFAULT_HTTP_CACHE_TTL = 10 * 60
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024  # compressed bytes on disk before LRU eviction
+ENTRY_SUFFIX = ".json.gz"
+ENTRY_VERSION = 1
+
+# Query parameters holding credentials: never part of a cache key
+SECRET_PARAMS = {"appid", "api_key", "apikey", "key", "token", "access_token"}
+
+
+def normalize_url(url):
+    """The URL without credentials, with a lowercased scheme/host and sorted query parameters."""
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in SECRET_PARAMS)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", urlencode(query), ""))
+
+
+def cache_key(url):
+    return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+
+
+class CachedResponse:
+    __slots__ = ("url", "source_name", "body", "stored_at", "etag", "last_modified", "path")
+
+    def __init__(self, url, source_name, body, stored_at, etag=None, last_modified=None, path=None):
+        self.url = url
+        self.source_name = source_name
+        self.body = body
+        self.stored_at = stored_at
+        self.etag = etag
+        self.last_modified = last_modified
+        self.path = path
+
+    def age(self, now=None):
+        return (now or time.time()) - self.stored_at
+
+    def validators(self):
+        """Conditional request headers for revalidating this entry (empty when the provider sent none)."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_json(self):
+        return {
+            "version": ENTRY_VERSION,
+            "url": self.url,
+            "source": self.source_name,
+            "stored_at": self.stored_at,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "body": self.body,
+        }
+
+
+class HttpCache:
+    """Directory of gzip-compressed responses, one file per normalized URL."""
+
+    def __init__(self, directory=HTTP_CACHE_DIR, ttls=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.ttls = HTTP_CACHE_TTLS if ttls is None else ttls
+        self.max_bytes = max_bytes
+        self._size = None  # bytes on disk, measured on first write
+        self._lock = threading.RLock()  # guards _size (and eviction)
+
+    def ttl(self, source_name):
+        return self.ttls.get(source_name, DEFAULT_HTTP_CACHE_TTL)
+
+    def _path(self, url):
+        key = cache_key(url)
+        return os.path.join(self.directory, key[:2], key + ENTRY_SUFFIX)
+
+    def get(self, url):
+        """The cached response for url (fresh or stale), or None."""
+        path = self._path(url)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError) as e:  # torn or corrupt entry: drop it
+            print(f"⚠️ Discarding unreadable cache entry {path}: {e}", flush=True)
+            self._remove(path)
+            return None
+        if data.get("version") != ENTRY_VERSION:
+            return None
+        return CachedResponse(
+            data["url"], data.get("source"), data["body"], data["stored_at"],
+            etag=data.get("etag"), last_modified=data.get("last_modified"), path=path,
+        )
+
+    def is_fresh(self, entry, now=None):
+        return entry.age(now) < self.ttl(entry.source_name)
+
+    def put(self, url, source_name, body, etag=None, last_modified=None):
+        """Stores a response (atomically) and evicts old entries if the cache grew too big."""
+        path = self._path(url)
+        entry = CachedResponse(normalize_url(url), source_name, body, time.time(), etag=etag, last_modified=last_modified, path=path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+            json.dump(entry.to_json(), f, separators=(",", ":"), ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._measure()
+            else:
+                self._size += os.path.getsize(path) - previous
+            if self._size > self.max_bytes:
+                self.evict()
+        return entry
+
+    def touch(self, entry):
+        """Marks an entry as just validated (a 304): restarts its TTL and its LRU position."""
+        return self.put(entry.url, entry.source_name, entry.body, etag=entry.etag, last_modified=entry.last_modified)
+
+    def mark_used(self, entry):
+        # LRU order is the file's mtime
+        try:
+            os.utime(entry.path)
+        except OSError:
+            pass
+
+    def _entries(self):
+        """(path, size, mtime) for every entry file."""
+        if not os.path.isdir(self.directory):
+            return []
+        found = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(ENTRY_SUFFIX):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    found.append((path, stat.st_size, stat.st_mtime))
+        return found
+
+    def _measure(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return 0
+        with self._lock:
+            if self._size is not None:
+                self._size -= size
+        return size
+
+    def evict(self, target_bytes=None):
+        """Removes least recently used entries until the cache is under target_bytes (90% of max by default)."""
+        target_bytes = int(self.max_bytes * 0.9) if target_bytes is None else target_bytes
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda item: item[2])
+            self._size = sum(size for _, size, _ in entries)
+            removed = 0
+            for path, _, _ in entries:
+                if self._size <= target_bytes:
+                    break
+                self._remove(path)
+                removed += 1
+        return removed
+
+    def clear(self, expired_only=False):
+        """Removes every entry (or only those past their TTL). Returns the number removed."""
+        removed = 0
+        now = time.time()
+        for path, _, _ in self._entries():
+            if expired_only:
+                try:
+                    with gzip.open(path, "rt", encoding="utf-8") as f:
+                        data = json.load(f)
+                    if now - data["stored_at"] < self.ttl(data.get("source")):
+                        continue
+                except (OSError, EOFError, ValueError, KeyError):
+                    pass  # unreadable: remove it too
+            self._remove(path)
+            removed += 1
+        return removed
+
+    def stats(self):
+        entries = self._entries()
+        return {"directory": self.directory, "entries": len(entries), "bytes": sum(size for _, size, _ in entries), "max_bytes": self.max_bytes}
+
+
+_http_cache = None
+
+
+def get_http_cache():
+    """
+    Returns the process-wide response cache, or None when HTTP_CACHE=0.
+    HTTP_CACHE_DIR overrides its location.
+    """
+    global _http_cache
+    if os.getenv("HTTP_CACHE", "1").strip().lower() in ("0", "false", "off", "no"):
+        return None
+    if _http_cache is None:
+        _http_cache = HttpCache(os.getenv("HTTP_CACHE_DIR") or HTTP_CACHE_DIR)
+    return _http_cache
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="HTTP response cache tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Show the cache's size")
+    clear = sub.add_parser("clear", help="Remove cached responses")
+    clear.add_argument("--expired", action="store_true", help="Only remove responses past their TTL")
+
+    args = parser.parse_args(argv)
+    cache = HttpCache(os.getenv("HTTP_CACHE_DIR") or HTTP_CACHE_DIR)
+
+    if args.command == "stats":
+        stats = cache.stats()
+        print(f"🗄️ {stats['entries']} responses, {stats['bytes'] / 1024:.0f} KiB of {stats['max_bytes'] / 1024 / 1024:.0f} MiB in {stats['directory']}")
+    elif args.command == "clear":
+        print(f"🧹 Removed {cache.clear(expired_only=args.expired)} cached responses")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,288 @@
 # weather_/metrics.py
-import asyncio
+"""
+Collector telemetry for one run: per provider, the API calls sent and the calls answered
+from the HTTP response cache instead, HTTP attempts by status, latency histogram, bytes received, retries, timeouts, rate-limit waits and
+missed per-location deadlines; cache hits/misses (geocoding, HTTP responses,
+fetch planner); and per-location end-to-end time.
 
-# Async-safe counters
-openmeteo_api_calls = 0
-openweathermap_api_calls = 0
+Everything is updated from the collector's single event-loop thread, so the
+counters are plain attributes — no locks.
 
-# Locks for safe concurrent access
-_om_lock = asyncio.Lock()
-_owm_lock = asyncio.Lock()
+At the end of a run `write_metrics("logs")` appends a JSON line to
+logs/collector_metrics.jsonl (one per run, next to weather_log.txt) and rewrites
+logs/collector_metrics.prom in the Prometheus textfile format.
+"""
+import os
+import json
+import time
+from datetime import datetime, timezone
 
-async def increment_openmeteo_calls():
-    global openmeteo_api_calls
-    async with _om_lock:
-        openmeteo_api_calls += 1
+METRICS_JSONL_FILENAME = "collector_metrics.jsonl"
+METRICS_PROM_FILENAME = "collector_metrics.prom"
+PROM_PREFIX = "sunny_dayzz_collector"
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is +Inf
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LOCATION_BUCKETS = (1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+SLOWEST_LOCATIONS = 10  # listed by name; the rest only feed the histogram (bounded output at thousands of locations)
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus style) with sum, count and max."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot: above every bound
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (max for the overflow bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return round(min(bound, self.max), 4)
+        return round(self.max, 4)
+
+    def to_json(self):
+        return {
+            "count": self.count,
+            "sum_s": round(self.sum, 4),
+            "max_s": round(self.max, 4),
+            "p50_s": self.quantile(0.5),
+            "p90_s": self.quantile(0.9),
+            "p99_s": self.quantile(0.99),
+            "buckets": {str(bound): count for bound, count in zip(self.buckets, self.counts)} | {"+Inf": self.counts[-1]},
+        }
+
+
+class ProviderMetrics:
+    def __init__(self):
+        self.calls = 0              # logical API calls that reached the provider (what get_call_counts reports)
+        self.cache_hits = 0         # calls answered from the HTTP response cache, with no request
+        self.requests = 0           # HTTP attempts, retries included
+        self.statuses = {}          # HTTP status (or "error") → attempts
+        self.bytes_received = 0
+        self.retries = 0
+        self.timeouts = 0           # request timeouts and exhausted timeout budgets
+        self.failures = 0           # safe_get calls that gave up (returned None)
+        self.deadline_misses = 0    # locations written without this provider because it was too slow
+        self.rate_limit_waits = 0
+        self.rate_limit_wait_s = 0.0
+        self.rate_limit_rejections = 0
+        self.latency = Histogram()
+
+    def to_json(self):
+        return {
+            "calls": self.calls,
+            "cache_hits": self.cache_hits,
+            "requests": self.requests,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items(), key=lambda item: str(item[0]))},
+            "bytes_received": self.bytes_received,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "deadline_misses": self.deadline_misses,
+            "rate_limit_waits": self.rate_limit_waits,
+            "rate_limit_wait_s": round(self.rate_limit_wait_s, 3),
+            "rate_limit_rejections": self.rate_limit_rejections,
+            "latency": self.latency.to_json(),
+        }
+
+
+class CollectorMetrics:
+    def __init__(self):
+        self.started = time.time()
+        self.providers = {}
+        self.caches = {}            # cache name → {"hits": n, "misses": n}
+        self.locations = {}         # location → seconds from taking a concurrency slot until its forecasts were written
+        self.location_times = Histogram(LOCATION_BUCKETS)
+
+    def provider(self, source_name):
+        metrics = self.providers.get(source_name)
+        if metrics is None:
+            metrics = self.providers[source_name] = ProviderMetrics()
+        return metrics
+
+    # ---------- recording ----------
+    def record_call(self, source_name):
+        self.provider(source_name).calls += 1
+
+    def record_cache_hit(self, source_name):
+        self.provider(source_name).cache_hits += 1
+
+    def record_request(self, source_name, seconds, status, bytes_received=0):
+        metrics = self.provider(source_name)
+        metrics.requests += 1
+        metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+        metrics.bytes_received += bytes_received
+        metrics.latency.observe(seconds)
+
+    def record_retry(self, source_name):
+        self.provider(source_name).retries += 1
+
+    def record_timeout(self, source_name):
+        self.provider(source_name).timeouts += 1
+
+    def record_failure(self, source_name):
+        self.provider(source_name).failures += 1
+
+    def record_deadline_miss(self, source_name):
+        self.provider(source_name).deadline_misses += 1
+
+    def record_rate_limit_wait(self, source_name, seconds):
+        if seconds > 0:
+            metrics = self.provider(source_name)
+            metrics.rate_limit_waits += 1
+            metrics.rate_limit_wait_s += seconds
+
+    def record_rate_limit_rejection(self, source_name):
+        self.provider(source_name).rate_limit_rejections += 1
+
+    def record_cache(self, cache_name, hit):
+        counts = self.caches.setdefault(cache_name, {"hits": 0, "misses": 0})
+        counts["hits" if hit else "misses"] += 1
+
+    def record_location(self, location, seconds):
+        self.locations[location] = seconds
+        self.location_times.observe(seconds)
+
+    # ---------- export ----------
+    def snapshot(self):
+        return {
+            "run_started": datetime.fromtimestamp(self.started, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "duration_s": round(time.time() - self.started, 3),
+            "providers": {name: metrics.to_json() for name, metrics in sorted(self.providers.items())},
+            "caches": dict(sorted(self.caches.items())),
+            "locations": {
+                **self.location_times.to_json(),
+                "slowest": {
+                    name: round(seconds, 3)
+                    for name, seconds in sorted(self.locations.items(), key=lambda item: -item[1])[:SLOWEST_LOCATIONS]
+                },
+            },
+        }
+
+    def to_prometheus(self):
+        """The run's metrics in the Prometheus text exposition format (for node_exporter's textfile collector)."""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            full_name = f"{PROM_PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels.items())
+                lines.append(f"{full_name}{{{label_text}}} {value}" if label_text else f"{full_name} {value}")
+
+        providers = sorted(self.providers.items())
+        metric("run_start_time_seconds", "gauge", "Unix time the run started.", [({}, round(self.started, 3))])
+        metric("run_duration_seconds", "gauge", "Wall-clock duration of the run.", [({}, round(time.time() - self.started, 3))])
+        metric("api_calls_total", "counter", "Logical API calls per provider.",
+               [({"provider": p}, m.calls) for p, m in providers])
+        metric("http_cache_hits_total", "counter", "API calls per provider answered from the HTTP response cache.",
+               [({"provider": p}, m.cache_hits) for p, m in providers])
+        metric("http_requests_total", "counter", "HTTP attempts per provider and status.",
+               [({"provider": p, "status": str(s)}, n) for p, m in providers for s, n in sorted(m.statuses.items(), key=lambda i: str(i[0]))])
+        metric("bytes_received_total", "counter", "Response bytes received per provider.",
+               [({"provider": p}, m.bytes_received) for p, m in providers])
+        metric("retries_total", "counter", "Retried requests per provider.", [({"provider": p}, m.retries) for p, m in providers])
+        metric("timeouts_total", "counter", "Timed-out requests per provider.", [({"provider": p}, m.timeouts) for p, m in providers])
+        metric("failures_total", "counter", "Requests that failed after every retry.", [({"provider": p}, m.failures) for p, m in providers])
+        metric("deadline_misses_total", "counter", "Locations written without the provider because it missed its deadline.",
+               [({"provider": p}, m.deadline_misses) for p, m in providers])
+        metric("rate_limit_wait_seconds_total", "counter", "Seconds spent queueing for a rate-limit slot.",
+               [({"provider": p}, round(m.rate_limit_wait_s, 3)) for p, m in providers])
+        metric("rate_limit_rejections_total", "counter", "Requests dropped because the rate-limit queue was too long.",
+               [({"provider": p}, m.rate_limit_rejections) for p, m in providers])
+
+        for i, (p, m) in enumerate(providers):
+            _prom_histogram(lines, "request_duration_seconds", "HTTP request latency per provider.", m.latency, {"provider": p}, header=i == 0)
+        metric("cache_hits_total", "counter", "Cache hits per cache.",
+               [({"cache": c}, counts["hits"]) for c, counts in sorted(self.caches.items())])
+        metric("cache_misses_total", "counter", "Cache misses per cache.",
+               [({"cache": c}, counts["misses"]) for c, counts in sorted(self.caches.items())])
+        _prom_histogram(lines, "location_duration_seconds", "Seconds from a location taking a concurrency slot until its forecasts were written.", self.location_times)
+        return "\n".join(lines) + "\n"
+
+
+def _prom_histogram(lines, name, help_text, hist, labels=None, header=True):
+    """Appends a Histogram in the Prometheus text format (cumulative _bucket series, _sum, _count)."""
+    full_name = f"{PROM_PREFIX}_{name}"
+    if header:
+        lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} histogram")
+    label_text = ",".join(f'{k}="{_escape_label(v)}"' for k, v in (labels or {}).items())
+    cumulative = 0
+    for bound, count in zip(hist.buckets + ("+Inf",), hist.counts):
+        cumulative += count
+        lines.append(f'{full_name}_bucket{{{label_text + "," if label_text else ""}le="{bound}"}} {cumulative}')
+    suffix = f"{{{label_text}}}" if label_text else ""
+    lines.append(f"{full_name}_sum{suffix} {round(hist.sum, 4)}")
+    lines.append(f"{full_name}_count{suffix} {hist.count}")
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+_metrics = CollectorMetrics()
+
+
+def get_metrics():
+    """The current run's metrics."""
+    return _metrics
+
+
+def reset_metrics():
+    """Starts a fresh set of metrics (e.g. for a second run in the same process)."""
+    global _metrics
+    _metrics = CollectorMetrics()
+    return _metrics
 
-async def increment_openweathermap_calls():
-    global openweathermap_api_calls
-    async with _owm_lock:
-        openweathermap_api_calls += 1
 
 def get_call_counts():
-    return {
-        "OpenMeteo": openmeteo_api_calls,
-        "OpenWeatherMap": openweathermap_api_calls
-    }
+    """Logical API calls sent to each provider this run (cache hits excluded, see get_cache_hit_counts)."""
+    return {name: metrics.calls for name, metrics in sorted(_metrics.providers.items())}
+
+
+def get_cache_hit_counts():
+    """API calls per provider answered from the HTTP response cache this run."""
+    return {name: metrics.cache_hits for name, metrics in sorted(_metrics.providers.items())}
+
+
+def write_metrics(log_dir, metrics=None):
+    """
+    Appends the run's metrics as one JSON line to <log_dir>/collector_metrics.jsonl and
+    rewrites <log_dir>/collector_metrics.prom. Returns the snapshot written.
+    """
+    metrics = metrics or _metrics
+    os.makedirs(log_dir, exist_ok=True)
+    snapshot = metrics.snapshot()
+
+    with open(os.path.join(log_dir, METRICS_JSONL_FILENAME), "a") as f:
+        f.write(json.dumps(snapshot, ensure_ascii=False) + "\n")
+
+    # Written atomically: the textfile collector may read it at any moment
+    prom_path = os.path.join(log_dir, METRICS_PROM_FILENAME)
+    tmp_path = prom_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(metrics.to_prometheus())
+    os.replace(tmp_path, prom_path)
+    return snapshot
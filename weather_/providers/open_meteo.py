@@ -1,53 +1,130 @@
-import time
-import json
+import os
+import asyncio
 
 from datetime import datetime, timedelta, timezone
-from weather_.utils import safe_get
-from weather_.metrics import increment_openmeteo_calls
+from weather_.utils import cached_body, safe_get, store_body
+from weather_.rate_limiter import get_rate_limiter
+from weather_.time_index import TimeIndex, wall_clock_epoch, format_wall_clock
+from weather_.providers.registry import ForecastProvider, ProviderCapabilities, register_provider
 
-async def fetch_openmeteo_hourly_cloud_data(lat, lon, days_ahead, timezone_str="auto"):
+# Open-Meteo accepts comma-separated coordinate lists; keep URLs a sensible length
+OPENMETEO_BATCH_SIZE = 50
+
+# Set OPENMETEO_BASE_URL to point the collector at another server (e.g. benchmarks/mock_providers.py)
+OPENMETEO_BASE_URL = "https://api.open-meteo.com"
+
+def openmeteo_base_url():
+    return (os.getenv("OPENMETEO_BASE_URL") or OPENMETEO_BASE_URL).rstrip("/")
+
+def _openmeteo_url(latitudes, longitudes, days_ahead, timezone_str, end_days_ahead):
     now_utc = datetime.now(timezone.utc)
-    target_date = (now_utc + timedelta(days=days_ahead)).strftime('%Y-%m-%d')
-    url = (
-        f"https://api.open-meteo.com/v1/forecast?"
-        f"latitude={lat}&longitude={lon}"
+    start_date = (now_utc + timedelta(days=days_ahead)).strftime('%Y-%m-%d')
+    end_date = (now_utc + timedelta(days=days_ahead if end_days_ahead is None else end_days_ahead)).strftime('%Y-%m-%d')
+    return (
+        f"{openmeteo_base_url()}/v1/forecast?"
+        f"latitude={latitudes}&longitude={longitudes}"
         f"&hourly=cloudcover"
         f"&timezone={timezone_str}"
-        f"&start_date={target_date}&end_date={target_date}"
+        f"&start_date={start_date}&end_date={end_date}"
     )
-    
-    await increment_openmeteo_calls()
-    return await safe_get(source_name="OpenMeteo", url=url)
+
+async def fetch_openmeteo_hourly_cloud_data(lat, lon, days_ahead, timezone_str="auto", end_days_ahead=None):
+    # Fetches days_ahead..end_days_ahead (inclusive) in one request; a single day by default
+    url = _openmeteo_url(lat, lon, days_ahead, timezone_str, end_days_ahead)
+    return await safe_get(source_name="OpenMeteo", url=url, limiter=get_rate_limiter("OpenMeteo"), count_call=True)
+
+def build_openmeteo_time_index(hourly_data):
+    """Parses an hourly response once into a sorted TimeIndex (reuse it for every target hour)."""
+    return hourly_data if isinstance(hourly_data, TimeIndex) else TimeIndex.from_openmeteo(hourly_data)
 
 def get_openmeteo_cloud_cover_at_time(hourly_data, date_str, time_str):
+    # Accepts the raw response or a prebuilt TimeIndex; lookup is O(log n) via bisect
     full_target = f"{date_str}T{time_str}"
-    times = hourly_data.get("hourly", {}).get("time", [])
-    clouds = hourly_data.get("hourly", {}).get("cloudcover", [])
-    for t, c in zip(times, clouds):
-        if t == full_target:
-            return {"datetime": t, "cloud_cover": c}
+    match = build_openmeteo_time_index(hourly_data).exact(wall_clock_epoch(date_str, time_str))
+    if match:
+        return {"datetime": format_wall_clock(match[0]), "cloud_cover": match[1]}
     return {"datetime": full_target, "cloud_cover": None, "error": "Not found"}
 
-# 1 request per second (change this value as needed) ~ GitHub Actions is too fast for OpenMeteo's API rate allowance on their free-tier
-# So, we have to slow dow calls to this API (specifically if GitHub Actions is making these API calls for us)
+# OpenMeteo's free tier throttles GitHub Actions runners quickly, so every request goes through
+# the OpenMeteo token bucket (limits declared in OpenMeteoProvider.capabilities; configure_rate_limit overrides them).
+# safe_get already retries transient failures; this wrapper only validates the result.
 async def rate_limited_openmeteo_call(func, *args, **kwargs):
-    for attempt in range(1, 4):
-        try:
-            result = await func(*args, **kwargs)
-            
-            if result is None:
-                print("❌ Received None from OpenMeteo.", flush=True)
-            elif not isinstance(result, dict):
-                print(f"⚠️ Unexpected result type from OpenMeteo: {type(result)}", flush=True)
-
-            if attempt > 1:
-                print(f"✅ OpenMeteo API call only succeeded on attempt #{attempt}. Result: {result}", flush=True)
-            return result
-
-        except Exception as e:
-            print(f"⚠️ OpenMeteo threw an error on attempt #{attempt}. Result is NOT 'None', but exception caught.\nError: {e}", flush=True)
-            if attempt < 3:
-                time.sleep(2)
+    try:
+        result = await func(*args, **kwargs)
+    except Exception as e:
+        print(f"⚠️ OpenMeteo threw an error. Result is NOT 'None', but exception caught.\nError: {e}", flush=True)
+        return None
+
+    if result is None:
+        print("❌ Received None from OpenMeteo.", flush=True)
+    elif not isinstance(result, dict):
+        print(f"⚠️ Unexpected result type from OpenMeteo: {type(result)}", flush=True)
+    return result
+
+
+@register_provider
+class OpenMeteoProvider(ForecastProvider):
+    """
+    Open-Meteo hourly forecasts. Accepts comma-separated coordinate lists, so a whole batch
+    is one request; a batch whose request fails is retried location by location.
+
+    Responses are cached per location, under the URL a single-location request would use:
+    a batch only asks for the locations that aren't cached, and its response is split into
+    one cache entry per location. (A batch URL as the key would only match the exact same
+    set of coordinates again.)
+    """
+
+    name = "OpenMeteo"
+    source = "OpenMeteo.com"
+    # 600 calls/minute on the free tier, but GitHub Actions runners get throttled well before
+    # that, so we stay at ~1 request per second
+    capabilities = ProviderCapabilities(max_batch_size=OPENMETEO_BATCH_SIZE, rate=1.0, burst=3, horizon_days=16, resolution_hours=1)
+
+    async def fetch_batch(self, locations, date_range, api_key=None):
+        first, last = date_range
+        if len(locations) == 1:
+            lat, lon = locations[0]
+            return [_to_index(await rate_limited_openmeteo_call(fetch_openmeteo_hourly_cloud_data, lat, lon, first, end_days_ahead=last))]
+
+        urls = [_openmeteo_url(lat, lon, first, "auto", last) for lat, lon in locations]
+        cached = await asyncio.gather(*(cached_body(url, self.name, count_call=True) for url in urls))
+        indexes = [_to_index(body) for body in cached]
+        missing = [i for i, body in enumerate(cached) if body is None]
+        if not missing:
+            return indexes
+
+        url = _openmeteo_url(
+            ",".join(str(locations[i][0]) for i in missing),
+            ",".join(str(locations[i][1]) for i in missing),
+            first, "auto", last,
+        )
+        result = await safe_get(source_name=self.name, url=url, limiter=self.limiter, use_cache=False, count_call=True)
+        if len(missing) == 1 and isinstance(result, dict):
+            result = [result]  # one coordinate: a single object, not a list
+
+        if not isinstance(result, list) or len(result) != len(missing):
+            print(f"⚠️ OpenMeteo batch of {len(missing)} failed — falling back to per-location requests", flush=True)
+            results = await asyncio.gather(*(
+                rate_limited_openmeteo_call(fetch_openmeteo_hourly_cloud_data, *locations[i], first, end_days_ahead=last)
+                for i in missing
+            ))
+            for i, item in zip(missing, results):
+                indexes[i] = _to_index(item)
+            return indexes
+
+        # Per-location errors come back as {"error": true, "reason": ...} items
+        stored = []
+        for i, item in zip(missing, result):
+            indexes[i] = _to_index(item)
+            if indexes[i] is None:
+                print(f"❌ OpenMeteo returned no data for {locations[i]}: {item}", flush=True)
             else:
-                return None
+                stored.append(store_body(urls[i], self.name, item))
+        await asyncio.gather(*stored)
+        return indexes
 
+def _to_index(response):
+    # A valid hourly response → TimeIndex; anything else → None
+    if isinstance(response, dict) and "hourly" in response:
+        return build_openmeteo_time_index(response)
+    return None
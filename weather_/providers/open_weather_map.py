@@ -1,24 +1,41 @@
-import httpx
+import os
 
 from datetime import datetime, timezone
 from weather_.utils import safe_get
-from weather_.metrics import increment_openweathermap_calls
+from weather_.rate_limiter import get_rate_limiter
+from weather_.geocache import get_geocache
+from weather_.time_index import TimeIndex
+from weather_.metrics import get_metrics
+from weather_.providers.registry import ForecastProvider, ProviderCapabilities, register_provider
+
+# Set OPENWEATHERMAP_BASE_URL to point the collector at another server (e.g. benchmarks/mock_providers.py)
+OPENWEATHERMAP_BASE_URL = "http://api.openweathermap.org"
+
+def openweathermap_base_url():
+    return (os.getenv("OPENWEATHERMAP_BASE_URL") or OPENWEATHERMAP_BASE_URL).rstrip("/")
 
 async def get_lat_lon(city_name, api_key):
+    # 📍 Cached locations skip the geocoding round trip entirely
+    cached = get_geocache().get(city_name)
+    get_metrics().record_cache("geocode", hit=bool(cached))
+    if cached:
+        return cached["lat"], cached["lon"]
 
     if not api_key:
         raise Exception("API key not found. Did you set it in the .env file?")
     
-    url = f"http://api.openweathermap.org/geo/1.0/direct?q={city_name}&appid={api_key}"
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-    data = response.json()
-    
+    url = f"{openweathermap_base_url()}/geo/1.0/direct?q={city_name}&appid={api_key}"
+    data = await safe_get(source_name="OpenWeatherMap", url=url, limiter=get_rate_limiter("OpenWeatherMap"))
+
+    if data is None:
+        raise Exception(f"Geocoding request for '{city_name}' failed.")
     if not data:
         raise Exception(f"City '{city_name}' not found.")
     
     lat = data[0]['lat']
     lon = data[0]['lon']
+    get_geocache().put(city_name, lat, lon, name=data[0].get("name"), country=data[0].get("country"))
+    print(f"📍 Geocoded {city_name} → ({lat}, {lon})", flush=True)
     return lat, lon
     
 async def fetch_owm_3hour_forecast(lat, lon, api_key):
@@ -30,33 +47,50 @@ async def fetch_owm_3hour_forecast(lat, lon, api_key):
     3 hour forecast: (upt to) 5 days
     """
     url = (
-        f"http://api.openweathermap.org/data/2.5/forecast?"
+        f"{openweathermap_base_url()}/data/2.5/forecast?"
         f"lat={lat}&lon={lon}&units=metric&appid={api_key}"
     )
 
-    await increment_openweathermap_calls()
-    return await safe_get(source_name="OpenWeatherMap", url=url)
+    return await safe_get(source_name="OpenWeatherMap", url=url, limiter=get_rate_limiter("OpenWeatherMap"), count_call=True)
 
-def get_owm_3hour_cloud_cover_at_time(data, target_dt_utc):
-    closest_entry = None
-    min_diff = float('inf')
-
-    for entry in data.get("list", []):
-        forecast_time = datetime.fromtimestamp(entry["dt"], tz=timezone.utc)
-        diff = abs((forecast_time - target_dt_utc).total_seconds())
+def build_owm_time_index(data):
+    """Parses a 5-day/3-hour forecast once into a sorted TimeIndex (reuse it for every target hour)."""
+    return data if isinstance(data, TimeIndex) else TimeIndex.from_owm(data)
 
-        if diff < min_diff:
-            min_diff = diff
-            closest_entry = entry
+def get_owm_3hour_cloud_cover_at_time(data, target_dt_utc):
+    # Accepts the raw response or a prebuilt TimeIndex; lookup is O(log n) via bisect
+    match = build_owm_time_index(data).nearest(target_dt_utc.timestamp())
 
-    if closest_entry:
+    if match:
+        forecast_epoch, cloud_cover = match
         return {
-            "datetime": datetime.fromtimestamp(closest_entry["dt"], tz=timezone.utc).isoformat(),
-            "cloud_cover": closest_entry["clouds"]["all"]
+            "datetime": datetime.fromtimestamp(forecast_epoch, tz=timezone.utc).isoformat(),
+            "cloud_cover": cloud_cover
         }
 
     return {
         "datetime": target_dt_utc.isoformat(),
         "cloud_cover": None,
         "error": "No matching data found"
-    }
\ No newline at end of file
+    }
+
+
+@register_provider
+class OpenWeatherMapProvider(ForecastProvider):
+    """
+    OpenWeatherMap's free 5-day/3-hour forecast: one request per location, and each
+    response covers every horizon (so the date range doesn't change the request).
+    """
+
+    name = "OpenWeatherMap"
+    source = "OpenWeatherMap.com"
+    # Free tier: 60 calls/minute, kept slightly under
+    capabilities = ProviderCapabilities(max_batch_size=1, rate=55 / 60, burst=5, horizon_days=5, resolution_hours=3)
+
+    async def fetch_batch(self, locations, date_range, api_key=None):
+        api_key = api_key or os.getenv("FREE_TIER_OPENWEATHERMAP_API_KEY")
+        if not api_key:
+            raise ValueError("OpenWeatherMap API key is required.")
+        lat, lon = locations[0]
+        data = await fetch_owm_3hour_forecast(lat, lon, api_key)
+        return [build_owm_time_index(data) if data else None]
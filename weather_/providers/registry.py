@@ -0,0 +1,189 @@
+# weather_/providers/registry.py
+"""
+Forecast provider plugins.
+
+A provider is a `ForecastProvider` subclass registered with `@register_provider`. It
+declares its capabilities and implements one async method:
+
+    async def fetch_batch(self, locations, date_range, api_key=None) -> [TimeIndex or None, ...]
+
+`locations` is a list of (lat, lon) pairs (at most `capabilities.max_batch_size`
+of them) and `date_range` is (first, last) days ahead of today (UTC), already clipped to
+the provider's horizon. The result is aligned with `locations`: a TimeIndex of cloud
+cover (0-100) by epoch seconds for each location, or None when that location failed.
+`fetch(locations, date_range)` splits any number of locations into batches and runs
+them concurrently; the provider's own rate limiter (built from its capabilities) paces
+the requests.
+
+The collector, the fetch planner and the stored entries only go through this
+interface, so adding a source is one new module:
+
+    @register_provider
+    class MyProvider(ForecastProvider):
+        name = "MySource"            # logs, metrics and the rate limiter
+        source = "MySource.com"      # the "source" of its cloud_cover blocks
+        capabilities = ProviderCapabilities(max_batch_size=1, rate=1.0, burst=1, horizon_days=7, resolution_hours=1)
+
+        async def fetch_batch(self, locations, date_range, api_key=None):
+            ...
+
+listed in PROVIDER_MODULES (or imported before the collector runs).
+
+Providers are ordered by their module's position in PROVIDER_MODULES, whatever order
+the modules happen to be imported in; any others follow in registration order.
+"""
+import abc
+import asyncio
+import importlib
+
+from weather_.rate_limiter import RATE_LIMITS, get_rate_limiter
+
+# Modules whose import registers the built-in providers, in the order providers appear in
+# stored entries
+PROVIDER_MODULES = (
+    "weather_.providers.open_weather_map",
+    "weather_.providers.open_meteo",
+)
+
+DEFAULT_MAX_WAIT = 120.0  # seconds a request may queue for a rate-limit slot
+
+
+class ProviderCapabilities:
+    """
+    What a provider can serve and how hard it may be called.
+
+    max_batch_size:   locations per request (1 = no multi-location requests)
+    rate, burst:      requests per second and burst size allowed by the provider
+    horizon_days:     furthest day ahead it forecasts
+    resolution_hours: spacing of its forecast values (1 = hourly, 3 = 3-hourly)
+    """
+
+    def __init__(self, max_batch_size=1, rate=1.0, burst=1, horizon_days=5, resolution_hours=1, max_wait=DEFAULT_MAX_WAIT):
+        if max_batch_size < 1 or horizon_days < 0 or resolution_hours < 1:
+            raise ValueError("max_batch_size and resolution_hours must be >= 1, horizon_days >= 0")
+        self.max_batch_size = max_batch_size
+        self.rate = rate
+        self.burst = burst
+        self.horizon_days = horizon_days
+        self.resolution_hours = resolution_hours
+        self.max_wait = max_wait
+
+    def rate_limit(self):
+        return {"rate": self.rate, "burst": self.burst, "max_wait": self.max_wait}
+
+
+class ForecastProvider(abc.ABC):
+    """Base class for provider plugins (see the module docstring)."""
+
+    name = None
+    source = None
+    capabilities = ProviderCapabilities()
+
+    @property
+    def limiter(self):
+        return get_rate_limiter(self.name)
+
+    def clip_date_range(self, date_range):
+        """(first, last) days ahead limited to the horizon, or None when the provider can't serve any of it."""
+        first, last = date_range
+        last = min(last, self.capabilities.horizon_days)
+        return (first, last) if first <= last else None
+
+    def covers(self, days_ahead):
+        return 0 <= days_ahead <= self.capabilities.horizon_days
+
+    async def fetch(self, locations, date_range, api_key=None):
+        """
+        Time-indexed cloud cover for every (lat, lon) in `locations` over `date_range`.
+        Returns a list aligned with `locations` (None where a location failed or is out of range).
+        """
+        locations = list(locations)
+        clipped = self.clip_date_range(date_range)
+        if clipped is None or not locations:
+            return [None] * len(locations)
+
+        size = self.capabilities.max_batch_size
+        batches = [locations[i:i + size] for i in range(0, len(locations), size)]
+        results = await asyncio.gather(*(self._fetch_batch_safely(batch, clipped, api_key) for batch in batches))
+        return [index for batch_result in results for index in batch_result]
+
+    async def _fetch_batch_safely(self, batch, date_range, api_key):
+        try:
+            result = await self.fetch_batch(batch, date_range, api_key=api_key)
+        except Exception as e:
+            print(f"❌ {self.name} batch of {len(batch)} failed: {e}", flush=True)
+            return [None] * len(batch)
+        if not isinstance(result, list) or len(result) != len(batch):
+            print(f"⚠️ {self.name} returned {type(result).__name__} for a batch of {len(batch)} — treating it as failed", flush=True)
+            return [None] * len(batch)
+        return result
+
+    @abc.abstractmethod
+    async def fetch_batch(self, locations, date_range, api_key=None):
+        """One request's worth of locations (see the module docstring)."""
+
+    def value_at(self, index, target_dt):
+        """
+        Cloud cover for one UTC hour: the exact hour for hourly providers, the closest
+        value for coarser ones. None when the index has nothing for it.
+        """
+        epoch = int(target_dt.timestamp())
+        match = index.exact(epoch) if self.capabilities.resolution_hours == 1 else index.nearest(epoch)
+        return match[1] if match else None
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name}>"
+
+
+_providers = {}
+_builtins_loaded = False
+
+
+def register_provider(cls):
+    """Class decorator: registers a ForecastProvider subclass (one shared instance per name)."""
+    if not cls.name or not cls.source:
+        raise ValueError(f"{cls.__name__} needs a name and a source")
+    _providers[cls.name] = cls()
+    ordered = sorted(_providers.values(), key=_module_rank)  # stable: others keep registration order
+    _providers.clear()
+    _providers.update((provider.name, provider) for provider in ordered)
+    # The provider's declared limits become its rate limiter's defaults (configure_rate_limit still overrides them)
+    RATE_LIMITS.setdefault(cls.name, cls.capabilities.rate_limit())
+    return cls
+
+
+def _module_rank(provider):
+    module = type(provider).__module__
+    return PROVIDER_MODULES.index(module) if module in PROVIDER_MODULES else len(PROVIDER_MODULES)
+
+
+def _load_builtin_providers():
+    global _builtins_loaded
+    if not _builtins_loaded:
+        _builtins_loaded = True
+        for module in PROVIDER_MODULES:
+            importlib.import_module(module)
+
+
+def get_providers(names=None):
+    """Registered providers in PROVIDER_MODULES order, or the named ones (KeyError for unknown names)."""
+    _load_builtin_providers()
+    if names is None:
+        return list(_providers.values())
+    return [get_provider(name) for name in names]
+
+
+def get_provider(name):
+    """A registered provider by name (case-insensitive); also accepts a WeatherProvider or a provider."""
+    if isinstance(name, ForecastProvider):
+        return name
+    _load_builtin_providers()
+    name = getattr(name, "source_name", name)
+    for provider_name, provider in _providers.items():
+        if provider_name.lower() == str(name).lower():
+            return provider
+    raise KeyError(f"Unknown provider '{name}' (registered: {', '.join(_providers)})")
+
+
+def provider_names():
+    return [provider.name for provider in get_providers()]
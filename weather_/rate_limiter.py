@@ -0,0 +1,120 @@
+# weather_/rate_limiter.py
+import asyncio
+
+# Provider name → {"rate", "burst", "max_wait"}. Filled in from each provider's declared capabilities
+# when it is registered (see weather_/providers/registry.py); configure_rate_limit overrides an entry.
+RATE_LIMITS = {}
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a caller would have to queue longer than the limiter's max_wait."""
+
+
+class AsyncTokenBucket:
+    """
+    Token bucket for asyncio: `rate` tokens per second, holding at most `burst` tokens.
+
+    Each acquire() reserves a token immediately (the balance may go negative) and then
+    sleeps until that token has been refilled, so callers are served in FIFO order
+    without a lock and without blocking the event loop.
+    """
+
+    def __init__(self, rate, burst=1, max_wait=None, name="limiter"):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be > 0 and burst >= 1")
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.name = name
+        self._tokens = float(burst)
+        self._updated = None
+
+        # Queue-wait statistics
+        self.acquired = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.longest_wait = 0.0
+
+    def _refill(self, now):
+        if self._updated is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens=1):
+        """Waits for `tokens` tokens and returns the number of seconds spent queueing."""
+        loop = asyncio.get_running_loop()
+        self._refill(loop.time())
+
+        self._tokens -= tokens
+        wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if self.max_wait is not None and wait > self.max_wait:
+            self._tokens += tokens  # give the reservation back
+            raise RateLimitTimeout(
+                f"{self.name}: would wait {wait:.1f}s for a slot (max_wait={self.max_wait:.1f}s)"
+            )
+
+        if wait > 0:
+            await asyncio.sleep(wait)
+            self.waited += 1
+            self.total_wait += wait
+            self.longest_wait = max(self.longest_wait, wait)
+
+        self.acquired += 1
+        return wait
+
+    def stats(self):
+        return {
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "total_wait_s": round(self.total_wait, 3),
+            "avg_wait_s": round(self.total_wait / self.acquired, 3) if self.acquired else 0.0,
+            "max_wait_s": round(self.longest_wait, 3),
+        }
+
+
+_limiters = {}
+
+
+def _provider_name(provider):
+    # Accepts a provider name, a registered provider or a WeatherProvider
+    if hasattr(provider, "source_name"):
+        return provider.source_name
+    return provider if isinstance(provider, str) else provider.name
+
+
+def _limits_for(name):
+    if name not in RATE_LIMITS:
+        from weather_.providers.registry import get_provider
+
+        get_provider(name)  # registering the provider records its declared limits
+    return RATE_LIMITS[name]
+
+
+def get_rate_limiter(provider):
+    """Returns the shared limiter for a provider, built from RATE_LIMITS."""
+    name = _provider_name(provider)
+    limiter = _limiters.get(name)
+    if limiter is None:
+        limiter = AsyncTokenBucket(name=name, **_limits_for(name))
+        _limiters[name] = limiter
+    return limiter
+
+
+def configure_rate_limit(provider, rate=None, burst=None, max_wait=None):
+    """Overrides a provider's limits. The new limiter replaces the old one (and its stats)."""
+    name = _provider_name(provider)
+    limits = dict(_limits_for(name))
+    if rate is not None:
+        limits["rate"] = rate
+    if burst is not None:
+        limits["burst"] = burst
+    if max_wait is not None:
+        limits["max_wait"] = max_wait
+    RATE_LIMITS[name] = limits
+    _limiters.pop(name, None)
+
+
+def get_rate_limit_stats():
+    """Queue-wait statistics per provider, keyed by provider name."""
+    return {name: limiter.stats() for name, limiter in _limiters.items()}
@@ -0,0 +1,943 @@
+"""
+Append-only storage for collected forecasts.
+
+Forecast entries are written one JSON document per line into numbered segment
+files (segment-000001.jsonl, segment-000002.jsonl, ...) inside a store
+directory. Appending an entry never rewrites existing data, writes are
+fsync'ed in batches, and a new segment is started once the active one grows
+past `max_segment_bytes`.
+
+Each store keeps a sidecar index (index.json) mapping every entry's key
+(location, date_for, num_of_days_between_forecast) to its position, so duplicate
+checks are O(1). The index is rebuilt from the segments when missing or stale.
+
+The store for "data/cloud_cover.json" lives in "data/cloud_cover/" and is
+partitioned by location: each location gets its own segments and index under
+"data/cloud_cover/locations/<name>/", and a small manifest.json lists every
+location with its entry count, date range and forecast leads. Readers that
+need one location (or just the list of locations) never touch the others.
+
+Readers should go through `load_entries` / `load_manifest`, which transparently
+fall back to the legacy JSON array file when no store exists yet. Once the
+collector has migrated the legacy file (`get_store`), the file is removed, so a
+stale copy isn't kept (and committed) next to the store.
+
+One-shot migration of the legacy file:
+    python -m weather_.storage migrate data/cloud_cover.json
+Splitting a store written before partitioning (segments directly in data/cloud_cover/):
+    python -m weather_.storage repartition data/cloud_cover.json
+"""
+import os
+import re
+import sys
+import json
+import threading
+
+from collections import OrderedDict
+from datetime import datetime
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+DEFAULT_MAX_SEGMENT_BYTES = 4 * 1024 * 1024  # 4 MB per segment
+DEFAULT_FSYNC_EVERY = 32  # entries written between fsyncs
+INDEX_FILENAME = "index.json"
+INDEX_VERSION = 1
+PARTITIONS_DIRNAME = "locations"
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+MAX_OPEN_PARTITIONS = 64  # partitions kept open for appending at once (bounds file handles)
+
+
+def forecast_key(entry):
+    """
+    Returns the identity of a forecast entry: (location, date_for, num_of_days_between_forecast).
+    Location is case-insensitive. Returns None for malformed entries.
+    """
+    try:
+        overview = entry["overview"]
+        return (
+            entry["location"].lower(),
+            overview["date_for"],
+            int(overview["num_of_days_between_forecast"]),
+        )
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None
+
+
+def store_dir_for(path):
+    """
+    Returns the store directory for a data file path.
+    Example: "data/cloud_cover.json" → "data/cloud_cover"
+    """
+    root, ext = os.path.splitext(path)
+    return root if ext in (".json", ".jsonl") else path
+
+
+def list_segments(directory):
+    """Returns the segment file paths of a store directory, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(
+        name for name in os.listdir(directory)
+        if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+    )
+    return [os.path.join(directory, name) for name in names]
+
+
+def partition_name(location):
+    """Directory name of a location's partition: "Port Elizabeth" → "port-elizabeth" """
+    return re.sub(r"[^\w]+", "-", str(location).lower()).strip("-") or "_"
+
+
+def partition_dir_for(directory, location):
+    return os.path.join(directory, PARTITIONS_DIRNAME, partition_name(location))
+
+
+def list_partitions(directory):
+    """Returns the location partition directories of a store, sorted by name."""
+    root = os.path.join(directory, PARTITIONS_DIRNAME)
+    if not os.path.isdir(root):
+        return []
+    return [
+        os.path.join(root, name) for name in sorted(os.listdir(root))
+        if os.path.isdir(os.path.join(root, name))
+    ]
+
+
+def list_store_segments(directory, location=None):
+    """
+    Every segment of a store (or only those holding `location`): segments written before
+    partitioning (directly in the store directory) first, then each partition's.
+    """
+    segments = list_segments(directory)
+    partitions = [partition_dir_for(directory, location)] if location is not None else list_partitions(directory)
+    for partition in partitions:
+        segments.extend(list_segments(partition))
+    return segments
+
+
+def _segment_number(path):
+    name = os.path.basename(path)
+    return int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+
+def _segment_name(number):
+    return f"{SEGMENT_PREFIX}{number:06d}{SEGMENT_SUFFIX}"
+
+
+def iter_segment(path):
+    """
+    Yields the entries stored in one segment file.
+    A trailing line without a newline is a torn write and is ignored.
+    """
+    for _, entry in iter_segment_with_offsets(path):
+        yield entry
+
+
+def iter_segment_with_offsets(path, start=0):
+    """Yields (byte offset, entry) pairs from one segment file, starting at `start`."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        offset = start
+        for line in f:
+            line_offset = offset
+            offset += len(line)
+            if not line.endswith(b"\n"):
+                break  # torn tail from an interrupted write
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_offset, json.loads(line)
+            except json.JSONDecodeError:
+                print(f"⚠️ Skipping corrupt line in {path}", flush=True)
+
+
+def read_entry_at(path, offset):
+    """Reads the single entry starting at `offset` of a segment file."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return json.loads(f.readline())
+
+
+def complete_length(path, start=0):
+    """Returns the byte length of a segment up to its last complete line (never less than `start`)."""
+    size = os.path.getsize(path)
+    if size <= start:
+        return start
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read()
+    last_newline = data.rfind(b"\n")
+    return start + last_newline + 1 if last_newline >= 0 else start
+
+
+def _repair_torn_tail(path):
+    """Truncates a segment back to its last complete line."""
+    size = os.path.getsize(path)
+    if size == 0:
+        return
+    with open(path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) == b"\n":
+            return
+        f.seek(0)
+        data = f.read()
+        last_newline = data.rfind(b"\n")
+        f.truncate(last_newline + 1)
+        print(f"🩹 Repaired torn write at end of {path}", flush=True)
+
+
+def _fsync_directory(directory):
+    # Makes the creation/rename of a segment durable (no-op where unsupported)
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class ForecastIndex:
+    """
+    Persistent key → position index for a store directory.
+
+    Maps forecast_key(entry) to (segment name, byte offset). Alongside the keys it
+    records how many bytes of each segment it has covered, which is how a stale
+    index is detected and brought up to date by scanning only the unseen bytes.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, INDEX_FILENAME)
+        self.positions = {}
+        self.covered = {}  # segment name → bytes indexed
+        self.dirty = False
+        self._leads = None  # (location, date_for) → leads stored, built on first use
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def add(self, key, segment_name, offset, end):
+        if key is not None:
+            self.positions.setdefault(key, (segment_name, offset))
+            if self._leads is not None:
+                self._leads.setdefault(key[:2], set()).add(key[2])
+        self.covered[segment_name] = end
+        self.dirty = True
+
+    def leads_for(self, location, date_for):
+        """Sorted num_of_days_between_forecast values stored for a location and date."""
+        if self._leads is None:
+            leads = {}
+            for loc, day, lead in self.positions:
+                leads.setdefault((loc, day), set()).add(lead)
+            self._leads = leads
+        return sorted(self._leads.get((location.lower(), date_for), ()))
+
+    def load(self):
+        """Loads the sidecar file and catches up with any segments changed since it was written."""
+        try:
+            with open(self.path, "r") as f:
+                raw = json.load(f)
+            if raw.get("version") != INDEX_VERSION:
+                raise ValueError("index version mismatch")
+            self.covered = dict(raw["segments"])
+            self.positions = {
+                (loc, date_for, days): (segment, offset)
+                for loc, date_for, days, segment, offset in raw["keys"]
+            }
+            self._leads = None
+        except (OSError, ValueError, KeyError, TypeError):
+            return self.rebuild()
+
+        segments = {os.path.basename(p): p for p in list_segments(self.directory)}
+        for name, size in self.covered.items():
+            if name not in segments or os.path.getsize(segments[name]) < size:
+                return self.rebuild()  # segments were rewritten or removed
+
+        for name, path in segments.items():
+            start = self.covered.get(name, 0)
+            if os.path.getsize(path) > start:
+                self._scan(path, start)
+        return self
+
+    def rebuild(self):
+        segments = list_segments(self.directory)
+        if any(os.path.getsize(p) for p in segments):
+            print(f"🔎 Rebuilding forecast index for {self.directory}", flush=True)
+        self._leads = None
+        self.positions = {}
+        self.covered = {}
+        for path in segments:
+            self._scan(path, 0)
+        self.dirty = True
+        return self
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        raw = {
+            "version": INDEX_VERSION,
+            "segments": self.covered,
+            "keys": [[*key, segment, offset] for key, (segment, offset) in self.positions.items()],
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(raw, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def _scan(self, path, start):
+        self._leads = None
+        name = os.path.basename(path)
+        for offset, entry in iter_segment_with_offsets(path, start):
+            key = forecast_key(entry)
+            if key is not None:
+                self.positions.setdefault(key, (name, offset))
+        # Only cover complete lines, so a torn tail is re-read once repaired
+        self.covered[name] = complete_length(path, start)
+        self.dirty = True
+
+
+def load_index(path, location):
+    """Returns the up-to-date key index of one location's partition (for backfill tooling)."""
+    return ForecastIndex(partition_dir_for(store_dir_for(path), location)).load()
+
+
+class ForecastStore:
+    """
+    Append-only, segmented JSONL store for forecast entries.
+
+    Appends are serialized with a lock, so coroutines (or threads) sharing one
+    store can never interleave or lose writes. The key index is loaded lazily on
+    the first lookup and kept current by `append`.
+    """
+
+    def __init__(self, directory, max_segment_bytes=DEFAULT_MAX_SEGMENT_BYTES, fsync_every=DEFAULT_FSYNC_EVERY):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.fsync_every = max(1, fsync_every)
+        self._lock = threading.RLock()
+        self._file = None
+        self._unsynced = 0
+        self._index = None
+
+    # ---------- reading ----------
+    def segments(self):
+        return list_segments(self.directory)
+
+    def __iter__(self):
+        with self._lock:
+            self._flush_buffer()
+        for segment in self.segments():
+            yield from iter_segment(segment)
+
+    def is_empty(self):
+        return not any(os.path.getsize(s) > 0 for s in self.segments())
+
+    @property
+    def index(self):
+        with self._lock:
+            if self._index is None:
+                self._flush_buffer()
+                self._index = ForecastIndex(self.directory).load()
+            return self._index
+
+    def contains(self, entry_or_key):
+        """O(1) membership check by entry or by forecast_key tuple."""
+        key = entry_or_key if isinstance(entry_or_key, tuple) else forecast_key(entry_or_key)
+        return key is not None and key in self.index
+
+    def leads_for(self, location, date_for):
+        """Forecast leads (days before) already stored for a location and date_for."""
+        return self.index.leads_for(location, date_for)
+
+    def get(self, key):
+        """Returns the stored entry for a forecast_key tuple, or None."""
+        position = self.index.positions.get(key)
+        if position is None:
+            return None
+        with self._lock:
+            self._flush_buffer()
+        segment, offset = position
+        return read_entry_at(os.path.join(self.directory, segment), offset)
+
+    # ---------- writing ----------
+    def append(self, entry):
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        data = line.encode("utf-8")
+
+        with self._lock:
+            f = self._active_file()
+            if f.tell() > 0 and f.tell() + len(data) > self.max_segment_bytes:
+                f = self._roll_segment()
+
+            index = self.index
+            offset = f.tell()
+            f.write(data)
+            f.flush()  # visible to readers right away; durability comes with fsync
+            index.add(forecast_key(entry), os.path.basename(f.name), offset, offset + len(data))
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every:
+                self._sync()
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def flush(self):
+        """Flushes and fsyncs everything written so far, then persists the index."""
+        with self._lock:
+            if self._file:
+                self._sync()
+            if self._index:
+                self._index.save()
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._sync()
+                self._file.close()
+                self._file = None
+            if self._index:
+                self._index.save()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- internals ----------
+    def _flush_buffer(self):
+        if self._file:
+            self._file.flush()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def _active_file(self):
+        if self._file:
+            return self._file
+
+        os.makedirs(self.directory, exist_ok=True)
+        segments = self.segments()
+        if segments:
+            path = segments[-1]
+            _repair_torn_tail(path)
+            self._index = None  # re-validate against the repaired segment
+        else:
+            path = self._create_segment(1)
+
+        self._file = open(path, "ab")
+        return self._file
+
+    def _roll_segment(self):
+        """Seals the active segment and atomically starts the next one."""
+        current = self._file.name
+        self._sync()
+        self._file.close()
+        self._file = None
+
+        path = self._create_segment(_segment_number(current) + 1)
+        self._file = open(path, "ab")
+        print(f"🗂️ Started new segment {os.path.basename(path)}", flush=True)
+        return self._file
+
+    def _create_segment(self, number):
+        # Create empty segment under a temp name, then rename it into place, so
+        # readers never observe a half-initialised segment.
+        path = os.path.join(self.directory, _segment_name(number))
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        _fsync_directory(self.directory)
+        return path
+
+
+def _iso_date(date_for):
+    # "22/04/2025" → "2025-04-22" (sortable); None when unparseable
+    try:
+        return datetime.strptime(date_for, "%d/%m/%Y").date().isoformat()
+    except (TypeError, ValueError):
+        return None
+
+
+class StoreManifest:
+    """
+    Summary of a partitioned store, kept in manifest.json next to the partitions.
+
+    One record per partition: the location's display name, entry count, first/last
+    date_for, forecast leads present, and the segment bytes the record reflects.
+    The dashboard builds its location picker from this file alone.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, MANIFEST_FILENAME)
+        self.partitions = {}  # partition name → record
+        self.dirty = False
+
+    def locations(self):
+        """Display names of every location with data, sorted."""
+        return sorted(record["location"] for record in self.partitions.values() if record.get("entries"))
+
+    def get(self, location):
+        return self.partitions.get(partition_name(location))
+
+    def read(self):
+        """Loads the file as written; returns False when it is missing or unreadable."""
+        try:
+            with open(self.path, "r") as f:
+                raw = json.load(f)
+            if raw.get("version") != MANIFEST_VERSION:
+                return False
+            self.partitions = dict(raw["partitions"])
+            return True
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return False
+
+    def load(self):
+        """Loads the file and refreshes records whose partition changed since it was written."""
+        self.read()
+        on_disk = {os.path.basename(p): p for p in list_partitions(self.directory)}
+        for name in list(self.partitions):
+            if name not in on_disk:
+                del self.partitions[name]
+                self.dirty = True
+        for name, path in on_disk.items():
+            record = self.partitions.get(name)
+            sizes = {os.path.basename(p): os.path.getsize(p) for p in list_segments(path)}
+            if record is None or record.get("segments") != sizes:
+                self.refresh(name)
+        return self
+
+    def refresh(self, name, index=None, location=None):
+        """Recomputes one partition's record from its key index (the open store's, when given)."""
+        path = os.path.join(self.directory, PARTITIONS_DIRNAME, name)
+        if index is None:
+            index = ForecastIndex(path)
+            index.load()
+            index.save()
+
+        record = self.partitions.get(name, {})
+        location = record.get("location") or location or self._first_location(path, index) or name
+        dates = sorted(filter(None, (_iso_date(date_for) for _, date_for, _ in index.positions)))
+        self.partitions[name] = {
+            "location": location,
+            "entries": len(index),
+            "first_date": dates[0] if dates else None,
+            "last_date": dates[-1] if dates else None,
+            "leads": sorted({lead for _, _, lead in index.positions}),
+            "segments": dict(index.covered),
+        }
+        self.dirty = True
+
+    @staticmethod
+    def _first_location(path, index):
+        for segment, offset in index.positions.values():
+            try:
+                return read_entry_at(os.path.join(path, segment), offset).get("location")
+            except (OSError, ValueError, AttributeError):
+                return None
+        return None
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        raw = {"version": MANIFEST_VERSION, "partitions": dict(sorted(self.partitions.items()))}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(raw, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+class PartitionedStore:
+    """
+    Forecast store partitioned by location.
+
+    Each location is a ForecastStore (segments + key index) in its own directory, so
+    lookups, appends and reads for one location only touch that location's files.
+    The manifest is updated from the partitions' indexes whenever they are flushed.
+    At most MAX_OPEN_PARTITIONS partitions keep an open file; the least recently
+    written one is closed (fsync'ed, index saved) when another is needed.
+    """
+
+    def __init__(self, directory, **store_options):
+        self.directory = directory
+        self._store_options = store_options
+        self._partitions = {}
+        self._open = OrderedDict()  # partition names with an open file, least recently written first
+        self._touched = {}  # partition name → location, written since the last manifest update
+        self._manifest = None
+        self._lock = threading.RLock()
+
+    # ---------- partitions ----------
+    def partition(self, location):
+        """Returns the ForecastStore holding `location` (created on first write)."""
+        name = partition_name(location)
+        with self._lock:
+            store = self._partitions.get(name)
+            if store is None:
+                store = self._partitions[name] = ForecastStore(
+                    os.path.join(self.directory, PARTITIONS_DIRNAME, name), **self._store_options
+                )
+            return store
+
+    @property
+    def manifest(self):
+        with self._lock:
+            if self._manifest is None:
+                self._manifest = StoreManifest(self.directory).load()
+            return self._manifest
+
+    def locations(self):
+        return self.manifest.locations()
+
+    # ---------- reading ----------
+    def segments(self):
+        return list_store_segments(self.directory)
+
+    def __iter__(self):
+        for path in list_partitions(self.directory):
+            store = self._partitions.get(os.path.basename(path))
+            if store is not None:
+                yield from store  # may hold unflushed writes
+            else:
+                for segment in list_segments(path):
+                    yield from iter_segment(segment)
+
+    def iter_location(self, location):
+        yield from self.partition(location)
+
+    def is_empty(self):
+        return not any(os.path.getsize(s) > 0 for s in self.segments())
+
+    def contains(self, entry_or_key):
+        """O(1) membership check by entry or by forecast_key tuple."""
+        key = entry_or_key if isinstance(entry_or_key, tuple) else forecast_key(entry_or_key)
+        return key is not None and self.partition(key[0]).contains(key)
+
+    def get(self, key):
+        """Returns the stored entry for a forecast_key tuple, or None."""
+        return self.partition(key[0]).get(key)
+
+    def leads_for(self, location, date_for):
+        return self.partition(location).leads_for(location, date_for)
+
+    # ---------- writing ----------
+    def append(self, entry):
+        location = entry.get("location") if isinstance(entry, dict) else None
+        location = location if isinstance(location, str) else ""
+        name = partition_name(location)
+
+        with self._lock:
+            store = self.partition(location)
+            store.append(entry)
+            self._touched.setdefault(name, location)
+            self._open[name] = True
+            self._open.move_to_end(name)
+            while len(self._open) > MAX_OPEN_PARTITIONS:
+                oldest, _ = self._open.popitem(last=False)
+                self._partitions[oldest].close()
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def flush(self):
+        """Flushes every partition written to and updates the manifest."""
+        with self._lock:
+            for name in self._open:
+                self._partitions[name].flush()
+            self._update_manifest()
+
+    def close(self):
+        with self._lock:
+            for name in self._open:
+                self._partitions[name].close()
+            self._open.clear()
+            self._update_manifest()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _update_manifest(self):
+        if not self._touched:
+            return
+        manifest = self.manifest
+        for name, location in self._touched.items():
+            store = self._partitions[name]
+            index = store.index
+            index.save()
+            manifest.refresh(name, index=index, location=location)
+        self._touched.clear()
+        manifest.save()
+
+
+# ========== shared store handles ============
+_open_stores = {}
+_open_stores_lock = threading.Lock()
+
+
+def get_store(path):
+    """
+    Returns the process-wide (location-partitioned) store for a data file path, opening it on first use.
+    A store written before partitioning is split by location first; if the store is empty and
+    the legacy JSON array file exists, it is migrated and then removed. A legacy file left next to
+    a store that already holds all of its entries (migrated before removal was automatic) is removed too.
+    """
+    directory = store_dir_for(path)
+    with _open_stores_lock:
+        store = _open_stores.get(directory)
+        if store is None:
+            store = PartitionedStore(directory)
+            if list_segments(directory):
+                repartition_store(directory, store=store)
+            elif _is_legacy_file(path):
+                if store.is_empty():
+                    migrate_legacy_file(path, store=store, remove_legacy=True)
+                else:
+                    _remove_migrated_legacy_file(path, store)
+            _open_stores[directory] = store
+        return store
+
+
+def close_stores():
+    """Flushes and closes every store opened via `get_store`."""
+    with _open_stores_lock:
+        for store in _open_stores.values():
+            store.close()
+        _open_stores.clear()
+
+
+# ========== compatibility reader ============
+def _is_legacy_file(path):
+    return os.path.isfile(path) and os.path.splitext(path)[1] == ".json"
+
+
+def load_legacy_file(path):
+    """Reads the legacy JSON array file (raises json.JSONDecodeError when corrupt)."""
+    with open(path, "r") as f:
+        data = json.load(f)
+    return data if isinstance(data, list) else [data]
+
+
+def _same_location(entry, location):
+    value = entry.get("location") if isinstance(entry, dict) else None
+    return isinstance(value, str) and partition_name(value) == partition_name(location)
+
+
+def _data_files(path, location=None):
+    # (relative name, path) of the files holding the data behind a path: segments, or the legacy JSON file
+    directory = store_dir_for(path)
+    if list_store_segments(directory):
+        return [(os.path.relpath(p, directory), p) for p in list_store_segments(directory, location)]
+    if _is_legacy_file(path):
+        return [(os.path.basename(path), path)]
+    return []
+
+
+def data_signature(path, location=None):
+    """
+    Returns a cheap fingerprint of the data behind a path (or of one location's partition):
+    (relative name, mtime_ns, size) per segment, or of the legacy JSON file.
+    It changes whenever the collector writes new data there.
+    """
+    signature = []
+    for name, file_path in _data_files(path, location):
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            continue
+        signature.append((name, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def data_sizes(path, location=None):
+    """
+    Returns {relative name: size} for the files behind a path (or one location's partition).
+    Segments are only ever appended to, so unlike `data_signature` this depends on the content
+    alone and still matches in a fresh checkout of the same data.
+    """
+    sizes = {}
+    for name, file_path in _data_files(path, location):
+        try:
+            sizes[name] = os.path.getsize(file_path)
+        except OSError:
+            continue
+    return sizes
+
+
+def load_entries(path, location=None):
+    """
+    Returns the stored forecast entries for a data file path — all of them, or one location's.
+    Reads the segmented store when it exists (only the location's partition when given),
+    otherwise the legacy JSON array.
+    """
+    directory = store_dir_for(path)
+    if list_store_segments(directory):
+        store = _open_stores.get(directory)
+        if location is None:
+            if store:
+                return list(store)
+            return [entry for segment in list_store_segments(directory) for entry in iter_segment(segment)]
+
+        # Segments from before partitioning may still hold this location: filter those
+        entries = [e for segment in list_segments(directory) for e in iter_segment(segment) if _same_location(e, location)]
+        if store:
+            entries.extend(store.iter_location(location))
+        else:
+            entries.extend(e for segment in list_segments(partition_dir_for(directory, location)) for e in iter_segment(segment))
+        return entries
+
+    if _is_legacy_file(path):
+        entries = load_legacy_file(path)
+        return entries if location is None else [e for e in entries if _same_location(e, location)]
+
+    return []
+
+
+def load_manifest(path):
+    """
+    Returns the StoreManifest of the partitioned store behind a data file path, or None when
+    there is no partitioned store yet. The file is trusted as written by the collector and
+    only rebuilt (and saved, when possible) if it is missing or unreadable.
+    """
+    directory = store_dir_for(path)
+    if not list_partitions(directory):
+        return None
+
+    manifest = StoreManifest(directory)
+    if not manifest.read():
+        manifest.load()
+        try:
+            manifest.save()
+        except OSError as e:
+            print(f"⚠️ Could not save store manifest: {e}", flush=True)
+    return manifest
+
+
+# ========== migration ============
+def migrate_legacy_file(path, store=None, remove_legacy=False):
+    """
+    Converts the legacy JSON array file into the segmented, location-partitioned store.
+    Returns the number of entries migrated.
+    """
+    entries = load_legacy_file(path)
+    owns_store = store is None
+    store = store or PartitionedStore(store_dir_for(path))
+
+    if not store.is_empty():
+        raise RuntimeError(f"Store {store.directory} already contains data — refusing to migrate twice.")
+
+    store.extend(entries)
+    store.flush()
+    if owns_store:
+        store.close()
+
+    print(f"📦 Migrated {len(entries)} entries from {path} to {store.directory}", flush=True)
+
+    if remove_legacy:
+        os.remove(path)
+        print(f"🧹 Removed legacy file {path}", flush=True)
+
+    return len(entries)
+
+
+def _remove_migrated_legacy_file(path, store):
+    try:
+        entries = load_legacy_file(path)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Keeping unreadable legacy file {path}: {e}", flush=True)
+        return
+    if all(store.contains(entry) for entry in entries if forecast_key(entry) is not None):
+        os.remove(path)
+        print(f"🧹 Removed legacy file {path} (already migrated to {store.directory})", flush=True)
+
+
+def repartition_store(directory, store=None):
+    """
+    Moves the entries of a store written before partitioning (segments directly in `directory`)
+    into per-location partitions, then removes the old segments and their index.
+    Safe to re-run after an interruption: entries already moved are skipped.
+    Returns the number of entries moved.
+    """
+    segments = list_segments(directory)
+    if not segments:
+        return 0
+
+    owns_store = store is None
+    store = store or PartitionedStore(directory)
+
+    moved = 0
+    for segment in segments:
+        for entry in iter_segment(segment):
+            if not store.contains(entry):
+                store.append(entry)
+                moved += 1
+    store.flush()
+
+    for segment in segments:
+        os.remove(segment)
+    if os.path.exists(os.path.join(directory, INDEX_FILENAME)):
+        os.remove(os.path.join(directory, INDEX_FILENAME))
+    _fsync_directory(directory)
+
+    if owns_store:
+        store.close()
+
+    print(f"🗂️ Repartitioned {moved} entries in {directory} by location", flush=True)
+    return moved
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Forecast storage tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    migrate = sub.add_parser("migrate", help="Convert the legacy JSON array file into the segmented store")
+    migrate.add_argument("path", nargs="?", default=os.path.join("data", "cloud_cover.json"))
+    migrate.add_argument("--remove-legacy", action="store_true", help="Delete the JSON file after migrating")
+
+    repartition = sub.add_parser("repartition", help="Split a store written before partitioning by location")
+    repartition.add_argument("path", nargs="?", default=os.path.join("data", "cloud_cover.json"))
+
+    manifest = sub.add_parser("manifest", help="Rebuild and print the store manifest")
+    manifest.add_argument("path", nargs="?", default=os.path.join("data", "cloud_cover.json"))
+
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        migrate_legacy_file(args.path, remove_legacy=args.remove_legacy)
+    elif args.command == "repartition":
+        repartition_store(store_dir_for(args.path))
+    elif args.command == "manifest":
+        manifest = StoreManifest(store_dir_for(args.path)).load()
+        manifest.save()
+        for record in sorted(manifest.partitions.values(), key=lambda r: r["location"]):
+            print(f"📍 {record['location']}: {record['entries']} entries, "
+                  f"{record['first_date']} → {record['last_date']}, leads {record['leads']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
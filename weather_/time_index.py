@@ -0,0 +1,83 @@
+# weather_/time_index.py
+from bisect import bisect_left
+from datetime import datetime, timezone
+
+
+class TimeIndex:
+    """
+    A provider response parsed once into parallel arrays sorted by time:
+    epoch seconds (UTC) and cloud cover values.
+
+    Lookups are O(log n) with bisect, so slicing many target hours (or full
+    multi-day grids) out of one response stays cheap.
+    """
+
+    __slots__ = ("epochs", "values")
+
+    def __init__(self, pairs):
+        pairs = sorted(pairs, key=lambda p: p[0])
+        self.epochs = [e for e, _ in pairs]
+        self.values = [v for _, v in pairs]
+
+    def __len__(self):
+        return len(self.epochs)
+
+    @classmethod
+    def from_owm(cls, data):
+        """OpenWeatherMap 5-day/3-hour forecast → index of clouds.all by entry dt."""
+        return cls(
+            (entry["dt"], entry.get("clouds", {}).get("all"))
+            for entry in (data or {}).get("list", [])
+            if "dt" in entry
+        )
+
+    @classmethod
+    def from_openmeteo(cls, data):
+        """
+        Open-Meteo hourly response → index of cloudcover by time.
+        Times are the provider's wall-clock strings ("2025-04-22T06:00"), stored as if they were UTC.
+        """
+        hourly = (data or {}).get("hourly", {})
+        return cls(
+            (_wall_clock_epoch(t), c)
+            for t, c in zip(hourly.get("time", []), hourly.get("cloudcover", []))
+        )
+
+    def exact(self, epoch):
+        """Returns (epoch, value) for an exact timestamp, or None."""
+        i = bisect_left(self.epochs, epoch)
+        if i < len(self.epochs) and self.epochs[i] == epoch:
+            return self.epochs[i], self.values[i]
+        return None
+
+    def nearest(self, epoch):
+        """Returns (epoch, value) of the closest timestamp (earlier one on ties), or None when empty."""
+        if not self.epochs:
+            return None
+        i = bisect_left(self.epochs, epoch)
+        if i == 0:
+            return self.epochs[0], self.values[0]
+        if i == len(self.epochs):
+            return self.epochs[-1], self.values[-1]
+        before, after = self.epochs[i - 1], self.epochs[i]
+        j = i - 1 if epoch - before <= after - epoch else i
+        return self.epochs[j], self.values[j]
+
+    def nearest_many(self, epochs):
+        return [self.nearest(e) for e in epochs]
+
+    def exact_many(self, epochs):
+        return [self.exact(e) for e in epochs]
+
+
+def _wall_clock_epoch(time_str):
+    return int(datetime.fromisoformat(time_str).replace(tzinfo=timezone.utc).timestamp())
+
+
+def wall_clock_epoch(date_str, time_str):
+    """"2025-04-22", "06:00" → epoch seconds, matching TimeIndex.from_openmeteo keys."""
+    return _wall_clock_epoch(f"{date_str}T{time_str}")
+
+
+def format_wall_clock(epoch):
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M")
@@ -1,18 +1,221 @@
+import asyncio
+import random
+import importlib.util
+
+from contextlib import asynccontextmanager
+
 import httpx
-import time
 
-from requests.exceptions import RequestException
+from weather_.metrics import get_metrics
+from weather_.http_cache import get_http_cache
+from weather_.rate_limiter import RateLimitTimeout
+
+# One pooled client is shared by every provider call during a run (see `http_client`)
+CLIENT_SETTINGS = {
+    "http2": True,                  # only used when the `h2` package is installed
+    "max_connections": 20,
+    "max_keepalive_connections": 10,
+    "keepalive_expiry": 30.0,       # seconds an idle connection is kept open
+    "request_timeout": 10.0,        # seconds per attempt
+}
+
+# Total seconds one safe_get call may spend on a provider, retries and backoff included
+TIMEOUT_BUDGETS = {
+    "OpenMeteo": 30.0,
+    "OpenWeatherMap": 30.0,
+}
+DEFAULT_TIMEOUT_BUDGET = 30.0
+
+BACKOFF_BASE = 0.5  # seconds; doubled on each retry, with full jitter
+BACKOFF_MAX = 8.0
+
+_client = None
+
+
+def configure_client(**settings):
+    """
+    Overrides the shared client settings (see CLIENT_SETTINGS).
+    Takes effect the next time a client is created.
+    """
+    unknown = set(settings) - set(CLIENT_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown client settings: {', '.join(sorted(unknown))}")
+    CLIENT_SETTINGS.update(settings)
+
+
+def get_client():
+    """Returns the shared AsyncClient, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        http2 = CLIENT_SETTINGS["http2"] and importlib.util.find_spec("h2") is not None
+        _client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=CLIENT_SETTINGS["max_connections"],
+                max_keepalive_connections=CLIENT_SETTINGS["max_keepalive_connections"],
+                keepalive_expiry=CLIENT_SETTINGS["keepalive_expiry"],
+            ),
+            timeout=CLIENT_SETTINGS["request_timeout"],
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+@asynccontextmanager
+async def http_client(**settings):
+    """
+    Opens the shared client for the duration of a run and closes it afterwards.
+    Usage: async with http_client(max_connections=50): ...
+    """
+    if settings:
+        configure_client(**settings)
+    client = get_client()
+    try:
+        yield client
+    finally:
+        await close_client()
+
+
+def _is_retryable(error):
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(error, httpx.TransportError)  # timeouts, connection resets, protocol errors
+
+
+def _backoff_delay(attempt, error):
+    # Honour Retry-After on 429/503 when the server sends a number of seconds
+    if isinstance(error, httpx.HTTPStatusError):
+        retry_after = error.response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return float(retry_after)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def _store_response(cache, url, source_name, body, etag=None, last_modified=None):
+    try:
+        cache.put(url, source_name, body, etag=etag, last_modified=last_modified)
+    except OSError as e:  # a full or read-only disk must not fail the fetch
+        print(f"⚠️ Could not cache {source_name} response: {e}", flush=True)
+
+
+# The cache's gzip, JSON and directory walks are blocking file I/O: they run in a worker
+# thread (asyncio.to_thread) so they don't stall every other request in flight.
+
+async def cached_body(url, source_name, count_call=False):
+    """
+    The body of a fresh on-disk cache entry for url, or None. Counted like safe_get's cache
+    lookups. Lets a batched request serve the locations already cached on their own URLs.
+    """
+    cache = get_http_cache()
+    if cache is None:
+        return None
+    metrics = get_metrics()
+    cached = await asyncio.to_thread(cache.get, url)
+    if cached is None or not cache.is_fresh(cached):
+        metrics.record_cache("http", hit=False)
+        return None
+    metrics.record_cache("http", hit=True)
+    if count_call:
+        metrics.record_cache_hit(source_name)
+    await asyncio.to_thread(cache.mark_used, cached)
+    return cached.body
+
+
+async def store_body(url, source_name, body):
+    """Caches a body under url, e.g. one location's part of a batched response (no validators)."""
+    cache = get_http_cache()
+    if cache is not None:
+        await asyncio.to_thread(_store_response, cache, url, source_name, body)
+
+
+async def safe_get(url, source_name, retries=3, limiter=None, use_cache=True, count_call=False):
+    """
+    GETs a JSON document, retrying transient failures. Returns None when every attempt fails.
+    When a rate limiter is given, every attempt (retries included) waits for a token first.
+
+    Responses go through the on-disk cache (weather_/http_cache.py): a fresh entry is returned
+    without a request, a stale one is revalidated with its ETag/Last-Modified when it has them.
+    With count_call, the call is counted as an API call (get_call_counts) once a request is
+    actually sent, or as a cache hit (get_cache_hit_counts) when the cache answers it.
+    """
+    loop = asyncio.get_running_loop()
+    budget = TIMEOUT_BUDGETS.get(source_name, DEFAULT_TIMEOUT_BUDGET)
+    deadline = None  # starts with the first attempt, so time queued for a rate limit slot isn't counted
+    client = get_client()
+    metrics = get_metrics()
+
+    cache = get_http_cache() if use_cache else None
+    cached = await asyncio.to_thread(cache.get, url) if cache is not None else None
+    if cached is not None and cache.is_fresh(cached):
+        metrics.record_cache("http", hit=True)
+        if count_call:
+            metrics.record_cache_hit(source_name)
+        await asyncio.to_thread(cache.mark_used, cached)
+        return cached.body
+    if cache is not None:
+        metrics.record_cache("http", hit=False)
+    headers = cached.validators() if cached is not None else {}
 
-async def safe_get(url, source_name, retries=3):
     for attempt in range(retries):
+        started = None
         try:
+            if limiter is not None:
+                metrics.record_rate_limit_wait(source_name, await limiter.acquire())
 
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, timeout=10)
+            if deadline is None:
+                deadline = loop.time() + budget
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                print(f"⏱️ {source_name} timeout budget exhausted (in safe_get)", flush=True)
+                metrics.record_timeout(source_name)
+                break
 
+            if count_call and attempt == 0:
+                metrics.record_call(source_name)
+            started = loop.time()
+            response = await client.get(url, headers=headers, timeout=min(CLIENT_SETTINGS["request_timeout"], remaining))
+            metrics.record_request(source_name, loop.time() - started, response.status_code, response.num_bytes_downloaded)
+            started = None
+            if response.status_code == 304 and cached is not None:
+                metrics.record_cache("http_revalidation", hit=True)
+                await asyncio.to_thread(cache.touch, cached)
+                return cached.body
             response.raise_for_status()
-            return response.json()
-        except RequestException as e:
+            data = response.json()
+            if cache is not None:
+                if headers:
+                    metrics.record_cache("http_revalidation", hit=False)
+                if "no-store" not in response.headers.get("Cache-Control", "").lower():
+                    await asyncio.to_thread(
+                        _store_response, cache, url, source_name, data,
+                        response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                    )
+            return data
+        except httpx.HTTPError as e:
+            if started is not None:  # no response: timeout, connection error, ...
+                metrics.record_request(source_name, loop.time() - started, "error")
+            if isinstance(e, httpx.TimeoutException):
+                metrics.record_timeout(source_name)
             print(f"⚠️ {source_name} error (in safe_get): {e}", flush=True)
-            time.sleep(1)  # short pause before retry
-    return None
\ No newline at end of file
+            if not _is_retryable(e) or attempt == retries - 1:
+                break
+
+            metrics.record_retry(source_name)
+            delay = min(_backoff_delay(attempt, e), max(0.0, deadline - loop.time()))
+            await asyncio.sleep(delay)  # short pause before retry, without blocking other coroutines
+        except RateLimitTimeout as e:
+            print(f"🚦 {source_name} rate limit queue too long (in safe_get): {e}", flush=True)
+            metrics.record_rate_limit_rejection(source_name)
+            break
+        except ValueError as e:
+            print(f"⚠️ {source_name} returned invalid JSON (in safe_get): {e}", flush=True)
+            break
+    metrics.record_failure(source_name)
+    return None